@@ -0,0 +1,206 @@
+"""
+Filter and replay the audit log written by RAGService (logs/audit/*.jsonl.gz).
+
+    python scripts/audit.py filter --decision refuse --since 2025-11-01
+    python scripts/audit.py filter --scheme "HDFC Liquid Fund" --format table
+    python scripts/audit.py replay --outcome generated --limit 200 --concurrency 8
+    python scripts/audit.py replay --api http://localhost:8000 --unique --output replay.json
+
+replay re-runs the logged queries as a workload (through a local RAGService,
+or a running API with --api) and reports latency percentiles plus how many
+answer/refuse decisions differ from the logged ones. Follow-up questions are
+replayed as the standalone question they were rewritten to.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Ensure root directory is in sys.path so backend modules are importable
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.audit_log import iter_records, is_refusal
+
+DEFAULT_AUDIT_DIR = os.getenv("AUDIT_LOG_DIR", os.path.join(root_path, "logs", "audit"))
+
+
+def parse_time(value):
+    # Accepts dates or full ISO timestamps; naive values are taken as UTC
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def matches(record, args):
+    if args.since or args.until:
+        ts = datetime.fromisoformat(record["ts"])
+        if args.since and ts < args.since:
+            return False
+        if args.until and ts >= args.until:
+            return False
+    if args.decision and record.get("decision") != args.decision:
+        return False
+    if args.outcome and record.get("outcome") != args.outcome:
+        return False
+    if args.path and record.get("path") != args.path:
+        return False
+    if args.contains and args.contains.lower() not in (record.get("query") or "").lower():
+        return False
+    if args.scheme and not any(c.get("scheme") == args.scheme for c in record.get("chunks", [])):
+        return False
+    if args.chunk and not any(c.get("id") == args.chunk for c in record.get("chunks", [])):
+        return False
+    return True
+
+
+def select_records(args):
+    selected = []
+    for record in iter_records(args.dir):
+        if matches(record, args):
+            selected.append(record)
+            if args.limit and len(selected) >= args.limit and not getattr(args, "unique", False):
+                break
+    return selected
+
+
+def cmd_filter(args):
+    records = select_records(args)
+    for record in records:
+        if args.format == "table":
+            chunks = ",".join(str(c.get("id"))[:8] for c in record.get("chunks", []))
+            print(f"{record['ts']}  {record.get('decision', ''):<9} {record.get('latency_ms', 0):>9.1f} ms  "
+                  f"{(record.get('query') or '')[:60]!r}  [{chunks}]")
+        else:
+            print(json.dumps(record, ensure_ascii=False))
+    print(f"{len(records)} records", file=sys.stderr)
+
+
+def make_runner(args):
+    """
+    Returns ask(question) -> answer, against the API when --api is given, else a local RAGService.
+    """
+    if args.api:
+        import httpx
+        client = httpx.Client(base_url=args.api, timeout=120.0)
+
+        def ask(question):
+            response = client.post("/chat", json={"query": question})
+            response.raise_for_status()
+            return response.json()["answer"]
+        return ask
+
+    # Replayed questions should not be audited again unless asked to
+    if not args.log_replay:
+        os.environ["AUDIT_LOG"] = "0"
+    from src.backend.rag_engine import RAGService
+    return RAGService().query
+
+
+def cmd_replay(args):
+    records = select_records(args)
+    if args.unique:
+        seen = set()
+        records = [r for r in records if not (r.get("query") in seen or seen.add(r.get("query")))]
+        if args.limit:
+            records = records[:args.limit]
+    records = [r for r in records if r.get("query")]
+    if not records:
+        print("No matching records to replay.")
+        return
+
+    ask = make_runner(args)
+
+    def run(record):
+        start = time.perf_counter()
+        try:
+            answer, error = ask(record.get("rewritten_query") or record["query"]), None
+        except Exception as e:
+            answer, error = None, f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - start
+        if error or (answer or "").startswith("Error generating response"):
+            decision = "error"
+        else:
+            decision = "refuse" if is_refusal(answer) else "answer"
+        return {"query": record["query"], "seconds": seconds, "decision": decision,
+                "logged_decision": record.get("decision"), "error": error}
+
+    print(f"Replaying {len(records)} queries with concurrency {args.concurrency}...")
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(run, records))
+    wall = time.perf_counter() - wall
+
+    ms = np.array([r["seconds"] for r in results]) * 1000
+    decided = ("answer", "refuse")
+    changed = [r for r in results if r["logged_decision"] in decided and r["decision"] in decided and r["decision"] != r["logged_decision"]]
+    failed = [r for r in results if r["decision"] == "error"]
+    report = {
+        "queries": len(results),
+        "concurrency": args.concurrency,
+        "target": args.api or "local",
+        "wall_seconds": round(wall, 3),
+        "throughput_qps": round(len(results) / wall, 3) if wall else None,
+        "latency_ms": {
+            "p50": round(float(np.percentile(ms, 50)), 3),
+            "p95": round(float(np.percentile(ms, 95)), 3),
+            "p99": round(float(np.percentile(ms, 99)), 3),
+        },
+        "errors": len(failed),
+        "decisions_changed": len(changed),
+        "changed": [{"query": r["query"], "logged": r["logged_decision"], "now": r["decision"]} for r in changed],
+    }
+    print(f"  p50 {report['latency_ms']['p50']:.1f} ms  p95 {report['latency_ms']['p95']:.1f} ms  "
+          f"p99 {report['latency_ms']['p99']:.1f} ms  ({report['throughput_qps']} q/s)")
+    print(f"  errors: {report['errors']}  decisions changed vs log: {report['decisions_changed']}")
+    if failed:
+        print(f"    first error: {failed[0]['error']}")
+    for item in report["changed"][:20]:
+        print(f"    {item['logged']} -> {item['now']}: {item['query'][:80]!r}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter and replay the RAG audit log")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(p):
+        p.add_argument("--dir", default=DEFAULT_AUDIT_DIR, help="Audit log directory")
+        p.add_argument("--since", type=parse_time, help="ISO date/time (UTC if no offset), inclusive")
+        p.add_argument("--until", type=parse_time, help="ISO date/time (UTC if no offset), exclusive")
+        p.add_argument("--decision", choices=["answer", "refuse", "error", "cancelled"])
+        p.add_argument("--outcome", help="generated, cache_exact, cache_semantic, fact_lookup, faq_exact, faq_semantic, refused_advice, refused_off_topic, coalesced, error, cancelled")
+        p.add_argument("--path", help="Entry point: query, aquery, stream, astream, batch")
+        p.add_argument("--contains", help="Case-insensitive substring of the query")
+        p.add_argument("--scheme", help="Only records that retrieved a chunk of this scheme")
+        p.add_argument("--chunk", help="Only records that retrieved this chunk id")
+        p.add_argument("--limit", type=int, help="Stop after this many records")
+
+    p_filter = sub.add_parser("filter", help="Print matching records")
+    add_filters(p_filter)
+    p_filter.add_argument("--format", choices=["jsonl", "table"], default="jsonl")
+    p_filter.set_defaults(func=cmd_filter)
+
+    p_replay = sub.add_parser("replay", help="Re-run matching queries and report latency")
+    add_filters(p_replay)
+    p_replay.add_argument("--api", help="Base URL of a running API (default: local RAGService)")
+    p_replay.add_argument("--concurrency", type=int, default=4)
+    p_replay.add_argument("--unique", action="store_true", help="Replay each distinct query once")
+    p_replay.add_argument("--log-replay", action="store_true", help="Audit the replayed queries too (local mode)")
+    p_replay.add_argument("--output", help="Write the replay report as JSON")
+    p_replay.set_defaults(func=cmd_replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+# Ensure root directory is in sys.path so backend modules are importable
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from langchain_core.documents import Document
+from src.backend.citations import CitationResolver, load_url_maps, SCHEME_SLUGS
+from src.backend.rag_engine import RAGService, BASE_DIR
+
+
+def legacy_format_docs(pdf_url_map, docs):
+    """
+    The per-chunk resolution _format_docs did before citations were precomputed
+    (kept here only as the benchmark baseline).
+    """
+    formatted = []
+    for doc in docs:
+        scheme_name = doc.metadata.get('scheme_name')
+        doc_type = doc.metadata.get('document_name')
+        full_path = doc.metadata.get('source', 'Unknown')
+        filename = os.path.basename(full_path.replace('\\', '/'))
+        public_url = pdf_url_map.get(filename)
+        if not public_url:
+            slug_map = {
+                "HDFC Large Cap Fund": "hdfc-large-cap-fund",
+                "HDFC Flexi Cap Fund": "hdfc-flexi-cap-fund",
+                "HDFC ELSS Tax Saver": "hdfc-elss-tax-saver",
+                "HDFC Balanced Advantage Fund": "hdfc-balanced-advantage-fund",
+                "HDFC Liquid Fund": "hdfc-liquid-fund"
+            }
+            fund_slug = slug_map.get(scheme_name)
+            if not fund_slug:
+                filename_lower = filename.lower()
+                if "largecap" in filename_lower or "top 100" in filename_lower: fund_slug = "hdfc-large-cap-fund"
+                elif "flexicap" in filename_lower or "multi-cap" in filename_lower: fund_slug = "hdfc-flexi-cap-fund"
+                elif "elss" in filename_lower or "tax_saver" in filename_lower: fund_slug = "hdfc-elss-tax-saver"
+                elif "balancedadvantage" in filename_lower or "prudence" in filename_lower: fund_slug = "hdfc-balanced-advantage-fund"
+                elif "liquid" in filename_lower: fund_slug = "hdfc-liquid-fund"
+            if fund_slug:
+                public_url = f"https://www.hdfcfund.com/explore/mutual-funds/{fund_slug}/direct"
+            elif doc_type and "Factsheet" in doc_type:
+                public_url = "https://www.hdfcfund.com/investor-services/factsheets"
+            elif doc_type and "SID" in doc_type:
+                public_url = "https://www.hdfcfund.com/investor-services/fund-documents/sid"
+            elif doc_type and "KIM" in doc_type:
+                public_url = "https://www.hdfcfund.com/investor-services/fund-documents/kim"
+            else:
+                public_url = "https://www.hdfcfund.com/explore/mutual-funds"
+        formatted.append(f"--- Document Source ---\n{doc.page_content}\nSource Link: {public_url}")
+    return "\n\n".join(formatted)
+
+
+def make_docs(resolver, n=10, precomputed=True):
+    """
+    n chunks shaped like ingest.py output, half with mapped PDFs and half falling back to landing pages.
+    """
+    files = list(resolver.pdf_url_map)[: n // 2] + [f"HDFC_Scheme_{i}_Other_Doc.pdf" for i in range(n - n // 2)]
+    schemes = list(SCHEME_SLUGS)
+    docs = []
+    for i, filename in enumerate(files):
+        meta = {
+            "source": f"raw\\schemes\\folder\\{filename}",
+            "file_name": filename,
+            "scheme_name": schemes[i % len(schemes)],
+            "document_name": "KIM",
+        }
+        if precomputed:
+            meta["public_url"] = resolver.resolve(meta)
+        docs.append(Document(page_content="File: ...\nContent: " + "x" * 900, metadata=meta))
+    return docs
+
+
+def main(number=20000):
+    pdf_url_map, url_map = load_url_maps(BASE_DIR)
+    resolver = CitationResolver(pdf_url_map, url_map)
+    service = SimpleNamespace(citations=resolver)
+    service.citation_url = lambda metadata: RAGService.citation_url(service, metadata)
+    raw_docs = make_docs(resolver, precomputed=False)
+    enriched_docs = make_docs(resolver, precomputed=True)
+
+    cases = [
+        ("legacy (per-chunk resolution)", lambda: legacy_format_docs(pdf_url_map, raw_docs)),
+        ("resolver fallback (memoized)", lambda: RAGService._format_docs(service, raw_docs)),
+        ("precomputed public_url", lambda: RAGService._format_docs(service, enriched_docs)),
+    ]
+    print(f"_format_docs over {len(raw_docs)} chunks, {number} iterations")
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=number, repeat=5)) / number
+        print(f"  {name:<32} {best * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Offline benchmark of the RAGService query pipeline, stage by stage.
+
+The OpenAI embedding and chat providers are replaced by deterministic local
+stand-ins with configurable artificial latency, and the service runs against a
+synthetic corpus in a temporary Chroma directory, so runs are repeatable and
+need no API key. Per stage it reports p50/p95/p99 latency and the memory
+allocated (tracemalloc peak above the stage's starting point, measured in a
+separate pass so tracing does not skew the timings). Results are written as
+JSON; pass --compare with an earlier result to flag regressions.
+
+    python scripts/bench_pipeline.py --iterations 200 --output bench_results/pipeline.json
+    python scripts/bench_pipeline.py --compare bench_results/pipeline.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import platform
+import tempfile
+import shutil
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.output_parsers import StrOutputParser
+
+# Ensure root directory is in sys.path so backend modules are importable
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+STAGES = ["embed", "vector_search", "format_docs", "prompt_build", "llm", "parse", "end_to_end"]
+
+SCHEMES = {
+    "HDFC Large Cap Fund": "HDFC_LargeCapFund",
+    "HDFC Flexi Cap Fund": "HDFC_FlexiCapFund",
+    "HDFC ELSS Tax Saver": "HDFC_ELSS_TaxSaver",
+    "HDFC Balanced Advantage Fund": "HDFC_BalancedAdvantageFund",
+    "HDFC Liquid Fund": "HDFC_LiquidFund",
+}
+DOCUMENTS = ["KIM", "SID", "Factsheet", "Riskometer"]
+FACTS = [
+    "The exit load is {n}% if units are redeemed within {m} year of allotment.",
+    "The total expense ratio of the direct plan is 0.{n}{m}% per annum.",
+    "The minimum application amount is Rs. {n}00 and in multiples of Re. 1 thereafter.",
+    "Minimum SIP instalment is Rs. {n}00 for monthly frequency with {m} instalments.",
+    "The scheme is benchmarked against the NIFTY {n}00 Total Returns Index.",
+    "The riskometer level of the scheme is Very High as on {m} November 2025.",
+    "Investments are subject to a lock-in period of {m} years from the date of allotment.",
+    "The fund manager has managed the scheme since {m} 20{n}.",
+    "Net asset value is declared on every business day by {n} p.m.",
+    "Redemption proceeds are dispatched within {m} working days of the request.",
+]
+QUESTIONS = [
+    "What is the exit load for {scheme}?",
+    "What is the expense ratio of {scheme}?",
+    "What is the minimum SIP amount for {scheme}?",
+    "Which benchmark does {scheme} track?",
+    "What is the riskometer level of {scheme}?",
+    "Is there a lock-in period for {scheme}?",
+    "Who manages {scheme}?",
+]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class StandInEmbeddings(Embeddings):
+    """
+    Deterministic embedding provider: each token maps to a fixed random unit
+    vector (seeded by its hash) and a text is the normalized sum of its tokens,
+    so texts sharing words land close together. Sleeps `latency` seconds per
+    call plus `per_text_latency` per text, like a network round trip.
+    """
+
+    def __init__(self, dim=1536, latency=0.0, per_text_latency=0.0):
+        self.dim = dim
+        self.model = f"standin-embedding-{dim}"
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self._tokens = {}
+
+    def _token_vector(self, token):
+        vec = self._tokens.get(token)
+        if vec is None:
+            seed = int.from_bytes(hashlib.sha256(token.encode("utf-8")).digest()[:8], "little")
+            vec = self._tokens[token] = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vec
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in _WORD_RE.findall(text.lower()):
+            vec += self._token_vector(token)
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency + self.per_text_latency * len(texts))
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(self.latency + self.per_text_latency * len(texts))
+        return [self._embed(t) for t in texts]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+
+class StandInChatModel(BaseChatModel):
+    """
+    Deterministic chat provider. The answer is the first `answer_words` words
+    of the context it was given; it arrives after `latency` seconds (time to
+    first token) plus one token per 1/tokens_per_second. Reports usage like the
+    OpenAI client does.
+    """
+
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self):
+        return "standin-chat"
+
+    def _answer(self, messages):
+        prompt = "\n".join(str(m.content) for m in messages)
+        context = prompt.split("Context:", 1)[-1]
+        words = context.split()[: self.answer_words] or ["No", "context."]
+        usage = {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(words),
+            "total_tokens": len(prompt) // 4 + len(words),
+        }
+        return words, usage
+
+    def _token_delay(self):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        words, usage = self._answer(messages)
+        time.sleep(self.latency + self._token_delay() * len(words))
+        message = AIMessage(content=" ".join(words), usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        words, usage = self._answer(messages)
+        await asyncio.sleep(self.latency + self._token_delay() * len(words))
+        message = AIMessage(content=" ".join(words), usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        words, usage = self._answer(messages)
+        time.sleep(self.latency)
+        for i, word in enumerate(words):
+            time.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+
+def build_corpus(directory, embeddings, n_chunks, seed=0):
+    """
+    Writes a synthetic collection shaped like ingest.py output (enriched chunk
+    headers, scheme/document metadata, public_url) plus the BM25 index, vector
+    snapshot and ingest stamp next to it.
+    """
+    from langchain_chroma import Chroma
+    from src.backend.index_stamp import write_stamp
+    from src.backend.lexical_index import BM25Index, BM25_INDEX_FILENAME
+    from src.backend.vector_index import NumpyVectorIndex
+
+    rng = np.random.default_rng(seed)
+    ids, texts, metadatas = [], [], []
+    for i in range(n_chunks):
+        scheme = list(SCHEMES)[i % len(SCHEMES)]
+        document = DOCUMENTS[(i // len(SCHEMES)) % len(DOCUMENTS)]
+        file_name = f"{SCHEMES[scheme]}_{document}_Nov_2025.pdf"
+        facts = [FACTS[j].format(n=rng.integers(1, 10), m=rng.integers(1, 10)) for j in rng.choice(len(FACTS), 8)]
+        body = f"{scheme} {document}. " + " ".join(facts)
+        ids.append(f"bench-{i}")
+        texts.append(f"File: {file_name}\nScheme: {scheme}\nDocument: {document}\nDate: Nov_2025\nContent: {body}")
+        metadatas.append({
+            "source": f"raw/{scheme}/{file_name}",
+            "file_name": file_name,
+            "scheme_name": scheme,
+            "document_name": document,
+            "date_of_the_document": "Nov_2025",
+            "page": int(i // (len(SCHEMES) * len(DOCUMENTS))),
+            "chunk_id": f"bench-{i}",
+            "public_url": f"https://www.hdfcfund.com/explore/mutual-funds/{SCHEMES[scheme].lower()}/direct",
+        })
+
+    store = Chroma(collection_name="hdfc_mutual_fund", embedding_function=embeddings, persist_directory=directory)
+    for start in range(0, n_chunks, 500):
+        store.add_texts(texts[start:start + 500], metadatas=metadatas[start:start + 500], ids=ids[start:start + 500])
+    BM25Index.build(ids, texts, metadatas).save(os.path.join(directory, BM25_INDEX_FILENAME))
+    NumpyVectorIndex.from_collection(store._collection).save(directory)
+    write_stamp(directory)
+
+
+def make_questions(count):
+    questions = [q.format(scheme=s) for q in QUESTIONS for s in SCHEMES]
+    return [questions[i % len(questions)] for i in range(count)]
+
+
+def run_stages(service, question):
+    """
+    One query through the pipeline with each stage called separately,
+    then once more end to end through service.query. Returns {stage: seconds}.
+    """
+    timed = {}
+
+    def step(name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        timed[name] = time.perf_counter() - start
+        return result
+
+    vector = step("embed", service.embeddings.embed_query, question)
+    docs = step("vector_search", service._retrieve, question, vector)
+    context = step("format_docs", service._build_context, docs)
+    prompt = step("prompt_build", service.prompt.invoke, {
+        "context": context, "question": question, "system_prompt": service.system_prompt_text
+    })
+    message = step("llm", service.llm.invoke, prompt)
+    step("parse", StrOutputParser().invoke, message)
+    step("end_to_end", service.query, question)
+    return timed
+
+
+def measure_allocations(service, questions):
+    """
+    Same stages under tracemalloc. Per stage: median peak bytes allocated above
+    the stage's starting point, and median bytes still held after it returns.
+    """
+    peaks = {name: [] for name in STAGES}
+    retained = {name: [] for name in STAGES}
+    stages = {
+        "embed": lambda q, s: service.embeddings.embed_query(q),
+        "vector_search": lambda q, s: service._retrieve(q, s["embed"]),
+        "format_docs": lambda q, s: service._build_context(s["vector_search"]),
+        "prompt_build": lambda q, s: service.prompt.invoke({
+            "context": s["format_docs"], "question": q, "system_prompt": service.system_prompt_text
+        }),
+        "llm": lambda q, s: service.llm.invoke(s["prompt_build"]),
+        "parse": lambda q, s: StrOutputParser().invoke(s["llm"]),
+        "end_to_end": lambda q, s: service.query(q),
+    }
+    tracemalloc.start()
+    try:
+        for question in questions:
+            results = {}
+            for name in STAGES:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                results[name] = stages[name](question, results)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks[name].append(peak - before)
+                retained[name].append(current - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        name: {"alloc_peak_bytes": int(np.median(peaks[name])), "alloc_retained_bytes": int(np.median(retained[name]))}
+        for name in STAGES
+    }
+
+
+def summarize(samples):
+    ms = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root_path, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(result, baseline_path, threshold, min_delta_ms):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    regressions = []
+    for name in STAGES:
+        old = baseline["stages"].get(name)
+        new = result["stages"][name]
+        if not old or not old["p50_ms"]:
+            continue
+        change = new["p50_ms"] / old["p50_ms"] - 1
+        slower = change > threshold and new["p50_ms"] - old["p50_ms"] > min_delta_ms
+        flag = "  REGRESSION" if slower else ""
+        print(f"  {name:<14} p50 {old['p50_ms']:9.3f} -> {new['p50_ms']:9.3f} ms ({change:+.1%}){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stage-level benchmark of RAGService.query")
+    parser.add_argument("--chunks", type=int, default=1000, help="Synthetic corpus size")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--alloc-iterations", type=int, default=20, help="Iterations of the tracemalloc pass (0 to skip)")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--llm-tps", type=float, default=0.0, help="Tokens per second after the first (0 = instant)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Earlier JSON result to compare p50s against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative p50 slowdown reported as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.1, help="Ignore p50 slowdowns smaller than this (timer noise)")
+    args = parser.parse_args()
+
+    corpus_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    # Isolated store, no embedding/answer caches (every iteration runs every stage), no audit log
+    os.environ["CHROMA_DB_DIR"] = corpus_dir
+    os.environ["EMBEDDING_CACHE_DIR"] = ""
+    os.environ["EMBEDDING_CACHE_SIZE"] = "0"
+    os.environ["ANSWER_CACHE_SIZE"] = "0"
+    os.environ["AUDIT_LOG"] = "0"
+    try:
+        from src.backend import rag_engine
+
+        build_corpus(corpus_dir, StandInEmbeddings(), args.chunks)
+        embeddings = StandInEmbeddings(latency=args.embed_latency)
+        llm = StandInChatModel(latency=args.llm_latency, tokens_per_second=args.llm_tps)
+        service = rag_engine.RAGService(embeddings=embeddings, llm=llm)
+
+        questions = make_questions(args.warmup + args.iterations)
+        for question in questions[:args.warmup]:
+            run_stages(service, question)
+        samples = {name: [] for name in STAGES}
+        for question in questions[args.warmup:]:
+            for name, seconds in run_stages(service, question).items():
+                samples[name].append(seconds)
+
+        stages = {name: summarize(samples[name]) for name in STAGES}
+        if args.alloc_iterations:
+            for name, alloc in measure_allocations(service, questions[:args.alloc_iterations]).items():
+                stages[name].update(alloc)
+
+        result = {
+            "benchmark": "pipeline",
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "config": {
+                "chunks": args.chunks,
+                "iterations": args.iterations,
+                "embed_latency": args.embed_latency,
+                "llm_latency": args.llm_latency,
+                "llm_tps": args.llm_tps,
+                "vector_backend": rag_engine.VECTOR_BACKEND,
+                "hybrid_search": rag_engine.HYBRID_SEARCH,
+                "rerank": rag_engine.RERANK,
+                "context_token_budget": rag_engine.CONTEXT_TOKEN_BUDGET,
+            },
+            "stages": stages,
+        }
+
+        print(f"{args.iterations} queries over {args.chunks} chunks (commit {result['commit']})")
+        print(f"  {'stage':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>10}")
+        for name in STAGES:
+            s = stages[name]
+            peak = f"{s['alloc_peak_bytes'] / 1024:10.1f}" if "alloc_peak_bytes" in s else f"{'-':>10}"
+            print(f"  {name:<14} {s['p50_ms']:9.3f} {s['p95_ms']:9.3f} {s['p99_ms']:9.3f} {peak}")
+
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print(f"Saved results to {args.output}")
+
+        if args.compare and compare(result, args.compare, args.threshold, args.min_delta_ms):
+            sys.exit(1)
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Measures API cold-start time.
+
+Each run starts a fresh process, so nothing is warm from an earlier run:
+  - import:  seconds to `import src.backend.api` (what uvicorn pays before binding)
+  - bind:    seconds from launching uvicorn until /health answers
+  - ready:   seconds from launching uvicorn until /ready returns 200
+             (engine built, indexes loaded, provider connection primed)
+The /ready body's per-phase startup timings are kept from the last run.
+Needs the ingested chroma_db and OPENAI_API_KEY for the ready phase.
+
+    python scripts/bench_startup.py --runs 5 --output bench_results/startup.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import src.backend.api; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_import():
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=root_path, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_server(timeout):
+    """
+    Returns (bind_seconds, ready_seconds or None, /ready body) for one uvicorn launch.
+    """
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.backend.api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=root_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    bind = ready = None
+    body = None
+    try:
+        with httpx.Client(base_url=base, timeout=2.0) as client:
+            while time.perf_counter() - start < timeout and server.poll() is None:
+                try:
+                    if bind is None:
+                        client.get("/health")
+                        bind = time.perf_counter() - start
+                    response = client.get("/ready")
+                    body = response.json()
+                    if response.status_code == 200:
+                        ready = time.perf_counter() - start
+                        break
+                    if body.get("rag_service") == "failed":
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait()
+    return bind, ready, body
+
+
+def summarize(samples):
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        return None
+    ms = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "min_ms": round(float(ms.min()), 1),
+        "max_ms": round(float(ms.max()), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API import, bind and ready times")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for /ready per run")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    imports, binds, readies = [], [], []
+    body = None
+    for i in range(args.runs):
+        imports.append(time_import())
+        bind, ready, body = time_server(args.timeout)
+        binds.append(bind)
+        readies.append(ready)
+        ready_text = f"{ready:.2f}s" if ready is not None else f"not ready ({(body or {}).get('rag_service')})"
+        bind_text = f"{bind:.2f}s" if bind is not None else "no response"
+        print(f"run {i + 1}: import {imports[-1]:.2f}s  bind {bind_text}  ready {ready_text}")
+
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "import": summarize(imports),
+        "bind": summarize(binds),
+        "ready": summarize(readies),
+        "startup_seconds": (body or {}).get("startup_seconds"),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
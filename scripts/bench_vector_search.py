@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+# Ensure root directory is in sys.path so backend modules are importable
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from langchain_chroma import Chroma
+from src.backend.vector_index import NumpyVectorIndex
+from src.backend.rag_engine import CHROMA_DB_DIR, SEARCH_KWARGS
+
+SCHEMES = ["HDFC Large Cap Fund", "HDFC Flexi Cap Fund", "HDFC ELSS Tax Saver", "HDFC Balanced Advantage Fund", "HDFC Liquid Fund"]
+
+
+def synthetic_store(directory, n=1000, dim=1536, seed=0):
+    """
+    A Chroma collection shaped like the real one (n chunks, 1536-dim, five schemes),
+    with clustered vectors so nearest neighbours are meaningful.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((40, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    store = Chroma(collection_name="hdfc_mutual_fund", persist_directory=directory)
+    ids = [f"chunk-{i}" for i in range(n)]
+    for start in range(0, n, 500):
+        end = min(start + 500, n)
+        store._collection.add(
+            ids=ids[start:end],
+            embeddings=vectors[start:end].tolist(),
+            documents=[f"chunk {i}" for i in range(start, end)],
+            metadatas=[{"scheme_name": SCHEMES[i % len(SCHEMES)]} for i in range(start, end)],
+        )
+    return store
+
+
+def load_store(use_real):
+    if use_real:
+        store = Chroma(collection_name="hdfc_mutual_fund", persist_directory=CHROMA_DB_DIR)
+        if store._collection.count():
+            return store, None
+        print(f"No chunks in {CHROMA_DB_DIR}; using a synthetic collection.")
+    tmp = tempfile.mkdtemp()
+    return synthetic_store(tmp), tmp
+
+
+def make_queries(index, count, seed=1):
+    # Perturbed stored vectors: realistic distances without calling an embedding API
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), size=min(count, len(index)), replace=False)
+    base = np.asarray(index.matrix[rows], dtype=np.float32)
+    queries = base + 0.05 * rng.standard_normal(base.shape).astype(np.float32)
+    return [q.tolist() for q in queries]
+
+
+def timed(fn, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for q in queries:
+            start = time.perf_counter()
+            fn(q)
+            samples.append(time.perf_counter() - start)
+    samples = np.array(samples) * 1000
+    return np.percentile(samples, 50), np.percentile(samples, 95)
+
+
+def recall(results, truth):
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth) if t]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma vs in-memory NumPy vector search: latency and recall")
+    parser.add_argument("--synthetic", action="store_true", help="Benchmark a synthetic 1000 x 1536 collection instead of ./chroma_db")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    store, tmp = load_store(not args.synthetic)
+    try:
+        snapshot_dir = tempfile.mkdtemp()
+        exact = NumpyVectorIndex.from_collection(store._collection)
+        exact.save(snapshot_dir)
+        backends = {
+            "numpy float32": exact,
+            "numpy float32 mmap": NumpyVectorIndex.load(snapshot_dir, mmap=True),
+            "numpy float16": NumpyVectorIndex.load(snapshot_dir, dtype="float16", mmap=False),
+        }
+        queries = make_queries(exact, args.queries)
+        scheme_filter = {"scheme_name": exact.metadatas[0].get("scheme_name")}
+        k, fetch_k = SEARCH_KWARGS["k"], SEARCH_KWARGS["fetch_k"]
+        print(f"{len(exact)} chunks x {exact.matrix.shape[1]} dims, {len(queries)} queries x {args.repeat}")
+
+        # Latency: the MMR call RAGService makes, unfiltered and with a scheme filter
+        print(f"\n{'MMR latency (ms)':<28} {'p50':>8} {'p95':>8} {'p50 filtered':>14}")
+        rows = [("chroma", store)] + list(backends.items())
+        for name, backend in rows:
+            p50, p95 = timed(lambda q: backend.max_marginal_relevance_search_by_vector(q, **SEARCH_KWARGS), queries, args.repeat)
+            f50, _ = timed(lambda q: backend.max_marginal_relevance_search_by_vector(q, filter=scheme_filter, **SEARCH_KWARGS), queries, args.repeat)
+            print(f"{name:<28} {p50:8.2f} {p95:8.2f} {f50:14.2f}")
+
+        # Recall against exact float32 search: top fetch_k candidates and the final MMR picks
+        truth = [[exact.ids[i] for i in exact.similarity(q, fetch_k)[0]] for q in queries]
+        truth_mmr = [[d.id for d in exact.max_marginal_relevance_search_by_vector(q, **SEARCH_KWARGS)] for q in queries]
+        print(f"\n{'Recall vs exact float32':<28} {'top-' + str(fetch_k):>8} {'MMR top-' + str(k):>10}")
+        chroma_top = [[d.id for d in store.similarity_search_by_vector(q, k=fetch_k)] for q in queries]
+        chroma_mmr = [[d.id for d in store.max_marginal_relevance_search_by_vector(q, **SEARCH_KWARGS)] for q in queries]
+        print(f"{'chroma (HNSW)':<28} {recall(chroma_top, truth):8.3f} {recall(chroma_mmr, truth_mmr):10.3f}")
+        half = backends["numpy float16"]
+        half_top = [[half.ids[i] for i in half.similarity(q, fetch_k)[0]] for q in queries]
+        half_mmr = [[d.id for d in half.max_marginal_relevance_search_by_vector(q, **SEARCH_KWARGS)] for q in queries]
+        print(f"{'numpy float16':<28} {recall(half_top, truth):8.3f} {recall(half_mmr, truth_mmr):10.3f}")
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Multi-process serving benchmark: throughput and per-worker memory.
+
+Builds a synthetic corpus (see bench_pipeline.py) once, then for each worker
+count starts that many processes that each construct a RAGService with the
+deterministic stand-in providers and answer questions as fast as they can
+for --duration seconds (answer cache off, so every query runs retrieval and
+generation). Reports total throughput, scaling efficiency against one worker
+and each worker's memory from /proc/<pid>/smaps_rollup (Linux):
+  rss  resident pages, shared ones counted in full
+  pss  shared pages divided between the processes mapping them
+  uss  pages private to the worker
+With VECTOR_BACKEND=snapshot the vectors and chunk texts are mapped from the
+same files by every worker, so they show up in rss but not in uss.
+
+    python scripts/bench_workers.py --workers 1 2 4 --chunks 20000
+    python scripts/bench_workers.py --backend chroma snapshot --output bench_results/workers.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import multiprocessing as mp
+from datetime import datetime, timezone
+
+# Ensure root directory is in sys.path so backend modules are importable
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from bench_pipeline import StandInEmbeddings, StandInChatModel, build_corpus, make_questions, git_commit
+
+
+def memory_kib(pid="self"):
+    """
+    rss / pss / uss of a process in KiB, or None where smaps_rollup is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def worker(corpus_dir, backend, questions, duration, llm_latency, ready, start, results):
+    os.environ.update({
+        "CHROMA_DB_DIR": corpus_dir,
+        "VECTOR_BACKEND": backend,
+        "EMBEDDING_CACHE_DIR": "",
+        "ANSWER_CACHE_SIZE": "0",
+        "AUDIT_LOG": "0",
+    })
+    from src.backend.rag_engine import RAGService
+
+    service = RAGService(embeddings=StandInEmbeddings(), llm=StandInChatModel(latency=llm_latency))
+    service.warm_up()
+    ready.wait()
+    start.wait()
+    done = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        service.query(questions[done % len(questions)])
+        done += 1
+    results.put({"pid": os.getpid(), "queries": done, "memory_kib": memory_kib()})
+
+
+def run(corpus_dir, backend, n_workers, questions, duration, llm_latency):
+    ctx = mp.get_context("spawn")
+    ready = ctx.Barrier(n_workers + 1)
+    start = ctx.Barrier(n_workers + 1)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(corpus_dir, backend, questions, duration, llm_latency, ready, start, results))
+        for _ in range(n_workers)
+    ]
+    for p in processes:
+        p.start()
+    ready.wait()  # every worker has built and warmed up its service
+    start.wait()
+    workers = [results.get(timeout=duration + 300) for _ in processes]
+    for p in processes:
+        p.join()
+    total = sum(w["queries"] for w in workers)
+    return {"workers": n_workers, "throughput_qps": round(total / duration, 2), "per_worker": workers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process RAGService throughput and memory")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--backend", nargs="+", default=["snapshot"], choices=["snapshot", "numpy", "chroma"])
+    parser.add_argument("--chunks", type=int, default=5000, help="Synthetic corpus size")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds each run serves queries")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Stand-in LLM seconds per answer")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    corpus_dir = tempfile.mkdtemp(prefix="bench_workers_")
+    try:
+        build_corpus(corpus_dir, StandInEmbeddings(), args.chunks)
+        questions = make_questions(200)
+        runs = []
+        for backend in args.backend:
+            baseline = None
+            for n in args.workers:
+                result = run(corpus_dir, backend, n, questions, args.duration, args.llm_latency)
+                result["backend"] = backend
+                baseline = baseline or result["throughput_qps"] / n
+                result["scaling_efficiency"] = round(result["throughput_qps"] / (n * baseline), 3) if baseline else None
+                memory = [w["memory_kib"] for w in result["per_worker"] if w["memory_kib"]]
+                if memory:
+                    result["mean_worker_mib"] = {
+                        key: round(sum(m[key] for m in memory) / len(memory) / 1024, 1) for key in ("rss", "pss", "uss")
+                    }
+                runs.append(result)
+                mem = result.get("mean_worker_mib", {})
+                print(f"{backend:<9} {n:>2} workers  {result['throughput_qps']:9.1f} q/s  "
+                      f"efficiency {result['scaling_efficiency']}  per worker MiB "
+                      f"rss {mem.get('rss', '-')} pss {mem.get('pss', '-')} uss {mem.get('uss', '-')}")
+
+        result = {
+            "benchmark": "workers",
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "config": {"chunks": args.chunks, "duration": args.duration, "llm_latency": args.llm_latency},
+            "runs": runs,
+        }
+        if max(args.workers) > (os.cpu_count() or 1):
+            print(f"Note: only {os.cpu_count()} CPUs; runs with more workers cannot scale linearly.")
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print(f"Saved results to {args.output}")
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
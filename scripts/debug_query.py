@@ -6,15 +6,21 @@ def test_query():
     query = "What is the exit load for HDFC Top 100?"
     
     # Manually get docs to see what's being retrieved
-    docs = rag.retriever.invoke(query)
+    docs, timings = rag.retrieve_with_timings(query)
     print("\n--- RETRIEVED CONTEXT ---")
     for i, doc in enumerate(docs):
-        print(f"Doc {i+1}: {doc.metadata.get('source', 'Unknown')}")
+        score = doc.metadata.get('rerank_score')
+        score_note = f" (rerank score {score:.3f})" if score is not None else ""
+        print(f"Doc {i+1}: {doc.metadata.get('source', 'Unknown')}{score_note}")
         # Use ascii for safety in console or just replace known issues
         content = doc.page_content[:500].replace('\u25cf', '*')
         print(f"Content: {content}")
         print("-" * 20)
     
+    print("\n--- STAGE LATENCY ---")
+    for name, seconds in timings.items():
+        print(f"{name}: {seconds * 1000:.1f} ms")
+
     # Get full response
     response = rag.query(query)
     print("\n--- ASSISTANT RESPONSE ---")
@@ -0,0 +1,88 @@
+"""
+Measures the advisory/off-topic pre-check (src/backend/query_classifier.py)
+against a labelled query set: refusal precision and recall, per-label results,
+the misclassified queries and per-query latency.
+
+    python scripts/eval_classifier.py
+    python scripts/eval_classifier.py --data my_queries.jsonl --margin 0.1
+
+Each line of the data file is {"query": ..., "label": "factual"|"advice"|"off_topic"}.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+# Ensure root directory is in sys.path so backend modules are importable
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.query_classifier import QueryClassifier
+
+DEFAULT_DATA = os.path.join(root_path, "tests", "data", "classifier_queries.jsonl")
+LABELS = ["factual", "advice", "off_topic"]
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(classifier, rows):
+    """
+    Returns (predicted labels, refusal precision, refusal recall); "factual"
+    stands for "not refused".
+    """
+    predicted = []
+    for row in rows:
+        verdict = classifier.classify(row["query"])
+        predicted.append(verdict[0] if verdict else "factual")
+    refused = [p != "factual" for p in predicted]
+    should = [row["label"] != "factual" for row in rows]
+    true_positive = sum(r and s for r, s in zip(refused, should))
+    precision = true_positive / sum(refused) if any(refused) else 1.0
+    recall = true_positive / sum(should) if any(should) else 1.0
+    return predicted, precision, recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the advisory/off-topic pre-check")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="Labelled JSONL query set")
+    parser.add_argument("--margin", type=float, default=0.12)
+    parser.add_argument("--min-score", type=float, default=0.25)
+    parser.add_argument("--repeat", type=int, default=50, help="Timing passes over the set")
+    args = parser.parse_args()
+
+    rows = load(args.data)
+    classifier = QueryClassifier(margin=args.margin, min_score=args.min_score)
+    predicted, precision, recall = evaluate(classifier, rows)
+
+    print(f"{len(rows)} queries from {args.data}")
+    print(f"Refusal precision {precision:.3f}  recall {recall:.3f}")
+    for label in LABELS:
+        total = sum(row["label"] == label for row in rows)
+        hits = sum(row["label"] == label and p == label for row, p in zip(rows, predicted))
+        print(f"  {label:<10} {hits}/{total} classified as {label}")
+
+    wrong = [(row, p) for row, p in zip(rows, predicted) if p != row["label"]]
+    if wrong:
+        print("Misclassified:")
+        for row, p in wrong:
+            print(f"  {row['label']:>9} -> {p:<9} {row['query']!r}")
+
+    samples = []
+    for _ in range(args.repeat):
+        for row in rows:
+            start = time.perf_counter()
+            classifier.classify(row["query"])
+            samples.append(time.perf_counter() - start)
+    us = np.array(samples) * 1e6
+    print(f"Latency per query: p50 {np.percentile(us, 50):.1f} us  p99 {np.percentile(us, 99):.1f} us  max {us.max():.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,56 @@
 import os
-import glob
+import sys
+import json
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 import shutil
-import time
 import re
 from tqdm import tqdm
 
+# Ensure root directory is in sys.path so shared backend helpers are importable
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.embedding_cache import CachedEmbeddings
+from src.backend.embedding_writer import EmbeddingWriter
+from src.backend.index_stamp import write_stamp
+from src.backend.lexical_index import BM25Index, BM25_INDEX_FILENAME
+from src.backend.vector_index import NumpyVectorIndex, VECTOR_SNAPSHOT_FILENAME
+from src.backend.citations import CitationResolver
+from src.backend.faq_store import FAQStore, FAQ_STORE_FILENAME, build_faq_store
+from src.backend.fact_store import FactStoreBuilder, FACT_STORE_FILENAME, extract_facts, fact_document_rank
+from src.backend.rag_engine import RAGService, CHROMA_DB_DIR, EMBEDDING_CACHE_DIR
+
 # Load environment variables
 load_dotenv()
 
-# Configuration
+# Configuration (CHROMA_DB_DIR and EMBEDDING_CACHE_DIR are shared with the serving
+# engine, so ingest writes the store queries are answered from wherever it runs)
 RAW_DATA_DIR = "./raw"
-CHROMA_DB_DIR = "./chroma_db"
 EMBEDDING_MODEL = "text-embedding-3-small"
+MANIFEST_PATH = os.path.join(CHROMA_DB_DIR, "ingest_manifest.json")
+CHECKPOINT_PATH = os.path.join(CHROMA_DB_DIR, "ingest_checkpoint.jsonl")
+BM25_INDEX_PATH = os.path.join(CHROMA_DB_DIR, BM25_INDEX_FILENAME)
+VECTOR_SNAPSHOT_PATH = os.path.join(CHROMA_DB_DIR, VECTOR_SNAPSHOT_FILENAME)
+FAQ_STORE_PATH = os.path.join(CHROMA_DB_DIR, FAQ_STORE_FILENAME)
+FACT_STORE_PATH = os.path.join(CHROMA_DB_DIR, FACT_STORE_FILENAME)
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+
+# Embedding writer: batch size, concurrent batches and provider rate limits
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "50"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_RPM = int(os.getenv("EMBED_RPM", "3000"))
+EMBED_TPM = int(os.getenv("EMBED_TPM", "1000000"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
 
 def parse_metadata(file_path):
     """
@@ -72,16 +106,225 @@ def parse_metadata(file_path):
     
     return metadata
 
-def ingest_data():
+def file_sha256(path):
+    """
+    Content hash of a source file, used to detect new/changed/unchanged PDFs.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def file_key(pdf_path):
+    """
+    Stable manifest key for a PDF: its path relative to RAW_DATA_DIR with forward slashes.
+    """
+    return os.path.relpath(pdf_path, RAW_DATA_DIR).replace('\\', '/')
+
+def assign_chunk_ids(key, chunks):
+    """
+    Deterministic chunk IDs: sha256 of the file key and the enriched chunk text.
+    Identical chunks within one file get an occurrence suffix so IDs stay unique.
+    The ID is also stored in metadata['chunk_id'] for citation/audit purposes.
+    """
+    seen = {}
+    ids = []
+    for chunk in chunks:
+        digest = hashlib.sha256(f"{key}\n{chunk.page_content}".encode("utf-8")).hexdigest()[:32]
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        cid = digest if n == 0 else f"{digest}-{n}"
+        chunk.metadata["chunk_id"] = cid
+        ids.append(cid)
+    return ids
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Failed to read ingest manifest, doing a full rebuild: {e}")
+        return None
+
+def manifest_chunk_ids(files):
+    """
+    Every chunk ID the manifest accounts for: the recorded chunks of each file plus
+    chunks already written for a file whose run failed (pending_ids).
+    """
+    ids = set()
+    for entry in files.values():
+        ids.update(entry.get("chunk_ids", []))
+        ids.update(entry.get("pending_ids", []))
+    return ids
+
+def save_manifest(manifest):
+    os.makedirs(CHROMA_DB_DIR, exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+_citations = None
+
+def resolve_public_url(file_meta):
+    """
+    Citation link for a file, resolved once here so serving only reads metadata['public_url'].
+    """
+    global _citations
+    if _citations is None:
+        _citations = CitationResolver.from_base_dir(os.path.dirname(os.path.abspath(RAW_DATA_DIR)))
+    return _citations.resolve(file_meta)
+
+def make_text_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1024,
+        chunk_overlap=100,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+def iter_file_chunks(pdf_path, text_splitter):
+    """
+    Streams enriched chunks of one PDF page by page: each page is loaded lazily,
+    enriched with file metadata, split, and has the metadata header prepended,
+    so only one page is held in memory at a time.
+    """
+    # Enrich metadata
+    file_meta = parse_metadata(pdf_path)
+    file_meta["public_url"] = resolve_public_url(file_meta)
+    for page in PyMuPDFLoader(pdf_path).lazy_load():
+        page.metadata.update(file_meta)
+        for chunk in text_splitter.split_documents([page]):
+            # Enrichment: Prepend detailed metadata to content for better retrieval
+            meta = chunk.metadata
+            header = f"File: {meta.get('file_name')}\nScheme: {meta.get('scheme_name')}\nDocument: {meta.get('document_name')}\nDate: {meta.get('date_of_the_document')}\n"
+            chunk.page_content = f"{header}Content: {chunk.page_content}"
+            yield chunk
+
+def extract_file(key, pdf_path):
+    """
+    Process-pool worker: extracts, splits and IDs all chunks of one PDF.
+    Returns (key, chunks, ids, error).
+    """
+    try:
+        chunks = list(iter_file_chunks(pdf_path, make_text_splitter()))
+        ids = assign_chunk_ids(key, chunks)
+        return key, chunks, ids, None
+    except Exception as e:
+        return key, [], [], str(e)
+
+def iter_extracted(jobs, workers):
+    """
+    Runs extract_file over (key, path) jobs in a process pool and yields results as
+    files finish. At most 2 * workers files are in flight, so peak memory is bounded
+    by a handful of PDFs rather than the whole corpus.
+    """
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for key, path in itertools.islice(jobs, workers * 2):
+            in_flight.add(pool.submit(extract_file, key, path))
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                for key, path in itertools.islice(jobs, 1):
+                    in_flight.add(pool.submit(extract_file, key, path))
+                yield future.result()
+
+def build_lexical_index(vector_store):
+    """
+    Rebuilds the BM25 inverted index over every chunk in the collection.
+    Takes milliseconds for this corpus, so it is simply redone after each ingest.
+    """
+    data = vector_store.get(include=["documents", "metadatas"])
+    index = BM25Index.build(data["ids"], data["documents"], data["metadatas"])
+    index.save(BM25_INDEX_PATH)
+    print(f"Built BM25 index over {len(data['ids'])} chunks ({len(index.postings)} terms).")
+
+def build_vector_snapshot(vector_store):
+    """
+    Dumps every chunk embedding into the memory-mappable matrix the NumPy search
+    backend (VECTOR_BACKEND=numpy) loads at startup.
+    """
+    index = NumpyVectorIndex.from_collection(vector_store._collection, dtype=VECTOR_DTYPE)
+    index.save(CHROMA_DB_DIR)
+    print(f"Wrote vector snapshot: {index.matrix.shape[0]} x {index.matrix.shape[1]} {VECTOR_DTYPE}.")
+
+def build_fact_store(current):
     """
-    Ingests PDF files from RAW_DATA_DIR, chunks them, and stores embeddings in ChromaDB.
+    Extracts the fact tables (expense ratio, AUM, exit load, holdings, ...) of the
+    Fund Facts, Factsheet and KIM PDFs into the SQLite fact store. Files whose
+    hash did not change keep their rows; the store is updated on a copy and
+    swapped in, so serving processes never read a half-written file.
+    """
+    tmp_path = FACT_STORE_PATH + ".tmp"
+    if os.path.exists(FACT_STORE_PATH):
+        shutil.copyfile(FACT_STORE_PATH, tmp_path)
+    elif os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    builder = FactStoreBuilder(tmp_path)
+    try:
+        fact_files = {}
+        for key, (path, sha) in current.items():
+            file_meta = parse_metadata(path)
+            if fact_document_rank(file_meta["document_name"]) is not None:
+                fact_files[key] = (path, sha, file_meta)
+        for key in [key for key in builder.known if key not in fact_files]:
+            builder.remove(key)
+        changed = [key for key, (_, sha, _) in fact_files.items() if builder.known.get(key) != sha]
+        for key in tqdm(changed, desc="Extracting facts"):
+            path, sha, file_meta = fact_files[key]
+            file_meta["public_url"] = resolve_public_url(file_meta)
+            try:
+                builder.replace(key, sha, file_meta, extract_facts(path))
+            except Exception as e:
+                print(f"Warning: Could not extract facts from {path}: {e}")
+        print(f"Fact store holds {builder.count()} facts from {len(fact_files)} files ({len(changed)} re-extracted).")
+    finally:
+        builder.close()
+    os.replace(tmp_path, FACT_STORE_PATH)
+
+def build_faq_answers(vector_store, rebuild=False):
+    """
+    Regenerates the precomputed answers to the canonical FAQ questions against the
+    freshly written indexes. Answers whose retrieved chunks did not change are
+    reused (unless rebuild), so a re-ingest only pays LLM calls for affected ones.
+    """
+    previous = None
+    if os.path.exists(FAQ_STORE_PATH):
+        if not rebuild:
+            try:
+                previous = FAQStore.load(CHROMA_DB_DIR)
+            except Exception as e:
+                print(f"Warning: Could not read the previous FAQ store: {e}")
+        # Never leave answers behind that were generated from other chunks
+        os.remove(FAQ_STORE_PATH)
+    try:
+        # Generation goes through the serving pipeline; these are not user questions
+        store, generated = build_faq_store(RAGService(audit_log=False), previous=previous)
+        store.save(CHROMA_DB_DIR)
+        print(f"Precomputed {len(store.entries)} FAQ answers ({generated} generated by the LLM).")
+    except Exception as e:
+        print(f"Warning: FAQ answers were not precomputed: {e}")
+
+def ingest_data(full_rebuild=False, rebuild_faq=False, embeddings=None):
+    """
+    Incrementally ingests PDF files from RAW_DATA_DIR into ChromaDB.
+
+    A manifest of file hashes and chunk IDs (MANIFEST_PATH) makes re-runs idempotent:
+    unchanged PDFs are skipped, only chunks that are new in a changed PDF are embedded,
+    chunks kept from the previous version get their metadata (page, citation URL)
+    refreshed, and every chunk ID the manifest no longer accounts for after the run is
+    removed. embeddings replaces the cached OpenAI embeddings (no API key needed).
     """
     # 1. Check if raw directory exists
     if not os.path.exists(RAW_DATA_DIR):
         print(f"Error: Raw data directory '{RAW_DATA_DIR}' not found.")
         return
 
-    # 2. Load PDF files
+    # 2. Find PDF files and diff them against the manifest
     # Recursive search for PDFs using os.walk
     pdf_files = []
     for root, dirs, files in os.walk(RAW_DATA_DIR):
@@ -93,98 +336,177 @@ def ingest_data():
         print(f"No PDF files found in '{RAW_DATA_DIR}' or its subdirectories.")
         return
 
-    print(f"Found {len(pdf_files)} PDF files. Loading...")
-
-    documents = []
-    for pdf_path in pdf_files:
-        try:
-            loader = PyMuPDFLoader(pdf_path)
-            docs = loader.load()
-            
-            # Enrich metadata
-            filename = os.path.basename(pdf_path)
-            file_meta = parse_metadata(pdf_path)
-            for doc in docs:
-                doc.metadata.update(file_meta)
-                
-            documents.extend(docs)
-            print(f"Loaded {len(docs)} pages from {filename}")
-        except Exception as e:
-            print(f"Failed to load {pdf_path}: {e}")
-
-    print(f"Total documents loaded: {len(documents)}")
-
-    if not documents:
-        print("No documents loaded to process.")
-        return
-
-    # 3. Split Text
-    print("Splitting text...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1024,
-        chunk_overlap=100,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    chunks = text_splitter.split_documents(documents)
-    
-    # Enrichment: Prepend detailed metadata to content for better retrieval
-    for chunk in chunks:
-        meta = chunk.metadata
-        header = f"File: {meta.get('file_name')}\nScheme: {meta.get('scheme_name')}\nDocument: {meta.get('document_name')}\nDate: {meta.get('date_of_the_document')}\n"
-        chunk.page_content = f"{header}Content: {chunk.page_content}"
-    
-    print(f"Created {len(chunks)} enriched chunks.")
+    print(f"Found {len(pdf_files)} PDF files. Hashing...")
+    current = {file_key(path): (path, file_sha256(path)) for path in pdf_files}
 
-    # 4. Initialize Embeddings
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("Error: OPENAI_API_KEY not found in environment variables.")
-        return
+    # 3. Initialize Embeddings
+    if embeddings is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            print("Error: OPENAI_API_KEY not found in environment variables.")
+            return
 
-    embeddings = OpenAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        openai_api_key=api_key
-    )
+        # Cached so re-ingesting unchanged text never re-embeds it.
+        # Client-side retries are off: EmbeddingWriter owns backoff and rate limiting.
+        embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(
+                model=EMBEDDING_MODEL,
+                openai_api_key=api_key,
+                max_retries=0
+            ),
+            cache_dir=EMBEDDING_CACHE_DIR,
+            model_name=EMBEDDING_MODEL
+        )
 
-    # 5. Create/Update Vector Store
     print(f"Creating/Updating ChromaDB at '{CHROMA_DB_DIR}'...")
-    
     try:
-
-        batch_size = 50
-        delay = 2 # seconds
-
-        # We can't easily initialize an empty Chroma like FAISS without documents or a collection name.
-        # But we can look for existing DB.
-        
-        # For simplicity, we initialize with first batch or load existing.
-        # If we use Chroma(persist_directory=...) it loads existing.
-        
         vector_store = Chroma(
             collection_name="hdfc_mutual_fund",
             embedding_function=embeddings,
             persist_directory=CHROMA_DB_DIR
         )
 
-        # Process batches
-        print(f"Ingesting {len(chunks)} chunks in batches of {batch_size}...")
-        for i in tqdm(range(0, len(chunks), batch_size), desc="Ingesting batches"):
-            batch = chunks[i : i + batch_size]
-            try:
-                vector_store.add_documents(batch)
-                time.sleep(delay)
-            except Exception as e:
-                print(f"Error adding batch {i}: {e}")
-                time.sleep(10)
-                try:
-                     vector_store.add_documents(batch)
-                except:
-                    print(f"Skipping batch {i} after retry.")
+        if full_rebuild and os.path.exists(CHECKPOINT_PATH):
+            os.remove(CHECKPOINT_PATH)
+
+        manifest = None if full_rebuild else load_manifest()
+        if manifest is None:
+            # No manifest means chunk IDs in the collection are unknown (e.g. random IDs
+            # from older ingests), so start from an empty collection to avoid duplicates.
+            # A checkpoint means an interrupted run of this script wrote them: resume instead.
+            if vector_store._collection.count() > 0 and not os.path.exists(CHECKPOINT_PATH):
+                print("No usable ingest manifest found. Rebuilding the collection from scratch...")
+                vector_store.reset_collection()
+            manifest = {"files": {}}
+        known = manifest.setdefault("files", {})
+        ids_before = manifest_chunk_ids(known)
+
+        removed = [key for key in known if key not in current]
+        changed = [key for key, (_, sha) in current.items() if known.get(key, {}).get("sha256") != sha]
+
+        if not removed and not changed:
+            missing_indexes = [
+                build for path, build in ((BM25_INDEX_PATH, build_lexical_index), (VECTOR_SNAPSHOT_PATH, build_vector_snapshot))
+                if not os.path.exists(path)
+            ]
+            if not os.path.exists(FACT_STORE_PATH):
+                missing_indexes.append(lambda store: build_fact_store(current))
+            if rebuild_faq or not os.path.exists(FAQ_STORE_PATH):
+                missing_indexes.append(lambda store: build_faq_answers(store, rebuild=rebuild_faq))
+            for build in missing_indexes:
+                build(vector_store)
+            if missing_indexes:
+                write_stamp(CHROMA_DB_DIR)
+            print("Index is up to date. Nothing to ingest.")
+            return
+
+        print(f"{len(changed)} new/changed and {len(removed)} removed PDF files.")
+
+        # 4. Forget PDFs that disappeared (their chunks are deleted in step 7)
+        for key in removed:
+            del known[key]
+            print(f"Removing chunks of deleted file {key}")
+
+        # 5. Extract new/changed PDFs in parallel and stream their chunks to the writer
+        def store_batch(ids, texts, vectors, docs):
+            vector_store._collection.upsert(
+                ids=ids,
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[doc.metadata for doc in docs]
+            )
+
+        writer = EmbeddingWriter(
+            embeddings.embed_documents,
+            store_batch,
+            checkpoint_path=CHECKPOINT_PATH,
+            batch_size=EMBED_BATCH_SIZE,
+            max_in_flight=EMBED_MAX_IN_FLIGHT,
+            requests_per_minute=EMBED_RPM,
+            tokens_per_minute=EMBED_TPM,
+            max_retries=EMBED_MAX_RETRIES
+        )
+        if writer.done_ids:
+            print(f"Resuming: {len(writer.done_ids)} chunks already written by an interrupted run.")
+
+        pending = {}        # key -> (sha256, chunk ids, queued chunk ids, metadata of kept chunks)
+        chunk_files = {}    # chunk id -> key, to map failed chunks back to their file
+
+        def new_chunks():
+            jobs = [(key, current[key][0]) for key in changed]
+            print(f"Extracting {len(jobs)} PDF files with {INGEST_WORKERS} workers...")
+            for key, chunks, ids, error in tqdm(iter_extracted(jobs, INGEST_WORKERS), total=len(jobs), desc="Ingesting files"):
+                if error:
+                    print(f"Failed to load {current[key][0]}: {error}")
+                    continue
+                print(f"Extracted {len(chunks)} chunks from {key}")
+
+                # 6. Queue only chunks that are not already in the collection; the
+                # ones that are keep their embedding but get this version's metadata
+                old_ids = manifest_chunk_ids({key: known.get(key, {})})
+                queued, kept = [], {}
+                pending[key] = (current[key][1], ids, queued, kept)
+                for cid, chunk in zip(ids, chunks):
+                    if cid in old_ids:
+                        kept[cid] = chunk.metadata
+                    else:
+                        queued.append(cid)
+                        chunk_files[cid] = key
+                        yield cid, chunk.page_content, chunk
+
+        result = writer.write(new_chunks())
+        failed_keys = {chunk_files[cid] for cid in result["failed_ids"]}
+        print(
+            f"Embedded and stored {result['written']} new chunks "
+            f"({result['skipped']} already done, {len(result['failed_ids'])} failed, "
+            f"{result['retries']} retries, {result['rate_limited']} rate-limited)."
+        )
+
+        # 7. Record files whose chunks were all written, then delete every chunk the
+        # manifest no longer accounts for (stale chunks of changed files, chunks of
+        # deleted files). Deleting before saving keeps a crash in between safe: the
+        # old manifest still lists the files, so the next run redoes them.
+        failed_ids = set(result["failed_ids"])
+        for key, (sha, ids, queued, kept) in pending.items():
+            if key in failed_keys:
+                # Keep serving the previous version; track what was written so it is
+                # removed if the file is deleted before the retry succeeds
+                print(f"Not recording {key} in manifest; it will be retried on the next run.")
+                entry = known.setdefault(key, {"sha256": None, "chunk_ids": []})
+                entry["pending_ids"] = sorted(set(entry.get("pending_ids", [])) | {cid for cid in queued if cid not in failed_ids})
+                continue
+            kept_ids = list(kept)
+            for start in range(0, len(kept_ids), EMBED_BATCH_SIZE):
+                batch = kept_ids[start:start + EMBED_BATCH_SIZE]
+                vector_store._collection.update(ids=batch, metadatas=[kept[cid] for cid in batch])
+            known[key] = {"sha256": sha, "chunk_ids": ids}
+
+        gone = sorted(ids_before - manifest_chunk_ids(known))
+        for start in range(0, len(gone), EMBED_BATCH_SIZE):
+            vector_store.delete(ids=gone[start:start + EMBED_BATCH_SIZE])
+        if gone:
+            print(f"Deleted {len(gone)} chunks no longer in any ingested file.")
+        save_manifest(manifest)
+        if not failed_keys:
+            writer.clear_checkpoint()
+
+        # 8. Rebuild the lexical (BM25) index, the vector snapshot and the fact table
+        # used at query time, then the precomputed FAQ answers that depend on them
+        build_lexical_index(vector_store)
+        build_vector_snapshot(vector_store)
+        build_fact_store(current)
+        build_faq_answers(vector_store, rebuild=rebuild_faq)
 
+        # Signal serving processes that derived caches are now stale
+        write_stamp(CHROMA_DB_DIR)
         print("Ingestion complete. Data stored in ChromaDB.")
         
     except Exception as e:
         print(f"Error creating ChromaDB: {e}")
 
 if __name__ == "__main__":
-    ingest_data()
+    parser = argparse.ArgumentParser(description="Ingest PDFs from ./raw into ChromaDB")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and rebuild the collection from scratch")
+    parser.add_argument("--rebuild-faq", action="store_true", help="Regenerate every precomputed FAQ answer")
+    args = parser.parse_args()
+    ingest_data(full_rebuild=args.full, rebuild_faq=args.rebuild_faq)
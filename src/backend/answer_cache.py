@@ -0,0 +1,188 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .query_router import detect_schemes
+
+
+def normalize_question(question):
+    """
+    Canonical form used as the exact-match cache key:
+    lowercase, punctuation stripped, whitespace collapsed.
+    """
+    text = question.lower()
+    text = re.sub(r"[^\w\s%.-]", " ", text)
+    text = re.sub(r"(?<!\d)[.-]|[.-](?!\d)", " ", text)
+    return " ".join(text.split())
+
+
+class AnswerCache:
+    """
+    Two-tier answer cache in front of the RAG chain.
+
+    Tier 1 is an exact lookup on the normalized question. Tier 2 compares the
+    query embedding against embeddings of previously answered questions and
+    returns the stored answer when cosine similarity is above the threshold
+    and both questions name the same schemes (questions that differ only in
+    the scheme embed almost identically).
+    Entries are evicted LRU beyond max_size and expire after ttl seconds.
+    The whole cache is dropped whenever version_fn() changes (i.e. the
+    collection was re-ingested).
+    """
+
+    def __init__(self, max_size=512, ttl=3600, similarity_threshold=0.95, version_fn=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.version_fn = version_fn
+
+        self._entries = OrderedDict()  # key -> (answer, unit vector or None, created_at, schemes)
+        self._lock = threading.Lock()
+        self._version = version_fn() if version_fn else None
+
+        # Dense copy of the entry vectors for tier 2, rebuilt lazily after writes
+        self._matrix = None
+        self._matrix_keys = []
+        self._matrix_dirty = False
+
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses_exact = 0
+        self.misses_semantic = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, question):
+        """Tier 1: exact match on the normalized question."""
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses_exact += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits_exact += 1
+            return entry[0]
+
+    def get_similar(self, question, vector):
+        """
+        Tier 2: nearest previously answered question by embedding that names
+        the same schemes as question. Callers should only reach this after
+        get() has missed, so every question counts once in the overall hit rate.
+        """
+        now = time.time()
+        schemes = _schemes(question)
+        with self._lock:
+            self._check_version()
+            matrix = self._get_matrix()
+            if matrix is None or vector is None:
+                self.misses_semantic += 1
+                return None
+
+            scores = matrix @ _unit(vector)
+            keys = self._matrix_keys
+            for i in np.argsort(-scores):
+                if scores[i] < self.similarity_threshold:
+                    break
+                key = keys[i]
+                entry = self._entries.get(key)
+                if entry is None or entry[3] != schemes:
+                    continue
+                if self._expired(entry, now):
+                    self._remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits_semantic += 1
+                return entry[0]
+            self.misses_semantic += 1
+            return None
+
+    def put(self, question, vector, answer):
+        key = normalize_question(question)
+        unit = _unit(vector) if vector is not None else None
+        with self._lock:
+            self._check_version()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (answer, unit, time.time(), _schemes(question))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix_dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_keys = []
+            self._matrix_dirty = False
+
+    def stats(self):
+        """
+        Counters per tier. hit_rate is the share of questions (exact lookups)
+        answered by either tier; hit_rate_semantic is over the questions that
+        reached tier 2.
+        """
+        with self._lock:
+            questions = self.hits_exact + self.misses_exact
+            semantic = self.hits_semantic + self.misses_semantic
+            return {
+                "size": len(self._entries),
+                "hits_exact": self.hits_exact,
+                "misses_exact": self.misses_exact,
+                "hits_semantic": self.hits_semantic,
+                "misses_semantic": self.misses_semantic,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": (self.hits_exact + self.hits_semantic) / questions if questions else 0.0,
+                "hit_rate_exact": self.hits_exact / questions if questions else 0.0,
+                "hit_rate_semantic": self.hits_semantic / semantic if semantic else 0.0,
+            }
+
+    # --- internals (caller holds self._lock) ---
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry[2] > self.ttl
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._matrix_dirty = True
+
+    def _check_version(self):
+        if not self.version_fn:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._version = version
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_keys = []
+            self._matrix_dirty = False
+
+    def _get_matrix(self):
+        if self._matrix_dirty:
+            keys = [k for k, e in self._entries.items() if e[1] is not None]
+            self._matrix_keys = keys
+            self._matrix = np.vstack([self._entries[k][1] for k in keys]) if keys else None
+            self._matrix_dirty = False
+        return self._matrix
+
+
+def _schemes(question):
+    return tuple(sorted(detect_schemes(question)))
+
+
+def _unit(vector):
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
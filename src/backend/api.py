@@ -1,34 +1,187 @@
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from .rag_engine import RAGService
-import uvicorn
+from .engine_loader import EngineLoader
+from .metrics import REGISTRY, render as render_metrics
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+# Open a provider connection from the serving loop before reporting ready
+WARMUP_PRIME_CLIENTS = os.getenv("WARMUP_PRIME_CLIENTS", "1") == "1"
+
+# The RAG engine (langchain, chromadb, OpenAI clients) is imported and built in a
+# background thread started by the lifespan hook, so uvicorn binds immediately;
+# /ready reports when it can take traffic.
+engine = EngineLoader()
+
+# Seconds per startup phase, reported by /ready and /metrics
+startup = {"api_import": time.perf_counter() - _IMPORT_START}
+_ready = False
+
+
+async def _warm_up():
+    global _ready
+    started = time.perf_counter()
+    service = await asyncio.to_thread(engine.get)
+    startup.update({f"engine_{phase}": seconds for phase, seconds in engine.timings.items()})
+    if service is None:
+        return
+    if WARMUP_PRIME_CLIENTS:
+        prime_start = time.perf_counter()
+        try:
+            await service.aprime_clients()
+        except Exception as e:
+            print(f"Warning: Could not prime provider connection: {e}")
+        startup["prime_clients"] = time.perf_counter() - prime_start
+    startup["ready"] = time.perf_counter() - started
+    _ready = True
+    print("RAG Service ready: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in startup.items()))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warm_up_task = asyncio.create_task(_warm_up())
+    yield
+    warm_up_task.cancel()
+
+
+app = FastAPI(title="HDFC Mutual Fund RAG API", lifespan=lifespan)
+
+
+def _startup_gauges():
+    gauges = [
+        ("rag_startup_seconds", "Seconds spent per startup phase.", {"phase": phase}, seconds)
+        for phase, seconds in startup.items()
+    ]
+    gauges.append(("rag_ready", "1 once the RAG engine is warmed up and serving.", None, int(_ready)))
+    return gauges
+
 
-app = FastAPI(title="HDFC Mutual Fund RAG API")
+# Cache and startup gauges are read at scrape time
+REGISTRY.gauge_callback(lambda: engine.service.cache_gauges() if engine.service else [])
+REGISTRY.gauge_callback(_startup_gauges)
 
-# Initialize RAG Service
-try:
-    rag_service = RAGService()
-except Exception as e:
-    print(f"Failed to initialize RAG Service: {e}")
-    rag_service = None
+
+def get_service():
+    """
+    The warmed-up RAG service, or 503 while it is still starting (or failed to start).
+    """
+    service = engine.service
+    if service is None:
+        if engine.state == "failed":
+            raise HTTPException(status_code=503, detail="RAG Service not available. Check server logs.")
+        raise HTTPException(status_code=503, detail="RAG Service is warming up.", headers={"Retry-After": "2"})
+    return service
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
 
 class QueryRequest(BaseModel):
     query: str
+    # Earlier turns of the conversation, oldest first; lets follow-ups such as
+    # "and its expense ratio?" be answered about the scheme asked about before
+    history: Optional[List[ChatMessage]] = None
+
+    def history_messages(self):
+        return [message.model_dump() for message in self.history or ()]
 
 class QueryResponse(BaseModel):
     answer: str
 
+class BatchRequest(BaseModel):
+    queries: List[str]
+    concurrency: Optional[int] = None
+
+class BatchItem(BaseModel):
+    answer: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItem]
+
 @app.post("/chat", response_model=QueryResponse)
 async def chat(request: QueryRequest):
-    if not rag_service:
-        raise HTTPException(status_code=503, detail="RAG Service not available. Check server logs.")
-    
-    answer = rag_service.query(request.query)
+    rag_service = get_service()
+    answer = await rag_service.aquery(request.query, history=request.history_messages())
     return QueryResponse(answer=answer)
 
+@app.post("/chat/batch", response_model=BatchResponse)
+async def chat_batch(request: BatchRequest):
+    """
+    Answers many questions in one request. Results are in input order;
+    a failed item carries `error` instead of failing the whole batch.
+    """
+    rag_service = get_service()
+    if len(request.queries) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {BATCH_MAX_SIZE} queries).")
+    if request.concurrency is not None and request.concurrency < 1:
+        raise HTTPException(status_code=422, detail="concurrency must be at least 1.")
+
+    results = await rag_service.aquery_many(request.queries, concurrency=request.concurrency)
+    return BatchResponse(results=[BatchItem(**r) for r in results])
+
+@app.post("/chat/stream")
+async def chat_stream(request: QueryRequest):
+    """
+    Server-sent events: one `data: {"token": ...}` event per generated chunk,
+    followed by a final `event: done`.
+    """
+    rag_service = get_service()
+
+    async def event_stream():
+        async for token in rag_service.astream(request.query, history=request.history_messages()):
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "rag_service": "connected" if rag_service else "disconnected"}
+    """
+    Liveness: 200 while the process is starting or serving, 503 once the
+    engine has failed to start (restarting the process is the only fix).
+    """
+    body = {"status": "ok", "rag_service": engine.state}
+    if engine.state == "failed":
+        body.update(status="error", error=f"{type(engine.error).__name__}: {engine.error}")
+        return JSONResponse(body, status_code=503)
+    return body
+
+@app.get("/ready")
+async def ready_check():
+    """
+    Readiness: 200 only once the engine is built, warmed up and its provider
+    connection primed; 503 before that. Includes the startup phase timings.
+    """
+    body = {"ready": _ready, "rag_service": engine.state, "startup_seconds": {k: round(v, 3) for k, v in startup.items()}}
+    return JSONResponse(body, status_code=200 if _ready else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus text exposition: request/stage latency histograms, retrieved
+    chunk counts, LLM token counts, error classes and cache gauges.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import uvicorn
+    # Several workers need VECTOR_BACKEND=snapshot (see README, Multi-worker serving)
+    workers = int(os.getenv("API_WORKERS", "1"))
+    if workers > 1:
+        uvicorn.run("src.backend.api:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,189 @@
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+# Outputs that mean the assistant declined to answer (system_prompt.md refusal templates)
+REFUSAL_MARKERS = (
+    "I am a facts-only assistant and cannot provide investment advice",
+    "I cannot find this information in the official documents",
+)
+
+AUDIT_FILE_PATTERN = "audit-*.jsonl.gz"
+
+_STOP = object()
+
+
+def is_refusal(output):
+    return bool(output) and any(marker in output for marker in REFUSAL_MARKERS)
+
+
+def audit_record(request):
+    """
+    The architecture.md section 6 record for one finished question: query,
+    retrieved chunk ids and scores, answer/refuse decision, output, timestamp,
+    plus outcome, latency and stage timings. A chunk's score is its rerank,
+    fusion or (plain MMR) vector similarity score, whichever the pipeline
+    ranked it by; similarity is its cosine similarity to the question.
+    """
+    if request.outcome in ("error", "cancelled"):
+        decision = request.outcome
+    else:
+        decision = "refuse" if is_refusal(request.answer) else "answer"
+    chunks = []
+    for rank, doc in enumerate(request.docs or (), start=1):
+        meta = doc.metadata
+        score = meta.get("rerank_score", meta.get("fusion_score", meta.get("similarity")))
+        chunks.append({
+            "rank": rank,
+            "id": doc.id or meta.get("chunk_id"),
+            "score": round(float(score), 6) if score is not None else None,
+            "similarity": round(float(meta["similarity"]), 6) if meta.get("similarity") is not None else None,
+            "scheme": meta.get("scheme_name"),
+            "file": meta.get("file_name"),
+            "page": meta.get("page"),
+        })
+    return {
+        "ts": datetime.fromtimestamp(request.wall_start, timezone.utc).isoformat(timespec="milliseconds"),
+        "request_id": request.request_id,
+        "path": request.path,
+        "query": request.question,
+        "rewritten_query": request.rewritten,
+        "outcome": request.outcome,
+        "decision": decision,
+        "chunks": chunks,
+        "output": request.answer,
+        "error": request.error,
+        "latency_ms": round(request.elapsed * 1000, 3),
+        "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in request.timings.items()},
+    }
+
+
+class AuditLogger:
+    """
+    Append-only audit trail written off the request path.
+
+    log() only enqueues the record (never blocks; records are dropped and
+    counted if the queue is full). A daemon writer thread drains the queue in
+    batches of up to batch_size or every flush_interval seconds and appends
+    each batch to the current file as its own gzip member, so a crash loses at
+    most the unflushed batch and every complete member stays readable. Files
+    are named audit-<UTC time>-<pid>.jsonl.gz (one writer per process), rotate
+    at max_bytes, and only the newest max_files are kept.
+    """
+
+    def __init__(self, directory, batch_size=100, flush_interval=1.0, max_bytes=10 * 1024 * 1024,
+                 max_files=50, max_queue=10000):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.written = 0
+        self.dropped = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._path = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, record):
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.0):
+        """
+        Flushes queued records and stops the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped, "file": self._path}
+
+    # --- writer thread ---
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False, default=str))
+            except Exception as e:
+                print(f"Warning: Skipping unserializable audit record: {e}")
+        if not lines:
+            return
+        data = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"))
+        try:
+            if self._path is None or os.path.getsize(self._path) + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self._path, "ab") as f:
+                f.write(data)
+            self.written += len(lines)
+        except OSError as e:
+            self.dropped += len(lines)
+            print(f"Warning: Failed to write audit log: {e}")
+
+    def _rotate(self):
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        self._path = os.path.join(self.directory, f"audit-{stamp}-{os.getpid()}.jsonl.gz")
+        open(self._path, "ab").close()
+        files = sorted(glob.glob(os.path.join(self.directory, AUDIT_FILE_PATTERN)))
+        for old in files[:-self.max_files] if self.max_files else []:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def iter_records(directory):
+    """
+    Yields audit records from every log file in directory, oldest file first.
+    A truncated final gzip member (writer killed mid-batch) ends that file quietly.
+    """
+    for path in sorted(glob.glob(os.path.join(directory, AUDIT_FILE_PATTERN))):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+        except (EOFError, zlib.error, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            print(f"Warning: Stopped reading {os.path.basename(path)} early: {e}")
@@ -0,0 +1,150 @@
+import os
+import json
+
+# Specific PDF Mapping (User Provided): file name -> public PDF link
+PDF_URL_MAP = {
+    # HDFC LARGE CAP FUND
+    "HDFC_LargeCapFund_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20Large%20Cap%20Fund%20dated%20November%2021%2C%202025_0.pdf",
+    "HDFC_LargeCapFund_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20Large%20Cap%20Fund%20dated%20November%2021%2C%202025_0.pdf",
+    "HDFC_LargeCapFund_Leaflet_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/HDFC%20Large%20Cap%20Fund%20Leaflet%20%28Jan%202026%29.pdf",
+    "HDFC_LargeCapFund_Presentation_September_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-10/HDFC%20Large%20Cap%20Fund%20Presentation%20%28September%202025%29.pdf",
+    "HDFC_LargeCapFund_Fund_Facts_January_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Fund%20Facts%20-%20HDFC%20Large%20Cap%20Fund_January%2026.pdf",
+
+    # HDFC FLEXI CAP FUND
+    "HDFC_FlexiCap_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20Flexi%20Cap%20Fund%20dated%20November%2021%2C%202025_0.pdf",
+    "HDFC_FlexiCap_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20Flexi%20Cap%20Fund%20dated%20November%2021%2C%202025_1.pdf",
+    "HDFC_FlexiCap_Fund_Facts_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Fund%20Facts%20-%20HDFC%20Flexi%20Cap%20Fund_January%2026.pdf",
+    "HDFC_FlexiCap_Presentation_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-12/HDFC%20Flexi%20Cap%20Fund%20Presentation%20%28November%202025%29.pdf",
+    "HDFC_FlexiCap_Leaflet_Dec_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-12/HDFC%20Flexi%20Cap%20Fund%20Leaflet%20%28December%202025%29.pdf",
+
+    # HDFC BALANCE ADVANTAGE FUND
+    "HDFC_BalancedAdvantage_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20Balanced%20Advantage%20Fund%20dated%20November%2021%2C%202025_0.pdf",
+    "HDFC_BalancedAdvantage_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20Balanced%20Advantage%20Fund%20dated%20November%2021%2C%202025_0.pdf",
+    "HDFC_BalancedAdvantage_Fund_Facts_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Fund%20Facts%20-%20HDFC%20Balanced%20Advantage%20Fund_January%2026.pdf",
+    "HDFC_BalancedAdvantage_Presentation_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Presentation%20-%20HDFC%20Balanced%20Advantage%20Fund%20%28Jan%202026%29.pdf",
+    "HDFC_BalancedAdvantage_Leaflet_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-11/Leaflet%20-%20HDFC%20Balanced%20Advantage%20Fund%20%28November%202025%29.pdf",
+
+    # HDFC Tax Saver (ELSS)
+    "HDFC_ELSS_Tax_Saver_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20ELSS%20Tax%20Saver%20dated%20November%2021%2C%202025.pdf",
+    "HDFC_ELSS_Tax_Saver_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20ELSS%20Tax%20Saver%20dated%20November%2021%2C%202025_0.pdf",
+    "HDFC_ELSS_Tax_Saver_Presentation_Oct_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-10/HDFC%20ELSS%20Tax%20saver%20Presentation%20%28October%202025%29.pdf",
+    "HDFC_ELSS_Tax_Saver_Leaflet_Jan_2024.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-01/HDFC%20ELSS%20%20Tax%20saver%20Leaflet%20-%20January%202024%20%281%29.pdf",
+    "HDFC_ELSS_Tax_Saver_Fund_Facts_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Fund%20Facts%20-%20HDFC%20TaxSaver%20Fund_January%2026.pdf",
+
+    # HDFC Liquid Fund
+    "HDFC_Liquid_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20Liquid%20Fund%20dated%20November%2021%2C%202025.pdf",
+    "HDFC_Liquid_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20Liquid%20Fund%20dated%20November%2021%2C%202025.pdf",
+    "HDFC_Liquid_Fund_Facts_Dec_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-12/Fund%20Facts%20-%20HDFC%20Liquid%20Fund%20-%20December%202025%20%5Ba%5D.pdf",
+}
+
+# Primary Mapping from corpus.md: document name -> landing page
+URL_MAP = {
+    "HDFC_LargeCap_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-large-cap-fund/direct",
+    "HDFC_LargeCap_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
+    "HDFC_LargeCapFund_SID_21_Nov_2025": "https://www.hdfcfund.com/investor-services/fund-documents/sid",
+    "HDFC_FlexiCap_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-flexi-cap-fund/direct",
+    "HDFC_FlexiCap_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
+    "HDFC_ELSS_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-elss-tax-saver/direct",
+    "HDFC_ELSS_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
+    "HDFC_BalancedAdvantage_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-balanced-advantage-fund/direct",
+    "HDFC_BalancedAdvantage_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
+    "HDFC_Liquid_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-liquid-fund/direct",
+    "HDFC_Liquid_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
+    "HDFC_Factsheets": "https://www.hdfcfund.com/investor-services/factsheets",
+    "HDFC_SchemeSummary": "https://www.hdfcfund.com/investor-services/fund-documents/scheme-summary",
+    "AMFI_NAV": "https://www.amfiindia.com/spages/NAVAll.txt",
+}
+
+# Scheme -> fund landing page slug
+SCHEME_SLUGS = {
+    "HDFC Large Cap Fund": "hdfc-large-cap-fund",
+    "HDFC Flexi Cap Fund": "hdfc-flexi-cap-fund",
+    "HDFC ELSS Tax Saver": "hdfc-elss-tax-saver",
+    "HDFC Balanced Advantage Fund": "hdfc-balanced-advantage-fund",
+    "HDFC Liquid Fund": "hdfc-liquid-fund"
+}
+
+
+def load_url_maps(base_dir):
+    """
+    Loads URL mapping. Prioritizes specific PDF links provided by user,
+    then fund landing pages from corpus.md for user-friendly citations,
+    then raw/corpus_manifest.json for any missing entries.
+    Returns (pdf_url_map, url_map).
+    """
+    pdf_url_map = dict(PDF_URL_MAP)
+    url_map = dict(URL_MAP)
+
+    # Fallback to manifest for any missing entries
+    manifest_path = os.path.join(base_dir, "raw/corpus_manifest.json")
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                for doc in data.get("documents", []):
+                    # Map base filename to URL
+                    name = doc.get("name")
+                    url = doc.get("url")
+                    if name and url and name not in url_map:
+                        url_map[name] = url
+        except Exception as e:
+            print(f"Warning: Failed to load manifest fallback: {e}")
+
+    return pdf_url_map, url_map
+
+
+class CitationResolver:
+    """
+    Resolves the public `Source Link` for a chunk from its file-level metadata.
+
+    scripts/ingest.py stores the result in metadata['public_url'] so serving only
+    reads a field; resolve() is the fallback for chunks ingested before that and
+    memoizes per (file, scheme, document type).
+    """
+
+    def __init__(self, pdf_url_map, url_map):
+        self.pdf_url_map = pdf_url_map
+        self.url_map = url_map
+        self._memo = {}
+
+    @classmethod
+    def from_base_dir(cls, base_dir):
+        return cls(*load_url_maps(base_dir))
+
+    def resolve(self, metadata):
+        full_path = metadata.get('file_name') or metadata.get('source', 'Unknown')
+        filename = os.path.basename(full_path.replace('\\', '/'))
+        key = (filename, metadata.get('scheme_name'), metadata.get('document_name'))
+        url = self._memo.get(key)
+        if url is None:
+            url = self._memo[key] = self._resolve(*key)
+        return url
+
+    def _resolve(self, filename, scheme_name, doc_type):
+        # 1. Check if we have a direct PDF mapping for this filename
+        public_url = self.pdf_url_map.get(filename) or self.url_map.get(os.path.splitext(filename)[0])
+        if public_url:
+            return public_url
+
+        # 2. If no direct PDF link, fall back to landing pages
+        fund_slug = SCHEME_SLUGS.get(scheme_name)
+
+        # Redundancy check for slug
+        if not fund_slug:
+            filename_lower = filename.lower()
+            if "largecap" in filename_lower or "top 100" in filename_lower: fund_slug = "hdfc-large-cap-fund"
+            elif "flexicap" in filename_lower or "multi-cap" in filename_lower: fund_slug = "hdfc-flexi-cap-fund"
+            elif "elss" in filename_lower or "tax_saver" in filename_lower: fund_slug = "hdfc-elss-tax-saver"
+            elif "balancedadvantage" in filename_lower or "prudence" in filename_lower: fund_slug = "hdfc-balanced-advantage-fund"
+            elif "liquid" in filename_lower: fund_slug = "hdfc-liquid-fund"
+
+        if fund_slug:
+            return f"https://www.hdfcfund.com/explore/mutual-funds/{fund_slug}/direct"
+        elif doc_type and "Factsheet" in doc_type:
+            return "https://www.hdfcfund.com/investor-services/factsheets"
+        elif doc_type and "SID" in doc_type:
+            return "https://www.hdfcfund.com/investor-services/fund-documents/sid"
+        elif doc_type and "KIM" in doc_type:
+            return "https://www.hdfcfund.com/investor-services/fund-documents/kim"
+        else:
+            return "https://www.hdfcfund.com/explore/mutual-funds"
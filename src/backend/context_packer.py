@@ -0,0 +1,108 @@
+import re
+from collections import OrderedDict
+
+from .embedding_writer import estimate_tokens
+
+# Header that scripts/ingest.py prepends to every chunk
+_HEADER_RE = re.compile(
+    r"^File: (?P<file>.*)\nScheme: (?P<scheme>.*)\nDocument: (?P<document>.*)\nDate: (?P<date>.*)\nContent: ",
+)
+
+
+def split_enriched(doc):
+    """
+    Splits an enriched chunk into (header fields, body). Chunks without the ingest
+    header get their fields from metadata and the whole text as body.
+    """
+    text = doc.page_content
+    match = _HEADER_RE.match(text)
+    if match:
+        return match.groupdict(), text[match.end():]
+    meta = doc.metadata
+    return {
+        "file": meta.get("file_name") or meta.get("source", "Unknown"),
+        "scheme": meta.get("scheme_name"),
+        "document": meta.get("document_name"),
+        "date": meta.get("date_of_the_document"),
+    }, text
+
+
+def overlap_length(a, b, max_overlap=300, min_overlap=20):
+    """
+    Length of the longest suffix of a that is a prefix of b (0 if shorter than min_overlap).
+    """
+    tail = a[-max_overlap:]
+    probe = b[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+    idx = tail.find(probe)
+    while idx != -1:
+        if b.startswith(tail[idx:]):
+            return len(tail) - idx
+        idx = tail.find(probe, idx + 1)
+    return 0
+
+
+def merge_piece(pieces, body):
+    """
+    Merges body into the pieces already taken from the same file and page.
+    Returns (new pieces, number of characters the merge actually adds).
+    """
+    for i, piece in enumerate(pieces):
+        if body in piece:
+            return pieces, 0
+        if piece in body:
+            return pieces[:i] + [body] + pieces[i + 1:], len(body) - len(piece)
+        k = overlap_length(piece, body)
+        if k:
+            return pieces[:i] + [piece + body[k:]] + pieces[i + 1:], len(body) - k
+        k = overlap_length(body, piece)
+        if k:
+            return pieces[:i] + [body + piece[k:]] + pieces[i + 1:], len(body) - k
+    return pieces + [body], len(body)
+
+
+def pack_context(docs, token_budget, url_fn):
+    """
+    Packs ranked chunks into the LLM context.
+
+    Chunks are taken in relevance order until token_budget is spent (the first
+    chunk is always kept). Overlapping or duplicated chunks from the same file and
+    page are merged, and each source file's header and Source Link are emitted
+    once, in the order the file first appeared in the ranking.
+    """
+    sources = OrderedDict()  # file -> {"fields", "url", "pages": {page: [pieces]}}
+    used = 0
+    for doc in docs:
+        fields, body = split_enriched(doc)
+        key = fields["file"]
+        page = doc.metadata.get("page")
+        source = sources.get(key)
+
+        cost = 0
+        if source is None:
+            url = url_fn(doc.metadata)
+            cost += estimate_tokens(_header(fields)) + estimate_tokens(url) + 4
+        pieces = source["pages"].get(page, []) if source else []
+        merged, added_chars = merge_piece(pieces, body)
+        if not added_chars:
+            continue
+        cost += max(1, added_chars // 4)
+
+        if used and used + cost > token_budget:
+            continue
+        used += cost
+        if source is None:
+            source = sources[key] = {"fields": fields, "url": url, "pages": {}}
+        source["pages"][page] = merged
+
+    blocks = []
+    for source in sources.values():
+        pages = sorted(source["pages"].items(), key=lambda item: (item[0] is None, item[0] or 0))
+        body = "\n...\n".join(piece for _, pieces in pages for piece in pieces)
+        blocks.append(f"--- Document Source ---\n{_header(source['fields'])}{body}\nSource Link: {source['url']}")
+    return "\n\n".join(blocks)
+
+
+def _header(fields):
+    return f"File: {fields['file']}\nScheme: {fields['scheme']}\nDocument: {fields['document']}\nDate: {fields['date']}\nContent: "
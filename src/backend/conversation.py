@@ -0,0 +1,166 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .answer_cache import normalize_question
+from .query_router import detect_schemes
+
+# A question leaning on an earlier turn: a reference to "the fund" or an opener
+# that continues the previous question. "this"/"that" count as a pronoun ("what
+# about that?", "does this apply to SIPs?") or before fund/scheme/plan, but not
+# as a determiner introducing something new ("what does this term mean?")
+_REFERENCE = re.compile(
+    r"\b(?:it|its|they|them|their|same|the\s+(?:fund|scheme|plan)|"
+    r"(?:this|that|these|those)(?=\s*(?:[?.!,:;]|$)|\s+(?:(?:fund|scheme|plan|one)s?|"
+    r"is|are|was|were|has|have|does|do|did|apply|applies|mean|means|include|includes|cover|covers)\b))\b",
+    re.IGNORECASE,
+)
+_CONTINUATION = re.compile(r"^\s*(?:and|also|what\s+about|how\s+about|what\s+of)\b", re.IGNORECASE)
+
+# Facts asked per scheme (corpus.md); a short question about one of them that
+# names no scheme ("expense ratio?", "what is the exit load?") continues the conversation
+_SCHEME_FACT = re.compile(
+    r"exit\s+load|expense\s+ratio|\bter\b|\bsip\b|lump\s*sum|minimum|lock[\s-]*in|benchmark|"
+    r"fund\s+manager|\bmanage[sd]?\b|riskometer|risk\s+level|holdings?|portfolio|\baum\b|\bnav\b|"
+    r"objective|allocation|inception|launch",
+    re.IGNORECASE,
+)
+_DEFINITION = re.compile(r"^\s*(?:what\s+(?:is|are|does)\s+(?:a|an)\b|define\b)|\bmean(?:s|ing)?\b", re.IGNORECASE)
+SHORT_QUESTION_WORDS = 6
+
+# Rewriting: references replaced by the scheme names, leading "and"/"also" dropped
+_SUBJECT = re.compile(r"\b(?:this|that|the)\s+(?:fund|scheme|plan)\b|\bit\b", re.IGNORECASE)
+_POSSESSIVE = re.compile(r"\bits\b", re.IGNORECASE)
+_LEADING_CONJUNCTION = re.compile(r"^\s*(?:and|also)\b[\s,]*", re.IGNORECASE)
+
+
+def user_turns(history, window):
+    """
+    The last window user questions of history, oldest first. history is a list
+    of {"role", "content"} messages (as the Streamlit app keeps them) or of
+    plain question strings.
+    """
+    turns = []
+    for message in history or ():
+        if isinstance(message, str):
+            turns.append(message)
+        elif message.get("role") == "user":
+            turns.append(message.get("content") or "")
+    return turns[-window:] if window > 0 else []
+
+
+def is_follow_up(question):
+    """
+    True for a question that names no scheme and reads as a continuation of the
+    previous turn.
+    """
+    if detect_schemes(question):
+        return False
+    if _REFERENCE.search(question) or _CONTINUATION.search(question):
+        return True
+    return (
+        len(question.split()) <= SHORT_QUESTION_WORDS
+        and bool(_SCHEME_FACT.search(question))
+        and not _DEFINITION.search(question)
+    )
+
+
+def rewrite_follow_up(question, previous_turns):
+    """
+    Rewrites a follow-up into a standalone question naming the schemes of the
+    most recent earlier turn that named any (previous_turns oldest first),
+    following a chain of follow-ups back. A standalone question, or one whose
+    chain reaches a scheme-less standalone turn, is returned unchanged.
+    """
+    if not is_follow_up(question):
+        return question
+    for turn in reversed(previous_turns):
+        schemes = detect_schemes(turn)
+        if schemes:
+            return _with_schemes(question, schemes)
+        if not is_follow_up(turn):
+            break
+    return question
+
+
+def resolve_turn(question, history, window):
+    """
+    Returns (the question to answer, the question the previous turn was
+    answered as, or None without history).
+    """
+    turns = user_turns(history, window)
+    if not turns:
+        return question, None
+    previous = rewrite_follow_up(turns[-1], turns[:-1])
+    return rewrite_follow_up(question, turns), previous
+
+
+def _with_schemes(question, schemes):
+    names = " and ".join(schemes)
+    text = _LEADING_CONJUNCTION.sub("", question).strip()
+    text = text[:1].upper() + text[1:]
+    text, possessives = _POSSESSIVE.subn(f"{names}'s", text)
+    text, subjects = _SUBJECT.subn(names, text)
+    if possessives or subjects:
+        return text
+    return f"{text.rstrip(' ?.')} for {names}?"
+
+
+class CandidateCache:
+    """
+    Candidate pools (the fetch_k nearest chunks and their vectors) of recent
+    scheme-filtered searches, keyed by normalized question, so a follow-up about
+    the same schemes reranks the previous turn's candidates instead of searching
+    the store again. Evicted LRU beyond max_size; dropped whenever version_fn()
+    changes (i.e. the collection was re-ingested).
+    """
+
+    def __init__(self, max_size=64, version_fn=None):
+        self.max_size = max_size
+        self.version_fn = version_fn
+        self._entries = OrderedDict()  # key -> (scheme filter, docs, vectors)
+        self._lock = threading.Lock()
+        self._version = version_fn() if version_fn else None
+        self.reuses = 0
+
+    def get(self, question, scheme_filter):
+        """
+        Copies of the pool kept for question, as (docs, vectors), if it was
+        searched with the same scheme filter; else None.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != scheme_filter:
+                return None
+            self._entries.move_to_end(key)
+            self.reuses += 1
+            _, docs, vectors = entry
+        return _copy(docs), vectors
+
+    def put(self, question, scheme_filter, docs, vectors):
+        key = normalize_question(question)
+        entry = (scheme_filter, _copy(docs), np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            self._check_version()
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+
+def _copy(docs):
+    # Callers annotate metadata (fusion_score, rerank_score); keep the pool clean
+    return [Document(id=doc.id, page_content=doc.page_content, metadata=dict(doc.metadata)) for doc in docs]
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Caching layer in front of an embeddings provider (e.g. OpenAIEmbeddings).
+
+    Vectors are looked up in an in-memory LRU first, then in an on-disk SQLite
+    store keyed by (model name, sha256 of the text). Only texts missing from
+    both are sent to the provider, in a single batched call. embed_query and
+    embed_documents share the same cache since the provider returns the same
+    vector for the same text either way.
+    """
+
+    def __init__(self, underlying, cache_dir=None, memory_size=4096, model_name=None):
+        self.underlying = underlying
+        self.model_name = model_name or getattr(underlying, "model", None) or type(underlying).__name__
+        self.memory_size = memory_size
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(
+                os.path.join(cache_dir, "embeddings.sqlite3"),
+                check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, text_hash))"
+            )
+            self._db.commit()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # --- Embeddings interface ---
+
+    def embed_documents(self, texts):
+        vectors, missing = self._lookup(texts)
+        if missing:
+            computed = self.underlying.embed_documents([texts[i] for i in missing])
+            self._store(texts, missing, computed, vectors)
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        vectors, missing = self._lookup(texts)
+        if missing:
+            computed = await self.underlying.aembed_documents([texts[i] for i in missing])
+            self._store(texts, missing, computed, vectors)
+        return vectors
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    # --- cache management ---
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_size": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _key(self, text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, texts):
+        """
+        Returns (vectors, missing) where vectors has None at every index in missing.
+        """
+        vectors = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = self._key(text)
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    vectors[i] = vec
+                    continue
+                if self._db is not None:
+                    row = self._db.execute(
+                        "SELECT vector FROM embeddings WHERE model = ? AND text_hash = ?",
+                        (self.model_name, key)
+                    ).fetchone()
+                    if row is not None:
+                        vec = np.frombuffer(row[0], dtype=np.float32).tolist()
+                        self._remember(key, vec)
+                        self.disk_hits += 1
+                        vectors[i] = vec
+                        continue
+                self.misses += 1
+                missing.append(i)
+        return vectors, missing
+
+    def _store(self, texts, missing, computed, vectors):
+        rows = []
+        with self._lock:
+            for i, vec in zip(missing, computed):
+                key = self._key(texts[i])
+                vec = list(vec)
+                vectors[i] = vec
+                self._remember(key, vec)
+                rows.append((self.model_name, key, np.asarray(vec, dtype=np.float32).tobytes()))
+            if self._db is not None and rows:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+
+    def _remember(self, key, vec):
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
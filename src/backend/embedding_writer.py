@@ -0,0 +1,242 @@
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token) used for TPM budgeting.
+    """
+    return max(1, len(text) // 4)
+
+
+def is_retryable(exc):
+    """
+    Rate limits, timeouts, conflicts, server errors and connection failures are retried;
+    other 4xx errors (bad request, auth) are not.
+    """
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is None:
+        return True
+    return status in (408, 409, 429) or status >= 500
+
+
+def is_rate_limit(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def retry_after(exc):
+    """
+    Seconds from a Retry-After header on the error's HTTP response, if any.
+    """
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Thread-safe token buckets for requests and tokens per minute.
+
+    The effective rate is scaled adaptively (AIMD): every rate-limit error halves it,
+    every successful request restores a little, up to the configured limits.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, min_scale=0.05):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.min_scale = min_scale
+        self.scale = 1.0
+
+        # Buckets hold up to 10 seconds of budget
+        self.request_capacity = max(1.0, requests_per_minute / 6)
+        self.token_capacity = max(1.0, tokens_per_minute / 6)
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        tokens = min(tokens, self.token_capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                request_rate = self.requests_per_minute * self.scale / 60
+                token_rate = self.tokens_per_minute * self.scale / 60
+                wait_time = max(
+                    (1 - self._requests) / request_rate if self._requests < 1 else 0,
+                    (tokens - self._tokens) / token_rate if self._tokens < tokens else 0
+                )
+            time.sleep(min(max(wait_time, 0.001), 5.0))
+
+    def penalize(self):
+        with self._lock:
+            self.scale = max(self.min_scale, self.scale * 0.5)
+
+    def reward(self):
+        with self._lock:
+            self.scale = min(1.0, self.scale + 0.05)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.requests_per_minute * self.scale / 60)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.tokens_per_minute * self.scale / 60)
+
+
+class EmbeddingWriter:
+    """
+    Embeds and stores chunks in batches with several batches in flight.
+
+    embed_fn(texts) -> vectors calls the provider; store_fn(ids, texts, vectors, payloads)
+    persists a batch. Embedding calls are paced by a RateLimiter and retried with
+    exponential backoff and full jitter. Every stored batch is appended to a JSONL
+    checkpoint, and IDs already in the checkpoint are skipped, so an interrupted run
+    resumes where it stopped. Batches that exhaust their retries are reported in
+    the result rather than dropped silently.
+    """
+
+    def __init__(self, embed_fn, store_fn, checkpoint_path=None, batch_size=50, max_in_flight=4,
+                 requests_per_minute=3000, tokens_per_minute=1_000_000,
+                 max_retries=6, base_delay=1.0, max_delay=60.0):
+        self.embed_fn = embed_fn
+        self.store_fn = store_fn
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+        self.done_ids = self._load_checkpoint()
+        self._store_lock = threading.Lock()
+
+        self.written = 0
+        self.skipped = 0
+        self.failed_ids = set()
+        self.retries = 0
+        self.rate_limited = 0
+
+    def write(self, items):
+        """
+        Consumes an iterable of (chunk_id, text, payload) lazily and writes it.
+        Returns a summary dict; failed chunk IDs are in result["failed_ids"].
+        """
+        batches = self._batches(items)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            in_flight = {pool.submit(self._write_batch, b) for b in itertools.islice(batches, self.max_in_flight)}
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    for b in itertools.islice(batches, 1):
+                        in_flight.add(pool.submit(self._write_batch, b))
+
+        return {
+            "written": self.written,
+            "skipped": self.skipped,
+            "failed_ids": set(self.failed_ids),
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+        }
+
+    def clear_checkpoint(self):
+        """
+        Call once the whole run has been recorded (e.g. in the ingest manifest).
+        """
+        self.done_ids = set()
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _batches(self, items):
+        batch = []
+        for cid, text, payload in items:
+            if cid in self.done_ids:
+                self.skipped += 1
+                continue
+            batch.append((cid, text, payload))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _write_batch(self, batch):
+        ids = [cid for cid, _, _ in batch]
+        texts = [text for _, text, _ in batch]
+        payloads = [payload for _, _, payload in batch]
+        tokens = sum(estimate_tokens(t) for t in texts)
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                vectors = self.embed_fn(texts)
+            except Exception as e:
+                if is_rate_limit(e):
+                    with self._store_lock:
+                        self.rate_limited += 1
+                    self.limiter.penalize()
+                if not is_retryable(e) or attempt == self.max_retries:
+                    print(f"Giving up on batch of {len(batch)} chunks after {attempt + 1} attempts: {e}")
+                    with self._store_lock:
+                        self.failed_ids.update(ids)
+                    return
+                with self._store_lock:
+                    self.retries += 1
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                time.sleep(max(delay, retry_after(e) or 0))
+                continue
+
+            self.limiter.reward()
+            with self._store_lock:
+                try:
+                    self.store_fn(ids, texts, vectors, payloads)
+                except Exception as e:
+                    print(f"Failed to store batch of {len(batch)} chunks: {e}")
+                    self.failed_ids.update(ids)
+                    return
+                self._append_checkpoint(ids)
+                self.done_ids.update(ids)
+                self.written += len(batch)
+            return
+
+    def _load_checkpoint(self):
+        done = set()
+        if not self.checkpoint_path:
+            return done
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        if not os.path.exists(self.checkpoint_path):
+            return done
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.update(json.loads(line)["ids"])
+                except (ValueError, KeyError):
+                    # A torn last line from an interrupted write; those chunks are redone
+                    continue
+        return done
+
+    def _append_checkpoint(self, ids):
+        if not self.checkpoint_path:
+            return
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ids": ids}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,80 @@
+import threading
+import time
+
+
+def _import_rag_service():
+    # Imported here so creating a loader does not pull in langchain/chromadb
+    from .rag_engine import RAGService
+    return RAGService
+
+
+class EngineLoader:
+    """
+    Builds one RAGService in a background thread and hands the same instance to
+    every caller (Streamlit sessions, API requests).
+
+    start() returns immediately; state is "idle", "warming", "ready" or
+    "failed". get(timeout) waits for the warm-up to finish and returns the
+    service, or None if construction failed (see .error). After construction
+    the service's warm_up() runs, so the first question does not pay for
+    loading the search indexes. Seconds spent per phase (import, construct,
+    warm_up) are kept in .timings.
+    """
+
+    def __init__(self, factory=None, warm_up=True):
+        self._factory = factory
+        self._warm_up = warm_up
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self.service = None
+        self.error = None
+        self.load_seconds = None
+        self.timings = {}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name="rag-engine-warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    @property
+    def state(self):
+        if self._thread is None:
+            return "idle"
+        if not self._done.is_set():
+            return "warming"
+        return "ready" if self.service is not None else "failed"
+
+    def get(self, timeout=None):
+        self.start()
+        self._done.wait(timeout)
+        return self.service
+
+    def _timed(self, phase, fn):
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self.timings[phase] = time.perf_counter() - start
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            factory = self._factory
+            if factory is None:
+                factory = self._timed("import", _import_rag_service)
+            service = self._timed("construct", factory)
+            if self._warm_up:
+                try:
+                    self._timed("warm_up", service.warm_up)
+                except Exception as e:
+                    print(f"Warning: RAG Service warm-up failed: {e}")
+            self.service = service
+        except Exception as e:
+            self.error = e
+            print(f"Failed to initialize RAG Service: {e}")
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self._done.set()
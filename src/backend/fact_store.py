@@ -0,0 +1,407 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from langchain_core.documents import Document
+
+from .query_router import detect_schemes
+
+# Written next to the other derived indexes by scripts/ingest.py
+FACT_STORE_FILENAME = "facts.sqlite3"
+
+# Documents whose tables carry the scheme facts (parse_metadata document_name),
+# most preferred first; system_prompt.md favours the Fund Facts / Factsheet tables
+FACT_DOCUMENTS = ["fund facts", "factsheet", "fact sheet", "kim"]
+
+# fact -> (row label in the PDFs, question wording, name used in answers). A row
+# label has to match the whole label cell (less a trailing colon, footnote marks
+# or a parenthesised note), so "Benchmark Returns" or "Scheme vs Benchmark" rows
+# of a performance table are never read as the benchmark
+FACTS = {
+    "exit_load": (r"(?:exit\s*)?load(?:\s+structure)?", r"\bexit\s*loads?\b", "exit load"),
+    "expense_ratio": (r"(?:total\s+)?expense\s+ratio|ter", r"\bexpense\s*ratios?\b|\bter\b", "total expense ratio"),
+    "aum": (r"(?:monthly\s+average\s+|month\s+end\s+)?(?:aum|assets\s+under\s+management)|fund\s+size|net\s+assets",
+            r"\baum\b|assets\s+under\s+management|fund\s+size", "AUM"),
+    "benchmark": (r"(?:scheme\s+|tier\s*(?:i|1)\s+)?benchmark(?:\s+index)?", r"\bbenchmark", "benchmark"),
+    "fund_manager": (r"(?:name\s+of\s+(?:the\s+)?)?fund\s+manager(?:s|\(s\))?(?:\s+name)?",
+                     r"\bfund\s*managers?\b|\bwho\s+manages\b|\bmanaged\s+by\b", "fund manager"),
+    "min_sip": (r"(?:minimum|min\.?)\s+(?:sip|systematic\s+investment\s+plan)(?:\s+(?:amount|investment|installment))?|sip\s+amount",
+                r"(?:minimum|min\.?)\s+(?:\w+\s+)?sip\b|\bsip\b.*\bminimum\b", "minimum SIP amount"),
+    "min_lumpsum": (r"minimum\s+(?:application|investment|purchase|lump\s*sum)(?:\s+amount)?|(?:minimum\s+)?application\s+amount",
+                    r"minimum\s+(?:lump\s*sum|investment|application|purchase)|\blump\s*sum\b", "minimum lumpsum investment"),
+    "riskometer": (r"(?:scheme\s+)?(?:riskometer|risk-?o-?meter|risk\s+level)", r"riskometer|risk-?o-?meter|\brisk\s+level\b", "riskometer level"),
+    "lock_in": (r"lock[\s-]*in(?:\s+period)?", r"\block[\s-]*in\b", "lock-in period"),
+    "inception": (r"(?:date\s+of\s+)?(?:allotment|inception)(?:\s+date)?|launch\s+date",
+                  r"\binception\b|\ballotment\s+date\b|\bdate\s+of\s+allotment\b|\blaunch(?:ed)?\b", "date of allotment"),
+}
+HOLDINGS = "top_holdings"
+TOP_HOLDINGS = 10
+_HOLDINGS_QUESTION = re.compile(r"\b(?:top|largest|biggest)\s+(?:(\d+)\s+)?(?:holdings|stocks|companies|positions)\b|\bholdings\b", re.IGNORECASE)
+_HOLDINGS_HEADER = re.compile(r"%\s*(?:to|of)\s*(?:nav|net\s+assets)|\bweight", re.IGNORECASE)
+_HOLDINGS_SKIP = re.compile(r"^(?:total|sub\s*-?\s*total|net\s+current|cash|equity\s*&|grand\s+total)", re.IGNORECASE)
+
+# Questions that need more than the current value of one fact
+_NOT_A_LOOKUP = re.compile(
+    r"\b(?:why|how\s+(?:is|are|does|do|was)|compare[sd]?|comparison|vs\.?|versus|differ\w*|chang\w*|histor\w*|"
+    r"trend|explain|mean|means|calculat\w*|previous|past|over\s+time|should|better|all\s+schemes)\b",
+    re.IGNORECASE,
+)
+
+_LABELS = [(fact, re.compile(rf"(?:{label})(?:\s*\([^)]*\))?", re.IGNORECASE)) for fact, (label, _, _) in FACTS.items()]
+_QUESTIONS = [(fact, re.compile(question, re.IGNORECASE)) for fact, (_, question, _) in FACTS.items()]
+MAX_LABEL_WORDS = 8
+MAX_VALUE_CHARS = 300
+
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+_DIRECT_PERCENT = re.compile(r"direct[^%\d]*(\d+(?:\.\d+)?)\s*%", re.IGNORECASE)
+_CRORE = re.compile(r"([\d,]+(?:\.\d+)?)\s*(?:crores?|cr\b\.?)", re.IGNORECASE)
+_RUPEES = re.compile(r"(?:₹|rs\.?|inr)\s*([\d,]+(?:\.\d+)?)", re.IGNORECASE)
+_PERIOD = re.compile(r"(\d+)\s*(year|month|day)s?", re.IGNORECASE)
+_NUMBER = re.compile(r"^-?\d+(?:\.\d+)?$")
+_NIL = re.compile(r"^(?:nil|none|not\s+applicable|n\.?a\.?)\b", re.IGNORECASE)
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_DATE = re.compile(
+    rf"\b(?:{_MONTH}\s+\d{{1,2}},?\s+\d{{4}}|\d{{1,2}}(?:st|nd|rd|th)?[\s-]+{_MONTH}[\s,-]+\d{{4}}|\d{{1,2}}[/.-]\d{{1,2}}[/.-]\d{{4}})\b",
+    re.IGNORECASE,
+)
+_INDEX_NAME = re.compile(r"\b(?:nifty|bse|sensex|crisil|msci|s&p|index|tri)\b", re.IGNORECASE)
+_PERSON = re.compile(r"\b[A-Z][a-z]+\.?\s+[A-Z][a-z]+")
+_RISK_LEVEL = re.compile(r"\b(?:very\s+high|moderately\s+high|low\s+to\s+moderate|high|moderate|low)\b", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_key TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS facts (
+    scheme_name TEXT NOT NULL,      -- canonical name (query_router.SCHEME_ALIASES)
+    fact TEXT NOT NULL,             -- a FACTS key or top_holdings
+    rank INTEGER NOT NULL,          -- position within list facts (holdings), else 0
+    value_text TEXT NOT NULL,
+    value_num REAL,                 -- parsed number, in unit
+    unit TEXT,                      -- "%", "crore", "INR", "years", ...
+    document_name TEXT NOT NULL,
+    document_date TEXT NOT NULL,    -- ISO "YYYY-MM-DD" or "YYYY-MM"; "" when unknown (see NEWEST_FIRST)
+    source_rank INTEGER NOT NULL,   -- FACT_DOCUMENTS position
+    file_key TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    page INTEGER,
+    public_url TEXT
+);
+CREATE INDEX IF NOT EXISTS facts_by_scheme ON facts (scheme_name, fact, document_date DESC, source_rank, rank);
+CREATE INDEX IF NOT EXISTS facts_by_file ON facts (file_key);
+"""
+
+# Newest document first: by month, then a full date before a month-only one of the
+# same month (the more precise date), then by day; unknown dates come last
+NEWEST_FIRST = (
+    "document_date = '', substr(document_date, 1, 7) DESC, length(document_date) DESC, "
+    "document_date DESC, source_rank, rank"
+)
+
+
+def fact_document_rank(document_name):
+    """
+    Position of a document type in FACT_DOCUMENTS, or None if facts are not extracted from it.
+    """
+    name = (document_name or "").replace("_", " ")
+    for rank, kind in enumerate(FACT_DOCUMENTS):
+        if re.search(rf"\b{kind}\b", name, re.IGNORECASE):
+            return rank
+    return None
+
+
+def iso_date(text):
+    """
+    "21 Nov 2025" -> "2025-11-21", "Jan 2026" -> "2026-01" (parse_metadata's
+    date_of_the_document); "" when unknown.
+    """
+    for fmt, iso in (("%d %b %Y", "%Y-%m-%d"), ("%d %B %Y", "%Y-%m-%d"), ("%b %Y", "%Y-%m"), ("%B %Y", "%Y-%m")):
+        try:
+            return datetime.strptime((text or "").strip(), fmt).strftime(iso)
+        except ValueError:
+            continue
+    return ""
+
+
+def display_date(iso):
+    for fmt, shown in (("%Y-%m-%d", "%d %b %Y"), ("%Y-%m", "%b %Y")):
+        try:
+            return datetime.strptime(iso, fmt).strftime(shown).lstrip("0")
+        except ValueError:
+            continue
+    return ""
+
+
+def parse_value(fact, text):
+    """
+    (value_num, unit) for the typed columns, or None when text is not a value of
+    the fact's type (a percentage, a rupee or crore amount, a period, a date, an
+    index or a person's name), e.g. a returns figure under a "Benchmark" label.
+    """
+    if fact in ("exit_load", "lock_in") and _NIL.match(text):
+        return 0.0, "%" if fact == "exit_load" else "years"
+    if fact == "expense_ratio":
+        match = _DIRECT_PERCENT.search(text) or _PERCENT.search(text)
+        return (float(match.group(1)), "%") if match else None
+    if fact == "exit_load":
+        match = _PERCENT.search(text)
+        return (float(match.group(1)), "%") if match else None
+    if fact == "aum":
+        match = _CRORE.search(text)
+        return (float(match.group(1).replace(",", "")), "crore") if match else None
+    if fact in ("min_sip", "min_lumpsum"):
+        match = _RUPEES.search(text)
+        return (float(match.group(1).replace(",", "")), "INR") if match else None
+    if fact == "lock_in":
+        match = _PERIOD.search(text)
+        return (float(match.group(1)), match.group(2).lower() + "s") if match else None
+    if fact == "inception":
+        return (None, "date") if _DATE.search(text) else None
+    if fact == "benchmark":
+        return (None, "index") if _INDEX_NAME.search(text) and not _PERCENT.search(text) else None
+    if fact == "fund_manager":
+        return (None, "name") if _PERSON.search(text) and not _PERCENT.search(text) else None
+    if fact == "riskometer":
+        return (None, "level") if _RISK_LEVEL.search(text) else None
+    return None
+
+
+def _clean(cell):
+    return " ".join((cell or "").split())
+
+
+def _label_fact(label):
+    label = label.rstrip(" :*#^")
+    if not label or len(label.split()) > MAX_LABEL_WORDS:
+        return None
+    for fact, pattern in _LABELS:
+        if pattern.fullmatch(label):
+            return fact
+    return None
+
+
+def _table_facts(rows, page_number):
+    """
+    Label/value facts and holdings rows of one extracted table.
+    """
+    facts, holdings = [], []
+    in_holdings = False
+    for row in rows:
+        cells = [_clean(cell) for cell in row]
+        filled = [cell for cell in cells if cell]
+        if not filled:
+            continue
+        if any(_HOLDINGS_HEADER.search(cell) for cell in filled):
+            in_holdings = True
+            continue
+        if in_holdings:
+            name, weight = filled[0], filled[-1].rstrip("%").strip()
+            if len(filled) >= 2 and _NUMBER.match(weight) and not _HOLDINGS_SKIP.match(name):
+                holdings.append((name, float(weight), page_number))
+            continue
+        fact = _label_fact(filled[0])
+        value = " ".join(filled[1:])
+        if fact and value and len(value) <= MAX_VALUE_CHARS:
+            facts.append((fact, value, page_number))
+    return facts, holdings
+
+
+def _line_facts(text, page_number):
+    # Layout fallback for facts printed as "Label: value" lines outside any table
+    facts = []
+    for line in text.splitlines():
+        label, sep, value = line.partition(":")
+        value = _clean(value)
+        if not sep or not value or len(value) > MAX_VALUE_CHARS:
+            continue
+        fact = _label_fact(_clean(label))
+        if fact:
+            facts.append((fact, value, page_number))
+    return facts
+
+
+def extract_facts(pdf_path):
+    """
+    Facts of one PDF from its tables (PyMuPDF find_tables) and "Label: value"
+    lines, as dicts with fact, rank, value_text, value_num, unit and page.
+    The first row of each fact whose value parses as the fact's type wins
+    (tables before lines); holdings are the TOP_HOLDINGS largest rows of the
+    holdings tables.
+    """
+    import pymupdf
+
+    table_facts, line_facts, holdings = [], [], []
+    with pymupdf.open(pdf_path) as doc:
+        for page in doc:
+            for table in page.find_tables().tables:
+                facts, rows = _table_facts(table.extract(), page.number + 1)
+                table_facts.extend(facts)
+                holdings.extend(rows)
+            line_facts.extend(_line_facts(page.get_text("text", sort=True), page.number + 1))
+
+    records = []
+    seen = set()
+    for fact, value, page in table_facts + line_facts:
+        parsed = parse_value(fact, value) if fact not in seen else None
+        if parsed is None:
+            continue
+        seen.add(fact)
+        value_num, unit = parsed
+        records.append({"fact": fact, "rank": 0, "value_text": value, "value_num": value_num, "unit": unit, "page": page})
+
+    names = set()
+    top = []
+    for name, weight, page in sorted(holdings, key=lambda h: -h[1]):
+        if name.lower() not in names:
+            names.add(name.lower())
+            top.append((name, weight, page))
+    for rank, (name, weight, page) in enumerate(top[:TOP_HOLDINGS], start=1):
+        records.append({"fact": HOLDINGS, "rank": rank, "value_text": name, "value_num": weight, "unit": "%", "page": page})
+    return records
+
+
+class FactStoreBuilder:
+    """
+    Incremental writer used by ingest.py: rows are kept per source file along
+    with its sha256, so only new or changed PDFs are extracted again.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.known = dict(self.conn.execute("SELECT file_key, sha256 FROM files"))
+
+    def remove(self, file_key):
+        self.conn.execute("DELETE FROM facts WHERE file_key = ?", (file_key,))
+        self.conn.execute("DELETE FROM files WHERE file_key = ?", (file_key,))
+        self.known.pop(file_key, None)
+
+    def replace(self, file_key, sha256, meta, records):
+        """
+        Replaces the rows of one file; meta is its parse_metadata() dict plus public_url.
+        """
+        self.remove(file_key)
+        schemes = detect_schemes(meta.get("scheme_name") or "") or detect_schemes((meta.get("file_name") or "").replace("_", " "))
+        rank = fact_document_rank(meta.get("document_name"))
+        if schemes and rank is not None:
+            self.conn.executemany(
+                "INSERT INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (schemes[0], r["fact"], r["rank"], r["value_text"], r["value_num"], r["unit"],
+                     meta.get("document_name") or "", iso_date(meta.get("date_of_the_document")), rank,
+                     file_key, meta.get("file_name") or "", r["page"], meta.get("public_url"))
+                    for r in records
+                ],
+            )
+        self.conn.execute("INSERT INTO files VALUES (?, ?)", (file_key, sha256))
+        self.known[file_key] = sha256
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def structured_question(question):
+    """
+    (scheme, fact, n) for a question that asks for the current value of one
+    fact of one scheme, e.g. "What is the exit load of HDFC Liquid Fund?" or
+    "Top 5 holdings of flexi cap"; else None.
+    """
+    schemes = detect_schemes(question)
+    if len(schemes) != 1 or _NOT_A_LOOKUP.search(question):
+        return None
+    matched = [fact for fact, pattern in _QUESTIONS if pattern.search(question)]
+    holdings = _HOLDINGS_QUESTION.search(question)
+    if holdings:
+        matched.append(HOLDINGS)
+    if len(matched) != 1:
+        return None
+    n = min(int(holdings.group(1)), TOP_HOLDINGS) if holdings and holdings.group(1) else TOP_HOLDINGS
+    return schemes[0], matched[0], n
+
+
+class FactStore:
+    """
+    Read-only view of the fact table for serving. Lookups take the rows of the
+    newest document that has the fact (Fund Facts before KIM on the same date).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, directory):
+        return cls(os.path.join(directory, FACT_STORE_FILENAME))
+
+    def close(self):
+        """
+        Closes the connection. A request still holding this store (it was
+        replaced by a reload mid-request) then finds no rows and falls back to
+        retrieval.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def lookup(self, scheme, fact):
+        with self._lock:
+            if self._conn is None:
+                return []
+            rows = self._conn.execute(
+                f"SELECT * FROM facts WHERE scheme_name = ? AND fact = ? ORDER BY {NEWEST_FIRST}",
+                (scheme, fact),
+            ).fetchall()
+        if not rows:
+            return []
+        newest = rows[0]["file_key"]
+        return [dict(row) for row in rows if row["file_key"] == newest]
+
+    def answer(self, question):
+        """
+        (answer, source documents) for a structured question found in the table, else None.
+        """
+        parsed = structured_question(question)
+        if parsed is None:
+            return None
+        scheme, fact, n = parsed
+        rows = self.lookup(scheme, fact)
+        if not rows:
+            return None
+        rows = rows[:n] if fact == HOLDINGS else rows[:1]
+        return format_answer(scheme, fact, rows), [_source(rows[0])]
+
+
+def format_answer(scheme, fact, rows):
+    first = rows[0]
+    source = f"the {first['document_name']}"
+    shown = display_date(first["document_date"])
+    if shown:
+        source += f" dated {shown}"
+    if fact == HOLDINGS:
+        items = ", ".join(f"{row['value_text']} ({row['value_num']:.2f}%)" for row in rows)
+        text = f"As per {source}, the top {len(rows)} holdings of {scheme} by weight are: {items}."
+    else:
+        text = f"As per {source}, the {FACTS[fact][2]} of {scheme} is: {first['value_text'].rstrip('. ')}."
+    url = first["public_url"] or "https://www.hdfcfund.com/"
+    return f"{text}\nLast updated from sources: <{url}>"
+
+
+def _source(row):
+    # Citation for the audit log, shaped like a retrieved chunk
+    return Document(page_content="", metadata={
+        "scheme_name": row["scheme_name"],
+        "file_name": row["file_name"],
+        "page": row["page"],
+        "public_url": row["public_url"],
+        "fact": row["fact"],
+    })
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .answer_cache import normalize_question
+from .audit_log import is_refusal
+from .query_router import SCHEME_ALIASES, detect_schemes
+
+# Written next to the other derived indexes by scripts/ingest.py
+FAQ_STORE_FILENAME = "faq_answers.json"
+
+# Example questions on the Streamlit home screen; always precomputed
+HOME_QUESTIONS = [
+    "What is the riskometer level for large cap?",
+    "What are the top 5 holdings of HDFC Flexi Cap Fund?",
+    "Tell me about ELSS lock-in period.",
+]
+
+# The facts corpus.md expects per scheme, asked once for every scheme
+FAQ_TEMPLATES = [
+    "What is the exit load of {scheme}?",
+    "What is the expense ratio of {scheme}?",
+    "What is the minimum SIP amount for {scheme}?",
+    "What is the lock-in period of {scheme}?",
+    "What is the investment objective of {scheme}?",
+    "What is the asset allocation of {scheme}?",
+    "Who is the fund manager of {scheme}?",
+    "What is the benchmark of {scheme}?",
+    "What is the riskometer level of {scheme}?",
+    "What are the top 5 holdings of {scheme}?",
+]
+
+
+def canonical_questions():
+    """
+    The curated question set the store is generated for.
+    """
+    questions = list(HOME_QUESTIONS)
+    for template in FAQ_TEMPLATES:
+        questions.extend(template.format(scheme=scheme) for scheme in SCHEME_ALIASES)
+    return questions
+
+
+def prompt_version(system_prompt):
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class FAQStore:
+    """
+    Precomputed answers to canonical questions, served without retrieval or an LLM call.
+
+    Each entry holds the question, its answer, the cited chunks it was generated
+    from (chunk_ids plus their citation metadata) and the question embedding.
+    get() matches on the normalized question text; nearest() matches by cosine
+    similarity of question embeddings, and only between questions that name
+    the same schemes, since "exit load of Large Cap" and "exit load of Flexi
+    Cap" embed almost identically.
+    """
+
+    def __init__(self, entries, meta=None):
+        self.entries = entries
+        self.meta = meta or {}
+        self._by_key = {normalize_question(e["question"]): e for e in entries}
+        vectors = [e for e in entries if e.get("vector")]
+        self._vector_entries = vectors
+        self._matrix = None
+        if vectors:
+            matrix = np.asarray([e["vector"] for e in vectors], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrix = matrix / np.where(norms == 0, 1, norms)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, FAQ_STORE_FILENAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["entries"], data.get("meta"))
+
+    def save(self, directory):
+        path = os.path.join(directory, FAQ_STORE_FILENAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"meta": self.meta, "entries": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get(self, question):
+        return self._by_key.get(normalize_question(question))
+
+    def nearest(self, question, vector, threshold):
+        """
+        The entry whose question embedding is most similar to vector, if at
+        least threshold and it names the same schemes as question; else None.
+        """
+        if self._matrix is None or vector is None:
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm or query.shape[0] != self._matrix.shape[1]:
+            return None
+        scores = self._matrix @ (query / norm)
+        schemes = sorted(detect_schemes(question))
+        for i in np.argsort(-scores):
+            if scores[i] < threshold:
+                return None
+            entry = self._vector_entries[i]
+            if sorted(entry.get("schemes", [])) == schemes:
+                return entry
+        return None
+
+    def documents(self, entry):
+        """
+        The cited chunks of an entry as Documents (metadata only), for the audit log.
+        """
+        return [Document(page_content="", id=source.get("chunk_id"), metadata=source) for source in entry.get("sources", [])]
+
+
+def build_faq_store(service, questions=None, previous=None):
+    """
+    Answers every canonical question through service's own retrieval and
+    generation (same prompt, context packing and citations as live queries).
+
+    An entry of the previous store is reused as-is when the question retrieves
+    exactly the same chunks (chunk ids are content hashes) under the same
+    system prompt and model; only questions whose underlying chunks changed
+    cost an LLM call. Questions that fail or come back as a refusal are left
+    out so they keep going through the live pipeline.
+    """
+    questions = questions or canonical_questions()
+    version = prompt_version(service.system_prompt_text)
+    llm_model = getattr(service.llm, "model_name", None) or type(service.llm).__name__
+    reusable = {}
+    if previous is not None and previous.meta.get("prompt_version") == version and previous.meta.get("llm_model") == llm_model:
+        reusable = {e["question"]: e for e in previous.entries}
+
+    vectors = service.embeddings.embed_documents(questions)
+    entries = []
+    generated = 0
+    for question, vector in zip(questions, vectors):
+        try:
+            docs = service.retrieve_uncached(question, vector)
+            chunk_ids = [doc.id or doc.metadata.get("chunk_id") for doc in docs]
+            old = reusable.get(question)
+            if old is not None and old.get("chunk_ids") == chunk_ids:
+                answer = old["answer"]
+            else:
+                answer = service.answer_uncached(question, docs)
+                generated += 1
+        except Exception as e:
+            print(f"Warning: Could not precompute an answer for {question!r}: {e}")
+            continue
+        if is_refusal(answer):
+            continue
+        entries.append({
+            "question": question,
+            "schemes": detect_schemes(question),
+            "answer": answer,
+            "chunk_ids": chunk_ids,
+            "sources": [
+                {
+                    "chunk_id": cid,
+                    "scheme_name": doc.metadata.get("scheme_name"),
+                    "file_name": doc.metadata.get("file_name"),
+                    "page": doc.metadata.get("page"),
+                    "public_url": service.citation_url(doc.metadata),
+                }
+                for cid, doc in zip(chunk_ids, docs)
+            ],
+            "vector": [float(x) for x in vector],
+        })
+    meta = {
+        "generated_at": time.time(),
+        "embedding_model": service.embeddings.model_name,
+        "llm_model": llm_model,
+        "prompt_version": version,
+    }
+    return FAQStore(entries, meta), generated
@@ -0,0 +1,32 @@
+import os
+import time
+import uuid
+
+# Written by scripts/ingest.py after every successful run. Anything derived from
+# the collection (answer caches, snapshots, precomputed stores) compares this
+# stamp to decide whether it is stale.
+STAMP_FILENAME = ".ingest_stamp"
+
+
+def write_stamp(persist_dir):
+    """
+    Marks the vector store at persist_dir as freshly (re-)ingested.
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    stamp_path = os.path.join(persist_dir, STAMP_FILENAME)
+    tmp_path = f"{stamp_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(f"{time.time()} {uuid.uuid4().hex}\n")
+    os.replace(tmp_path, stamp_path)
+
+
+def read_stamp(persist_dir):
+    """
+    Returns an opaque version token for the vector store at persist_dir,
+    or None if it has never been stamped. Cheap enough to call per request.
+    """
+    try:
+        st = os.stat(os.path.join(persist_dir, STAMP_FILENAME))
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
@@ -0,0 +1,109 @@
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+
+# Written next to the Chroma files by scripts/ingest.py
+BM25_INDEX_FILENAME = "bm25_index.json.gz"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or the this "
+    "to was what when where which who will with me tell about does do can".split()
+)
+
+
+def tokenize(text):
+    """
+    Lowercased alphanumeric tokens; numbers (AMFI codes, percentages) are kept whole.
+    """
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    Compact inverted index with Okapi BM25 scoring over the enriched chunks.
+
+    Postings are stored as flat [doc, tf, doc, tf, ...] lists keyed by term; each
+    document carries its chunk ID (the Chroma ID) and scheme_name so searches
+    can be restricted the same way as the vector search.
+    """
+
+    def __init__(self, ids, schemes, doc_len, postings, k1=1.5, b=0.75):
+        self.ids = ids
+        self.schemes = schemes
+        self.doc_len = doc_len
+        self.postings = postings
+        self.k1 = k1
+        self.b = b
+        self.avgdl = (sum(doc_len) / len(doc_len)) if doc_len else 0.0
+
+    @classmethod
+    def build(cls, ids, texts, metadatas):
+        postings = {}
+        doc_len = []
+        schemes = []
+        for doc, (text, meta) in enumerate(zip(texts, metadatas)):
+            terms = tokenize(text or "")
+            doc_len.append(len(terms))
+            schemes.append((meta or {}).get("scheme_name"))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).extend((doc, tf))
+        return cls(list(ids), schemes, doc_len, postings)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["ids"], data["schemes"], data["doc_len"], data["postings"])
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "schemes": self.schemes,
+                "doc_len": self.doc_len,
+                "postings": self.postings,
+            }, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def search(self, query, n=10, schemes=None):
+        """
+        Returns up to n (chunk_id, score) pairs, best first. If schemes is given,
+        only chunks whose scheme_name is in it are considered.
+        """
+        total = len(self.ids)
+        if not total:
+            return []
+        allowed = set(schemes) if schemes else None
+        scores = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            df = len(plist) // 2
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for i in range(0, len(plist), 2):
+                doc, tf = plist[i], plist[i + 1]
+                if allowed is not None and self.schemes[doc] not in allowed:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc] / self.avgdl)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / norm
+        best = heapq.nlargest(n, scores.items(), key=lambda item: item[1])
+        return [(self.ids[doc], score) for doc, score in best]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses ranked ID lists: score(id) = sum over lists of 1 / (k + rank).
+    Returns [(id, fused score)] best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,267 @@
+import asyncio
+import bisect
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from .timing import failed_stage, start_timings
+
+# Minimal in-process Prometheus metrics (counters and histograms, text exposition
+# format), enough for the /metrics endpoint without an extra dependency. Updates
+# take one lock acquisition and a dict lookup, so they are cheap on the hot path.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 4, 6, 8, 10, 15, 20, 30, 50)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key)) + (extra or [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}_total{self._labels(key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., +Inf count], sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return sum(state[0]) if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{self._labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._gauge_callbacks = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, fn):
+        """
+        fn() returns [(name, documentation, {labels} or None, value)], read at scrape time.
+        """
+        self._gauge_callbacks.append(fn)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        documented = set()
+        for fn in self._gauge_callbacks:
+            try:
+                gauges = fn()
+            except Exception as e:
+                print(f"Warning: metrics gauge callback failed: {e}")
+                continue
+            for name, documentation, labels, value in gauges:
+                if name not in documented:
+                    documented.add(name)
+                    lines.append(f"# HELP {name} {documentation}")
+                    lines.append(f"# TYPE {name} gauge")
+                label_text = ""
+                if labels:
+                    label_text = "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+                lines.append(f"{name}{label_text} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+# --- RAG service metrics ---
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter(
+    "rag_requests", "Questions answered, by entry point and outcome.", ["path", "outcome"]
+)
+REQUEST_DURATION = REGISTRY.histogram(
+    "rag_request_duration_seconds", "End-to-end question latency.", ["path", "outcome"]
+)
+STAGE_DURATION = REGISTRY.histogram(
+    "rag_stage_duration_seconds", "Time spent in each pipeline stage.", ["stage"]
+)
+RETRIEVED_CHUNKS = REGISTRY.histogram(
+    "rag_retrieved_chunks", "Chunks passed to the LLM per generated answer.", buckets=COUNT_BUCKETS
+)
+TOKENS = REGISTRY.counter(
+    "rag_llm_tokens", "LLM tokens reported by the provider.", ["kind"]
+)
+ERRORS = REGISTRY.counter(
+    "rag_errors", "Failed questions, by the stage that raised and the exception class.", ["stage", "error_class"]
+)
+
+
+def observe_request(path, outcome, seconds, timings):
+    """
+    Records one finished question: its outcome and latency plus the per-stage
+    timings collected by timing.stage() while it ran.
+    """
+    REQUESTS.inc(path=path, outcome=outcome)
+    REQUEST_DURATION.observe(seconds, path=path, outcome=outcome)
+    for name, stage_seconds in (timings or {}).items():
+        STAGE_DURATION.observe(stage_seconds, stage=name)
+
+
+def observe_error(stage, error):
+    ERRORS.inc(stage=stage or "unknown", error_class=type(error).__name__)
+
+
+def observe_generation(chunk_count, usage):
+    """
+    chunk_count retrieved chunks went into a prompt; usage is the provider's
+    usage_metadata ({"input_tokens", "output_tokens", ...}) when it reports one.
+    """
+    RETRIEVED_CHUNKS.observe(chunk_count)
+    if usage:
+        TOKENS.inc(usage.get("input_tokens", 0), kind="prompt")
+        TOKENS.inc(usage.get("output_tokens", 0), kind="completion")
+
+
+def render():
+    return REGISTRY.render()
+
+
+class _Request:
+    def __init__(self, path, question):
+        self.path = path
+        self.question = question
+        self.request_id = uuid.uuid4().hex
+        self.outcome = "generated"
+        self.docs = None
+        self.rewritten = None
+        self.answer = None
+        self.error = None
+        self.timings = start_timings()
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+
+    def fail(self, error):
+        """
+        Marks the question failed and counts the error against the stage that raised it.
+        """
+        self.outcome = "error"
+        self.error = f"{type(error).__name__}: {error}"
+        observe_error(failed_stage(), error)
+
+
+def start_request(path, question=None):
+    """
+    Starts timing a question before it is known whether it will be tracked
+    here (e.g. a batch question that may still be handed on); record it by
+    passing it to track_request(request=...).
+    """
+    return _Request(path, question)
+
+
+@contextmanager
+def track_request(path, question=None, on_finish=None, request=None):
+    """
+    Wraps one question: starts stage timing, and on exit records the outcome
+    (set request.outcome on cache hits, call request.fail(e) on handled errors)
+    with the request latency and stage timings. Abandoned streams count as
+    "cancelled". on_finish(request) runs last, e.g. to write the audit record
+    (callers fill request.docs and request.answer for it). request continues
+    one from start_request() instead of starting a new one.
+    """
+    if request is None:
+        request = _Request(path, question)
+    try:
+        yield request
+    except (GeneratorExit, asyncio.CancelledError):
+        request.outcome = "cancelled"
+        raise
+    except Exception as e:
+        request.fail(e)
+        raise
+    finally:
+        request.elapsed = time.perf_counter() - request.start
+        observe_request(request.path, request.outcome, request.elapsed, request.timings)
+        if on_finish is not None:
+            on_finish(request)
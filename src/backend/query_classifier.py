@@ -0,0 +1,237 @@
+import math
+import re
+
+from .query_router import detect_schemes
+
+# Refusal templates from system_prompt.md (advice/forecast refusal, and the
+# missing-information answer it gives for questions outside the documents)
+REFUSAL_SOURCE = "Last updated from sources: <https://www.hdfcfund.com/>"
+REFUSALS = {
+    "advice": "I am a facts-only assistant and cannot provide investment advice or opinions. "
+              "Please consult a financial advisor.\n" + REFUSAL_SOURCE,
+    "off_topic": "I cannot find this information in the official documents.\n" + REFUSAL_SOURCE,
+}
+
+# Actions a recommendation is about
+ADVICE_VERBS = r"(?:invest|buy|sell|switch|hold|redeem|exit|put|move|stay|continue|start|stop|choose|pick)\w*"
+
+# Phrasings that always ask for a recommendation or a forecast, whatever they are about
+ADVICE_RULES = [
+    ("should_i", r"\bshould\s+(?:i|we|one|my\s+\w+)\s+(?:\w+\s+)?" + ADVICE_VERBS + r"\b"),
+    ("recommend", r"\b(?:recommend\w*|suggest\w*|advis(?:e|able))\b"),
+    ("worth_it", r"\bworth\s+(?:it|investing|buying|the)\b"),
+    ("forecast", r"\b(?:forecast\w*|predict\w*|future\s+(?:returns?|performance|nav|growth))\b|"
+                 r"\b(?:returns?|profits?|gains?)\b.{0,20}\b(?:can|will|would|should)\s+(?:i|we)\s+(?:expect|get|make|earn)\b"),
+    ("will_move", r"\b(?:will|would|going\s+to|gonna)\b.{0,40}\b(?:go\s+up|go\s+down|rise|fall|grow|crash|"
+                  r"outperform|beat|double|triple|recover|perform\s+well)\b"),
+]
+_ADVICE_PATTERNS = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in ADVICE_RULES]
+
+# Opinion and comparison phrasings; these also read as factual questions ("best
+# time to place a redemption request", "which scheme has the highest AUM"), so
+# they are only applied to questions without any FACT_TERMS
+OPINION_RULES = [
+    ("opinion", r"\b(?:good|bad|safe|risky|wise|smart|better|best)\s+(?:investment|idea|option|choice|bet)\b|"
+                r"\b(?:good|bad|safe|wise|smart)\s+(?:idea\s+)?to\s+" + ADVICE_VERBS + r"\b|"
+                r"\b(?:is|are)\s+(?:it|this|that|they|(?:the|hdfc)\b[\w\s]{0,40}?)\s+(?:a\s+|an\s+)?"
+                r"(?:good|bad|safe|safer|wise|better|worse)\b"),
+    ("best_fund", r"\b(?:best|better|worst|top\s+performing)\s+(?:fund|scheme|option|choice|investment|one|for\s+me)\b"),
+    ("which_better", r"\bwhich\b.{0,60}\b(?:better|best|safer|safest|prefer\w*)\b.{0,40}\b(?:for\s+me|to\s+" + ADVICE_VERBS
+                     + r"|invest\w*)\b|\bwhich\b.{0,60}\b(?:better|best|safer|safest)\s+(?:returns?|option|choice|fund|scheme|one)\b|"
+                     r"\bwhich\s+(?:one\s+)?is\s+(?:better|safer|best)\b|\bwhich\b.{0,60}\bwill\b.{0,40}\b(?:highest|best|most|more)\b"),
+    ("expected_returns", r"\bexpected\s+returns?\s+(?:from|of|on|in)\b"),
+    ("timing", r"\b(?:right|good|best)\s+time\s+to\s+" + ADVICE_VERBS + r"\b|\b(?:buy|sell|switch|invest)\s+now\b"),
+]
+_OPINION_PATTERNS = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in OPINION_RULES]
+
+# Facts the documents state; a question naming one of them ("Is there an exit load
+# if I redeem now?", "What documents should I submit?") is answered, not refused
+# as an opinion
+FACT_TERMS = re.compile(
+    r"\b(?:exit\s+loads?|expense\s+ratios?|ter|aum|navs?|sid|kim|sai|documents?|forms?|factsheets?|disclosures?|"
+    r"statements?|cut[\s-]*off|lock[\s-]*in|stamp\s+duty|kyc|benchmark|riskometer|holdings?|fund\s+managers?)\b",
+    re.IGNORECASE,
+)
+
+# Requests the documents can never answer (chit-chat, creative writing, general
+# knowledge); only applied to questions without any DOMAIN_TERMS
+OFF_TOPIC_RULES = [
+    ("creative", r"\b(?:write|compose|draft)\b.{0,30}\b(?:poem|song|story|essay|email|letter|code)\b|"
+                 r"\btell\s+me\s+(?:a\s+)?(?:joke|story|funny)"),
+    ("chit_chat", r"\b(?:play|chat)\s+(?:a\s+game|chess|with\s+me)\b|\bmeaning\s+of\s+life\b"),
+    ("everyday", r"\b(?:weather|recipe|cook|restaurant|movies?|flight|hotel|trip|travel|football|cricket|"
+                 r"world\s+cup|laptop|phone|password)\b"),
+    ("general_knowledge", r"\b(?:capital|population|prime\s+minister|president)\s+of\b|\b(?:who|which)\s+"
+                          r"(?:wrote|painted|invented|discovered|won)\b|\b(?:speed|boiling\s+point)\s+of\b"),
+    ("programming", r"\b(?:python|javascript|java|programming)\b"),
+]
+_OFF_TOPIC_PATTERNS = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in OFF_TOPIC_RULES]
+
+# Words that place a question inside the scheme documents; off-topic is only
+# decided for questions that use none of them
+DOMAIN_TERMS = frozenset("""
+    fund funds scheme schemes mutual nav navs sip sips stp swp lumpsum exit load loads expense ratio ter aum
+    holding holdings portfolio riskometer risk benchmark manager managers lock lockin elss tax taxation
+    redemption redeem allotment allotted kim sid sai factsheet factsheets hdfc amc equity debt dividend idcw
+    growth plan plans direct regular unit units investment invest investor investors objective minimum
+    installment instalment amount folio kyc nominee nomination switch allocation asset sector sectors stock
+    stocks bond bonds yield maturity duration category returns return performance inception launch nfo
+    trustee sebi amfi statement cams kfintech liquid flexi cap capital gains stamp duty cut off cutoff
+    settlement purchase application entry nri nris account deduction 80c sharpe beta deviation ratio ratios
+    prudence renamed exposure market markets nifty sensex index inflation money saving savings
+""".split())
+
+# Labelled examples the centroids are built from. tests/data/classifier_queries.jsonl
+# is a separate held-out set used to measure precision.
+SEED_QUERIES = {
+    "factual": [
+        "What is the exit load for HDFC Large Cap Fund?",
+        "Who is the fund manager of HDFC Flexi Cap Fund?",
+        "What is the expense ratio of the direct plan?",
+        "Minimum SIP amount for HDFC Balanced Advantage Fund?",
+        "What is the lock-in period of HDFC ELSS Tax Saver?",
+        "What are the top 10 holdings of HDFC Flexi Cap Fund?",
+        "What is the benchmark index of HDFC Liquid Fund?",
+        "What is the riskometer level of the scheme?",
+        "What is the AUM of HDFC Large Cap Fund as of last month?",
+        "What is the investment objective of HDFC Balanced Advantage Fund?",
+        "When was HDFC Flexi Cap Fund launched?",
+        "What is the minimum lumpsum investment?",
+        "How are capital gains on ELSS taxed?",
+        "What is the cut-off time for liquid fund redemptions?",
+        "What is the NAV of the growth option?",
+        "What is the asset allocation of the balanced advantage fund?",
+        "How do I redeem units of the scheme?",
+        "What documents are needed for KYC?",
+        "What is the portfolio turnover ratio?",
+        "Which sectors does HDFC Large Cap Fund invest in?",
+        "Can I invest in HDFC ELSS Tax Saver through SIP?",
+        "Who can invest in the scheme?",
+        "What was the one year return of HDFC Liquid Fund according to the factsheet?",
+        "What is the stamp duty on mutual fund purchases?",
+    ],
+    "advice": [
+        "Should I invest in HDFC Large Cap Fund?",
+        "Is HDFC Flexi Cap Fund a good investment?",
+        "Which fund is better for me, Large Cap or Flexi Cap?",
+        "Will the NAV go up next year?",
+        "Is it a good time to buy the ELSS fund?",
+        "Can you recommend a fund for retirement?",
+        "Should I sell my units now?",
+        "What returns can I expect in 5 years?",
+        "Is this scheme safe for my savings?",
+        "Will HDFC Liquid Fund beat inflation?",
+        "Which is the best HDFC fund to invest in?",
+        "Do you think the market will crash?",
+        "Is HDFC Balanced Advantage Fund worth it?",
+        "Should I switch from regular to direct plan?",
+        "How much should I invest every month?",
+        "Is it wise to put all my money in one fund?",
+        "Which scheme will give the highest returns?",
+        "Predict the future performance of the flexi cap fund",
+    ],
+    "off_topic": [
+        "What is the weather in Mumbai today?",
+        "Tell me a joke",
+        "Write a poem about the ocean",
+        "Who won the cricket match yesterday?",
+        "What is the capital of France?",
+        "How do I cook biryani?",
+        "What is the CEO's favorite color?",
+        "Translate this sentence into Hindi",
+        "Who is the prime minister of India?",
+        "Recommend a good movie to watch",
+        "How do I reset my phone password?",
+        "What is the price of bitcoin?",
+        "Can you help me write an email to my boss?",
+        "What time is it in London?",
+        "Explain quantum physics in simple words",
+        "Who wrote Romeo and Juliet?",
+        "Book a flight to Delhi",
+        "What is the best pizza place nearby?",
+    ],
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _features(text):
+    """
+    Word unigrams and bigrams of the lower-cased text, as a set.
+    """
+    words = _TOKEN.findall(text.lower())
+    return set(words) | {a + " " + b for a, b in zip(words, words[1:])}
+
+
+def _normalize(weights):
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return {term: w / norm for term, w in weights.items()}
+
+
+class QueryClassifier:
+    """
+    Cheap CPU pre-check run before any embedding or LLM call.
+
+    Questions without any DOMAIN_TERMS or scheme name that match
+    OFF_TOPIC_RULES are off-topic; questions matching an ADVICE_RULES phrasing,
+    or an OPINION_RULES phrasing without naming any FACT_TERMS, are advisory. Otherwise each question is scored against per-label
+    centroids of SEED_QUERIES (binary bag-of-words vectors, cosine
+    similarity); the advice or off_topic label is
+    only returned when it wins by `margin` and scores at least `min_score`, and
+    off_topic additionally requires that the question uses no DOMAIN_TERMS and
+    names no scheme. Anything else returns None and goes through retrieval and
+    the LLM as before, so the classifier only has to be precise, not complete.
+    The centroid never refuses a question naming FACT_TERMS as advice either.
+    """
+
+    def __init__(self, seeds=None, margin=0.12, min_score=0.25):
+        self.margin = margin
+        self.min_score = min_score
+        self.centroids = {}
+        for label, questions in (seeds or SEED_QUERIES).items():
+            totals = {}
+            for question in questions:
+                features = _features(question)
+                weight = 1.0 / math.sqrt(len(features) or 1)
+                for term in features:
+                    totals[term] = totals.get(term, 0.0) + weight
+            self.centroids[label] = _normalize(totals)
+
+    def scores(self, question):
+        """
+        Cosine similarity of the question to each label centroid.
+        """
+        features = _features(question)
+        if not features:
+            return {label: 0.0 for label in self.centroids}
+        scale = 1.0 / math.sqrt(len(features))
+        return {
+            label: scale * sum(centroid.get(term, 0.0) for term in features)
+            for label, centroid in self.centroids.items()
+        }
+
+    def classify(self, question):
+        """
+        Returns (label, reason) for a question to refuse without retrieval,
+        label being "advice" or "off_topic", or None to answer it normally.
+        """
+        in_domain = bool(DOMAIN_TERMS & _features(question) or detect_schemes(question))
+        if not in_domain:
+            for name, pattern in _OFF_TOPIC_PATTERNS:
+                if pattern.search(question):
+                    return "off_topic", f"rule:{name}"
+        asks_fact = bool(FACT_TERMS.search(question))
+        for name, pattern in _ADVICE_PATTERNS + ([] if asks_fact else _OPINION_PATTERNS):
+            if pattern.search(question):
+                return "advice", f"rule:{name}"
+
+        scores = self.scores(question)
+        best = max(scores, key=scores.get)
+        if best == "factual" or scores[best] < self.min_score:
+            return None
+        runner_up = max(score for label, score in scores.items() if label != best)
+        if scores[best] - runner_up < self.margin:
+            return None
+        if best == "off_topic" and in_domain or best == "advice" and asks_fact:
+            return None
+        return best, f"centroid:{scores[best]:.2f}"
@@ -0,0 +1,61 @@
+import re
+
+# Canonical scheme names with the aliases users type, including the historical
+# names listed in system_prompt.md (Top 100, Multi-Cap, Prudence, Tax Saver).
+SCHEME_ALIASES = {
+    "HDFC Large Cap Fund": [r"large[\s_-]*cap", r"top[\s_-]*100"],
+    "HDFC Flexi Cap Fund": [r"flexi[\s_-]*cap", r"multi[\s_-]*cap"],
+    "HDFC ELSS Tax Saver": [r"elss", r"tax[\s_-]*saver", r"tax[\s_-]*saving"],
+    "HDFC Balanced Advantage Fund": [r"balanced[\s_-]*advantage", r"prudence", r"baf"],
+    "HDFC Liquid Fund": [r"liquid"],
+}
+
+_SCHEME_PATTERNS = [
+    (scheme, re.compile(r"\b(?:" + "|".join(aliases) + r")\b", re.IGNORECASE))
+    for scheme, aliases in SCHEME_ALIASES.items()
+]
+
+
+def detect_schemes(text):
+    """
+    Returns the canonical scheme names mentioned in text, in SCHEME_ALIASES order.
+    """
+    return [scheme for scheme, pattern in _SCHEME_PATTERNS if pattern.search(text)]
+
+
+class QueryRouter:
+    """
+    Maps a question to a Chroma metadata filter on `scheme_name`.
+
+    known_scheme_names are the scheme_name values actually stored in the collection
+    (derived from the raw/ folder names at ingest time); each is mapped onto a
+    canonical scheme with the same aliases, so the filter matches whatever
+    spelling ingest produced.
+    """
+
+    def __init__(self, known_scheme_names=None):
+        self.stored_names = {scheme: [scheme] for scheme in SCHEME_ALIASES}
+        if known_scheme_names:
+            mapped = {}
+            for name in known_scheme_names:
+                for scheme in detect_schemes(name)[:1]:
+                    mapped.setdefault(scheme, []).append(name)
+            self.stored_names.update(mapped)
+
+    def names_for(self, schemes):
+        """
+        Stored scheme_name values for the given canonical schemes.
+        """
+        return sorted({name for scheme in schemes for name in self.stored_names[scheme]})
+
+    def route(self, question):
+        """
+        Returns (schemes, filter) for the question; filter is None when no scheme is named.
+        """
+        schemes = detect_schemes(question)
+        if not schemes:
+            return schemes, None
+        names = self.names_for(schemes)
+        if len(names) == 1:
+            return schemes, {"scheme_name": names[0]}
+        return schemes, {"scheme_name": {"$in": names}}
@@ -1,67 +1,238 @@
 import os
-import json
+import asyncio
+import threading
+import httpx
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.documents import Document
+
+from .answer_cache import AnswerCache, normalize_question
+from .conversation import CandidateCache, resolve_turn
+from .faq_store import FAQStore, FAQ_STORE_FILENAME
+from .fact_store import FactStore, FACT_STORE_FILENAME
+from .embedding_cache import CachedEmbeddings
+from .index_stamp import read_stamp
+from .query_router import QueryRouter
+from .query_classifier import QueryClassifier, REFUSALS
+from .citations import CitationResolver, load_url_maps
+from .context_packer import pack_context
+from .reranker import make_scorer, select
+from .timing import stage, start_timings
+from .metrics import observe_generation, start_request, track_request
+from .audit_log import AuditLogger, audit_record
+from .vector_index import NumpyVectorIndex, VECTOR_SNAPSHOT_FILENAME, cosine_scores, mmr_select
+from .lexical_index import BM25Index, BM25_INDEX_FILENAME, reciprocal_rank_fusion
+from .single_flight import AsyncSingleFlight, LoopLocal, SingleFlight
 
 # Load environment variables
 load_dotenv()
 
 # Configuration
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-CHROMA_DB_DIR = os.path.join(BASE_DIR, "chroma_db")
+CHROMA_DB_DIR = os.getenv("CHROMA_DB_DIR", os.path.join(BASE_DIR, "chroma_db"))
 EMBEDDING_MODEL = "text-embedding-3-small"
 LLM_MODEL = "gpt-4o-mini"
+SEARCH_KWARGS = {"k": 10, "fetch_k": 30, "lambda_mult": 0.5}
+
+# Vector search backend: "chroma" (HNSW via the Chroma client) or "numpy" (exact search
+# over an in-memory matrix loaded from the snapshot ingest.py writes). "snapshot" is numpy
+# without ever opening Chroma, for several worker processes sharing the memory-mapped
+# snapshot read-only. VECTOR_DTYPE=float16 halves its memory at some scoring cost;
+# VECTOR_MMAP=0 reads the snapshot into RAM.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+VECTOR_MMAP = os.getenv("VECTOR_MMAP", "1") == "1"
+
+# Hybrid retrieval: BM25 candidates fused with the MMR results (reciprocal rank fusion).
+# Active when ingest.py has written the BM25 index; HYBRID_TOP_K chunks go to the LLM.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", "6"))
+BM25_CANDIDATES = int(os.getenv("BM25_CANDIDATES", "10"))
+
+# Optional rerank stage over the fetch_k candidate pool (replaces MMR/RRF selection when on).
+# RERANK_MODEL names a sentence-transformers cross-encoder; without it (or without the
+# package) a lexical-semantic CPU scorer is used.
+RERANK = os.getenv("RERANK", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL")
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "4"))
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE", "0.0"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+
+# Local pre-check that answers clearly advisory or off-topic questions with the
+# system_prompt.md refusal before any embedding, retrieval or LLM call
+QUERY_CLASSIFIER = os.getenv("QUERY_CLASSIFIER", "1") == "1"
+
+# Precomputed answers to canonical questions (written by ingest.py), served on a
+# normalized-text match or a question embedding at least FAQ_SIMILARITY similar
+FAQ_STORE = os.getenv("FAQ_STORE", "1") == "1"
+FAQ_SIMILARITY = float(os.getenv("FAQ_SIMILARITY", "0.92"))
+
+# Fact table extracted from the Fund Facts / Factsheet / KIM tables (written by
+# ingest.py): a question for one fact of one scheme (expense ratio, AUM, exit load,
+# benchmark, fund manager, top holdings, ...) is answered by lookup, without the LLM
+FACT_LOOKUP = os.getenv("FACT_LOOKUP", "1") == "1"
+
+# Single-flight coalescing: concurrent questions with the same normalized text,
+# retrieval parameters and index version share one embedding/retrieval/LLM run
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1") == "1"
+
+# Conversations: follow-ups are resolved against the last CONVERSATION_WINDOW user
+# turns, and the candidate pools of the last CANDIDATE_CACHE_SIZE scheme-filtered
+# searches are kept so follow-ups about the same scheme skip the search (0 = off)
+CONVERSATION_WINDOW = int(os.getenv("CONVERSATION_WINDOW", "4"))
+CANDIDATE_CACHE_SIZE = int(os.getenv("CANDIDATE_CACHE_SIZE", "64"))
+
+# Context packing: merged, de-duplicated chunks up to this many prompt tokens (0 = plain concatenation)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1800"))
+
+# Answer cache (set ANSWER_CACHE_SIZE=0 to disable)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+# Embedding cache (in-memory LRU + on-disk store shared with ingest.py)
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+
+# Async serving: max queries doing upstream (embedding/LLM) work at once per event loop,
+# and the size of the shared HTTP connection pool used by the OpenAI clients
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "32"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "64"))
+
+# Audit log (architecture.md section 6): one JSONL record per question, written off the
+# request path as rotated, gzip-compressed files under AUDIT_LOG_DIR
+AUDIT_LOG = os.getenv("AUDIT_LOG", "1") == "1"
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", os.path.join(BASE_DIR, "logs", "audit"))
+AUDIT_LOG_MAX_BYTES = int(os.getenv("AUDIT_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+AUDIT_LOG_MAX_FILES = int(os.getenv("AUDIT_LOG_MAX_FILES", "50"))
+
+# Batch queries: default fan-out for query_many / aquery_many
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+
+def _with_similarity(docs, scores):
+    # Cosine similarity to the question, recorded per chunk in the audit log
+    for doc, score in zip(docs, scores):
+        doc.metadata["similarity"] = float(score)
+    return docs
 
 
 class RAGService:
-    def __init__(self):
+    def __init__(self, embeddings=None, llm=None, audit_log=None):
+        """
+        embeddings / llm replace the OpenAI providers (e.g. the deterministic
+        stand-ins scripts/bench_pipeline.py uses); no API key is needed when
+        both are given. audit_log overrides the AUDIT_LOG setting (ingest.py
+        turns it off; its questions are not user traffic).
+        """
         # 1. Try environment variables, then falls back to Streamlit secrets for cloud deployment
         self.api_key = os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
+        if not self.api_key and (embeddings is None or llm is None):
             try:
                 import streamlit as st
                 self.api_key = st.secrets.get("OPENAI_API_KEY")
             except:
                 pass
         
-        if not self.api_key:
-            raise ValueError("OPENAI_API_KEY not found. Please set it in .env or Streamlit Secrets.")
+            if not self.api_key:
+                raise ValueError("OPENAI_API_KEY not found. Please set it in .env or Streamlit Secrets.")
 
         # Load Manifest for URL mapping
         self.url_map = {}
         self._load_manifest()
 
-        # 1. Initialize Embeddings
-        self.embeddings = OpenAIEmbeddings(
-            model=EMBEDDING_MODEL, 
-            openai_api_key=self.api_key
+        # Pooled HTTP clients shared by the embeddings and LLM clients (keep-alive reuse)
+        pool_limits = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+        self.http_client = httpx.Client(limits=pool_limits, timeout=60.0)
+        self.http_async_client = httpx.AsyncClient(limits=pool_limits, timeout=60.0)
+
+        # 1. Initialize Embeddings (cached, so repeated questions skip the network call)
+        # Cache keys carry the model name; stand-ins are keyed by their own name
+        embedding_model_name = None if embeddings is not None else EMBEDDING_MODEL
+        if embeddings is None:
+            embeddings = OpenAIEmbeddings(
+                model=EMBEDDING_MODEL, 
+                openai_api_key=self.api_key,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client
+            )
+        self.embeddings = CachedEmbeddings(
+            embeddings,
+            cache_dir=EMBEDDING_CACHE_DIR,
+            memory_size=EMBEDDING_CACHE_SIZE,
+            model_name=embedding_model_name
         )
 
         # 2. Load Vector Store
         if not os.path.exists(CHROMA_DB_DIR):
             raise FileNotFoundError(f"ChromaDB not found at '{CHROMA_DB_DIR}'. Run ingest.py first.")
         
-        self.vector_store = Chroma(
-            collection_name="hdfc_mutual_fund",
-            embedding_function=self.embeddings,
-            persist_directory=CHROMA_DB_DIR
-        )
+        # VECTOR_BACKEND=snapshot never opens Chroma (read-only multi-worker serving)
+        self.vector_store = None
+        self.retriever = None
+        if VECTOR_BACKEND != "snapshot":
+            self.vector_store = Chroma(
+                collection_name="hdfc_mutual_fund",
+                embedding_function=self.embeddings,
+                persist_directory=CHROMA_DB_DIR
+            )
 
-        self.retriever = self.vector_store.as_retriever(
-            search_type="mmr",
-            search_kwargs={"k": 10, "fetch_k": 30, "lambda_mult": 0.5}
-        )
+            self.retriever = self.vector_store.as_retriever(
+                search_type="mmr",
+                search_kwargs=SEARCH_KWARGS
+            )
+
+        # In-memory exact search backend (VECTOR_BACKEND=numpy or snapshot)
+        self._reload_lock = threading.Lock()
+        self.vector_index = None
+        self._vector_stamp = None
+        self._search_store()
+
+        # Scheme router: pre-filters retrieval by scheme_name when a query names a scheme
+        # (rebuilt when ingest.py re-stamps the store, so new schemes are routed)
+        self.router = None
+        self._router_stamp = None
+        self._get_router()
+
+        # Advisory / off-topic pre-check
+        self.classifier = QueryClassifier() if QUERY_CLASSIFIER else None
+
+        # Lexical index for hybrid retrieval (reloaded when ingest.py re-stamps the store)
+        self.lexical_index = None
+        self._lexical_stamp = None
+        self._get_lexical_index()
+
+        # Precomputed FAQ answers (reloaded with the other indexes)
+        self.faq_store = None
+        self._faq_stamp = None
+        self._get_faq_store()
+
+        # Structured fact table (reloaded with the other indexes)
+        self.fact_store = None
+        self._fact_stamp = None
+        self._get_fact_store()
+
+        # Optional rerank stage
+        self.scorer = None
+        if RERANK:
+            self.scorer = make_scorer(RERANK_MODEL, batch_size=RERANK_BATCH_SIZE, lexical_index=self.lexical_index)
 
         # 3. Initialize LLM
-        self.llm = ChatOpenAI(
-            model=LLM_MODEL, 
-            temperature=0.0, 
-            openai_api_key=self.api_key
-        )
+        if llm is None:
+            llm = ChatOpenAI(
+                model=LLM_MODEL, 
+                temperature=0.0, 
+                openai_api_key=self.api_key,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client,
+                stream_usage=True
+            )
+        self.llm = llm
 
         # 4. Setup Chain
         self.system_prompt_text = self._load_system_prompt()
@@ -79,90 +250,70 @@ Assistant:"""
             ("human", "Context:\n{context}\n\nQuestion: {question}")
         ])
 
-        self.chain = (
-            {
-                "context": self.retriever | self._format_docs, 
-                "question": RunnablePassthrough(), 
-                "system_prompt": lambda x: self.system_prompt_text
-            }
-            | self.prompt
-            | self.llm
-            | StrOutputParser()
+        # Legacy single-runnable chain (needs the Chroma retriever)
+        self.chain = None
+        if self.retriever is not None:
+            self.chain = (
+                {
+                    "context": self.retriever | self._format_docs, 
+                    "question": RunnablePassthrough(), 
+                    "system_prompt": lambda x: self.system_prompt_text
+                }
+                | self.prompt
+                | self.llm
+                | StrOutputParser()
+            )
+
+        # Generation runs prompt -> llm -> parser as separate timed stages (see _generate)
+        self.output_parser = StrOutputParser()
+
+        # 5. Answer Cache (invalidated whenever ingest.py re-stamps the store)
+        self.answer_cache = None
+        if ANSWER_CACHE_SIZE > 0:
+            self.answer_cache = AnswerCache(
+                max_size=ANSWER_CACHE_SIZE,
+                ttl=ANSWER_CACHE_TTL,
+                similarity_threshold=ANSWER_CACHE_SIMILARITY,
+                version_fn=lambda: read_stamp(CHROMA_DB_DIR)
+            )
+        self.candidate_cache = None
+        if CANDIDATE_CACHE_SIZE > 0:
+            self.candidate_cache = CandidateCache(
+                max_size=CANDIDATE_CACHE_SIZE,
+                version_fn=lambda: read_stamp(CHROMA_DB_DIR)
+            )
+
+        # 6. Concurrency cap for the async path, per event loop (the service may be
+        # shared by threads that each run their own loop)
+        self.query_semaphores = LoopLocal(lambda: asyncio.Semaphore(MAX_CONCURRENT_QUERIES))
+
+        # In-flight computations shared by identical questions (threads and each
+        # event loop have their own), see _flight_key
+        self.flights = SingleFlight()
+        self.aflights = AsyncSingleFlight()
+        self._retrieval_params = (
+            VECTOR_BACKEND, tuple(sorted(SEARCH_KWARGS.items())), HYBRID_SEARCH, HYBRID_TOP_K,
+            RERANK, RERANK_TOP_N, RERANK_MIN_SCORE, CONTEXT_TOKEN_BUDGET
         )
 
+        # 7. Audit log (background writer thread)
+        self.audit_log = None
+        if AUDIT_LOG if audit_log is None else audit_log:
+            try:
+                self.audit_log = AuditLogger(
+                    AUDIT_LOG_DIR,
+                    max_bytes=AUDIT_LOG_MAX_BYTES,
+                    max_files=AUDIT_LOG_MAX_FILES
+                )
+            except OSError as e:
+                print(f"Warning: Audit log disabled, cannot write to '{AUDIT_LOG_DIR}': {e}")
+
     def _load_manifest(self):
         """
-        Loads URL mapping. Prioritizes specific PDF links provided by user,
-        then fund landing pages from corpus.md for user-friendly citations.
-        """
-        # Specific PDF Mapping (User Provided)
-        self.pdf_url_map = {
-            # HDFC LARGE CAP FUND
-            "HDFC_LargeCapFund_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20Large%20Cap%20Fund%20dated%20November%2021%2C%202025_0.pdf",
-            "HDFC_LargeCapFund_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20Large%20Cap%20Fund%20dated%20November%2021%2C%202025_0.pdf",
-            "HDFC_LargeCapFund_Leaflet_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/HDFC%20Large%20Cap%20Fund%20Leaflet%20%28Jan%202026%29.pdf",
-            "HDFC_LargeCapFund_Presentation_September_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-10/HDFC%20Large%20Cap%20Fund%20Presentation%20%28September%202025%29.pdf",
-            "HDFC_LargeCapFund_Fund_Facts_January_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Fund%20Facts%20-%20HDFC%20Large%20Cap%20Fund_January%2026.pdf",
-            
-            # HDFC FLEXI CAP FUND
-            "HDFC_FlexiCap_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20Flexi%20Cap%20Fund%20dated%20November%2021%2C%202025_0.pdf",
-            "HDFC_FlexiCap_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20Flexi%20Cap%20Fund%20dated%20November%2021%2C%202025_1.pdf",
-            "HDFC_FlexiCap_Fund_Facts_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Fund%20Facts%20-%20HDFC%20Flexi%20Cap%20Fund_January%2026.pdf",
-            "HDFC_FlexiCap_Presentation_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-12/HDFC%20Flexi%20Cap%20Fund%20Presentation%20%28November%202025%29.pdf",
-            "HDFC_FlexiCap_Leaflet_Dec_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-12/HDFC%20Flexi%20Cap%20Fund%20Leaflet%20%28December%202025%29.pdf",
-            
-            # HDFC BALANCE ADVANTAGE FUND
-            "HDFC_BalancedAdvantage_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20Balanced%20Advantage%20Fund%20dated%20November%2021%2C%202025_0.pdf",
-            "HDFC_BalancedAdvantage_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20Balanced%20Advantage%20Fund%20dated%20November%2021%2C%202025_0.pdf",
-            "HDFC_BalancedAdvantage_Fund_Facts_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Fund%20Facts%20-%20HDFC%20Balanced%20Advantage%20Fund_January%2026.pdf",
-            "HDFC_BalancedAdvantage_Presentation_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Presentation%20-%20HDFC%20Balanced%20Advantage%20Fund%20%28Jan%202026%29.pdf",
-            "HDFC_BalancedAdvantage_Leaflet_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-11/Leaflet%20-%20HDFC%20Balanced%20Advantage%20Fund%20%28November%202025%29.pdf",
-            
-            # HDFC Tax Saver (ELSS)
-            "HDFC_ELSS_Tax_Saver_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20ELSS%20Tax%20Saver%20dated%20November%2021%2C%202025.pdf",
-            "HDFC_ELSS_Tax_Saver_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20ELSS%20Tax%20Saver%20dated%20November%2021%2C%202025_0.pdf",
-            "HDFC_ELSS_Tax_Saver_Presentation_Oct_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-10/HDFC%20ELSS%20Tax%20saver%20Presentation%20%28October%202025%29.pdf",
-            "HDFC_ELSS_Tax_Saver_Leaflet_Jan_2024.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-01/HDFC%20ELSS%20%20Tax%20saver%20Leaflet%20-%20January%202024%20%281%29.pdf",
-            "HDFC_ELSS_Tax_Saver_Fund_Facts_Jan_2026.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2026-02/Fund%20Facts%20-%20HDFC%20TaxSaver%20Fund_January%2026.pdf",
-            
-            # HDFC Liquid Fund
-            "HDFC_Liquid_SID_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/SID/2025-11/SID%20-%20HDFC%20Liquid%20Fund%20dated%20November%2021%2C%202025.pdf",
-            "HDFC_Liquid_KIM_21_Nov_2025.pdf": "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20Liquid%20Fund%20dated%20November%2021%2C%202025.pdf",
-            "HDFC_Liquid_Fund_Facts_Dec_2025.pdf": "https://files.hdfcfund.com/s3fs-public/Others/2025-12/Fund%20Facts%20-%20HDFC%20Liquid%20Fund%20-%20December%202025%20%5Ba%5D.pdf",
-        }
-
-        # Primary Mapping from corpus.md
-        self.url_map = {
-            "HDFC_LargeCap_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-large-cap-fund/direct",
-            "HDFC_LargeCap_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
-            "HDFC_LargeCapFund_SID_21_Nov_2025": "https://www.hdfcfund.com/investor-services/fund-documents/sid",
-            "HDFC_FlexiCap_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-flexi-cap-fund/direct",
-            "HDFC_FlexiCap_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
-            "HDFC_ELSS_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-elss-tax-saver/direct",
-            "HDFC_ELSS_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
-            "HDFC_BalancedAdvantage_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-balanced-advantage-fund/direct",
-            "HDFC_BalancedAdvantage_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
-            "HDFC_Liquid_ProductPage": "https://www.hdfcfund.com/explore/mutual-funds/hdfc-liquid-fund/direct",
-            "HDFC_Liquid_KIM": "https://www.hdfcfund.com/investor-services/fund-documents/kim",
-            "HDFC_Factsheets": "https://www.hdfcfund.com/investor-services/factsheets",
-            "HDFC_SchemeSummary": "https://www.hdfcfund.com/investor-services/fund-documents/scheme-summary",
-            "AMFI_NAV": "https://www.amfiindia.com/spages/NAVAll.txt",
-        }
-        
-        # Fallback to manifest for any missing entries
-        manifest_path = os.path.join(BASE_DIR, "raw/corpus_manifest.json")
-        if os.path.exists(manifest_path):
-            try:
-                with open(manifest_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    for doc in data.get("documents", []):
-                        # Map base filename to URL
-                        name = doc.get("name")
-                        url = doc.get("url")
-                        if name and url and name not in self.url_map:
-                            self.url_map[name] = url
-            except Exception as e:
-                print(f"Warning: Failed to load manifest fallback: {e}")
+        Loads URL mapping (see citations.load_url_maps) and builds the citation resolver.
+        """
+        self.pdf_url_map, self.url_map = load_url_maps(BASE_DIR)
+        self.citations = CitationResolver(self.pdf_url_map, self.url_map)
 
     def _load_system_prompt(self):
         try:
@@ -175,59 +326,843 @@ Assistant:"""
     def _format_docs(self, docs):
         formatted = []
         for doc in docs:
-            # Prefer enriched metadata if available
-            scheme_name = doc.metadata.get('scheme_name')
-            doc_type = doc.metadata.get('document_name')
-            full_path = doc.metadata.get('source', 'Unknown')
-            filename = os.path.basename(full_path.replace('\\', '/'))
-            
-            # 1. Check if we have a direct PDF mapping for this filename
-            public_url = self.pdf_url_map.get(filename)
-            
-            # 2. If no direct PDF link, fall back to landing pages
-            if not public_url:
-                # Map scheme to slug
-                slug_map = {
-                    "HDFC Large Cap Fund": "hdfc-large-cap-fund",
-                    "HDFC Flexi Cap Fund": "hdfc-flexi-cap-fund",
-                    "HDFC ELSS Tax Saver": "hdfc-elss-tax-saver",
-                    "HDFC Balanced Advantage Fund": "hdfc-balanced-advantage-fund",
-                    "HDFC Liquid Fund": "hdfc-liquid-fund"
-                }
-                
-                fund_slug = slug_map.get(scheme_name)
-                
-                # Redundancy check for slug
-                if not fund_slug:
-                    filename_lower = filename.lower()
-                    if "largecap" in filename_lower or "top 100" in filename_lower: fund_slug = "hdfc-large-cap-fund"
-                    elif "flexicap" in filename_lower or "multi-cap" in filename_lower: fund_slug = "hdfc-flexi-cap-fund"
-                    elif "elss" in filename_lower or "tax_saver" in filename_lower: fund_slug = "hdfc-elss-tax-saver"
-                    elif "balancedadvantage" in filename_lower or "prudence" in filename_lower: fund_slug = "hdfc-balanced-advantage-fund"
-                    elif "liquid" in filename_lower: fund_slug = "hdfc-liquid-fund"
-
-                if fund_slug:
-                    public_url = f"https://www.hdfcfund.com/explore/mutual-funds/{fund_slug}/direct"
-                elif doc_type and "Factsheet" in doc_type:
-                    public_url = "https://www.hdfcfund.com/investor-services/factsheets"
-                elif doc_type and "SID" in doc_type:
-                    public_url = "https://www.hdfcfund.com/investor-services/fund-documents/sid"
-                elif doc_type and "KIM" in doc_type:
-                    public_url = "https://www.hdfcfund.com/investor-services/fund-documents/kim"
-                else:
-                    public_url = "https://www.hdfcfund.com/explore/mutual-funds"
+            # Resolved once at ingest time; older chunks fall back to the memoized resolver
+            public_url = self.citation_url(doc.metadata)
             
             # Append doc with source link
             formatted.append(f"--- Document Source ---\n{doc.page_content}\nSource Link: {public_url}")
         return "\n\n".join(formatted)
 
-    def query(self, user_question: str) -> str:
+    def _stored_scheme_names(self):
+        """
+        Distinct scheme_name values in the collection, so routing filters match
+        exactly what ingest.py stored.
+        """
+        try:
+            if self.vector_store is None:
+                return self.vector_index.scheme_names()
+            metadatas = self.vector_store.get(include=["metadatas"])["metadatas"]
+            return sorted({m.get("scheme_name") for m in metadatas if m and m.get("scheme_name")})
+        except Exception as e:
+            print(f"Warning: Could not read scheme names from collection: {e}")
+            return None
+
+    def _get_router(self):
+        stamp = read_stamp(CHROMA_DB_DIR)
+        if self.router is None or stamp != self._router_stamp:
+            if self.vector_store is None:
+                # Snapshot-only serving reads the names from the snapshot; reload it
+                # first (it takes the reload lock itself)
+                self._search_store()
+            with self._reload_lock:
+                if self.router is None or stamp != self._router_stamp:
+                    self.router = QueryRouter(self._stored_scheme_names())
+                    self._router_stamp = stamp
+        return self.router
+
+    def _get_lexical_index(self):
+        if not HYBRID_SEARCH:
+            return None
+        stamp = read_stamp(CHROMA_DB_DIR)
+        if self.lexical_index is None or stamp != self._lexical_stamp:
+            # Sessions share one service; only one thread reloads
+            with self._reload_lock:
+                if self.lexical_index is None or stamp != self._lexical_stamp:
+                    path = os.path.join(CHROMA_DB_DIR, BM25_INDEX_FILENAME)
+                    try:
+                        self.lexical_index = BM25Index.load(path) if os.path.exists(path) else None
+                    except Exception as e:
+                        print(f"Warning: Failed to load BM25 index: {e}")
+                        self.lexical_index = None
+                    self._lexical_stamp = stamp
+        return self.lexical_index
+
+    def _get_faq_store(self):
+        if not FAQ_STORE:
+            return None
+        stamp = read_stamp(CHROMA_DB_DIR)
+        if self.faq_store is None or stamp != self._faq_stamp:
+            with self._reload_lock:
+                if self.faq_store is None or stamp != self._faq_stamp:
+                    path = os.path.join(CHROMA_DB_DIR, FAQ_STORE_FILENAME)
+                    try:
+                        self.faq_store = FAQStore.load(CHROMA_DB_DIR) if os.path.exists(path) else None
+                    except Exception as e:
+                        print(f"Warning: Failed to load FAQ store: {e}")
+                        self.faq_store = None
+                    self._faq_stamp = stamp
+        return self.faq_store
+
+    def _get_fact_store(self):
+        if not FACT_LOOKUP:
+            return None
+        stamp = read_stamp(CHROMA_DB_DIR)
+        if self.fact_store is None or stamp != self._fact_stamp:
+            with self._reload_lock:
+                if self.fact_store is None or stamp != self._fact_stamp:
+                    if self.fact_store is not None:
+                        self.fact_store.close()
+                    path = os.path.join(CHROMA_DB_DIR, FACT_STORE_FILENAME)
+                    try:
+                        self.fact_store = FactStore.load(CHROMA_DB_DIR) if os.path.exists(path) else None
+                    except Exception as e:
+                        print(f"Warning: Failed to load fact store: {e}")
+                        self.fact_store = None
+                    self._fact_stamp = stamp
+        return self.fact_store
+
+    def _search_store(self):
+        """
+        The store vector search runs against: the in-memory NumPy index when
+        VECTOR_BACKEND=numpy or snapshot, otherwise Chroma. Both take the same filters.
+        """
+        if VECTOR_BACKEND not in ("numpy", "snapshot"):
+            return self.vector_store
+        stamp = read_stamp(CHROMA_DB_DIR)
+        if self.vector_index is None or stamp != self._vector_stamp:
+            with self._reload_lock:
+                if self.vector_index is None or stamp != self._vector_stamp:
+                    self.vector_index = self._load_vector_index()
+                    self._vector_stamp = stamp
+        return self.vector_index
+
+    def _load_vector_index(self):
+        # Snapshot written by ingest.py (memory-mapped); rebuilt from the collection if missing
+        if self.vector_store is None:
+            # Snapshot-only serving: keep answering from the previous snapshot if the new one is unreadable
+            try:
+                return NumpyVectorIndex.load(CHROMA_DB_DIR, dtype=VECTOR_DTYPE, mmap=VECTOR_MMAP)
+            except Exception as e:
+                if self.vector_index is None:
+                    raise FileNotFoundError(f"Vector snapshot in '{CHROMA_DB_DIR}' is unreadable ({e}). Run ingest.py first.")
+                print(f"Warning: Failed to reload vector snapshot, still serving the previous one: {e}")
+                return self.vector_index
+        try:
+            if os.path.exists(os.path.join(CHROMA_DB_DIR, VECTOR_SNAPSHOT_FILENAME)):
+                return NumpyVectorIndex.load(CHROMA_DB_DIR, dtype=VECTOR_DTYPE, mmap=VECTOR_MMAP)
+        except Exception as e:
+            print(f"Warning: Failed to load vector snapshot, rebuilding from collection: {e}")
+        return NumpyVectorIndex.from_collection(self.vector_store._collection, dtype=VECTOR_DTYPE)
+
+    def _fusion_plan(self, user_question, docs, scheme_names):
+        """
+        Fuses the vector results with BM25 candidates from the same schemes.
+        Returns ([(chunk id, fused score)] best first, docs by id); ids missing
+        from the map are lexical-only hits that still have to be fetched from Chroma.
+        Returns (None, None) when hybrid retrieval is off.
+        """
+        index = self._get_lexical_index()
+        if index is None:
+            return None, None
+        hits = index.search(user_question, n=BM25_CANDIDATES, schemes=scheme_names)
+        # Drop the long tail that only matched ubiquitous terms (e.g. header labels)
+        lexical = [cid for cid, score in hits if score >= 0.1 * hits[0][1]]
+        by_id = {doc.id: doc for doc in docs if doc.id}
+        ordered = reciprocal_rank_fusion([[doc.id for doc in docs if doc.id], lexical])[:HYBRID_TOP_K]
+        return ordered, by_id
+
+    def _fused_docs(self, ordered, by_id):
+        docs = []
+        for cid, score in ordered:
+            doc = by_id.get(cid)
+            if doc is not None:
+                doc.metadata["fusion_score"] = score
+                docs.append(doc)
+        return docs
+
+    def _retrieve(self, user_question, question_vector, previous=None):
+        """
+        MMR search from an already computed query embedding, so the vector
+        used for the semantic cache lookup is not embedded twice. Restricted to
+        the schemes named in the question; unfiltered when none are named or the
+        filtered search comes back empty. Fused with BM25 results when the
+        lexical index is available, or reranked when RERANK is on.
+        previous is the question the previous conversation turn was answered
+        as; its candidates are reused when it searched the same schemes.
+        """
+        if self.scorer:
+            return self._rerank_retrieve(user_question, question_vector, previous)
+
+        steps = self._retrieval_steps(user_question)
+        result = None
+        try:
+            while True:
+                op, arg = steps.send(result)
+                if op == "search":
+                    result = self._mmr_search(user_question, question_vector, arg, previous)
+                else:
+                    result = self._search_store().get_by_ids(arg)
+        except StopIteration as done:
+            return done.value
+
+    async def _aretrieve(self, user_question, question_vector, previous=None):
+        if self.scorer:
+            # Candidate fetch and scoring are CPU/local work; keep them off the event loop
+            return await asyncio.to_thread(self._rerank_retrieve, user_question, question_vector, previous)
+
+        steps = self._retrieval_steps(user_question)
+        result = None
+        try:
+            while True:
+                op, arg = steps.send(result)
+                if op == "search":
+                    result = await self._ammr_search(user_question, question_vector, arg, previous)
+                else:
+                    result = await self._search_store().aget_by_ids(arg)
+        except StopIteration as done:
+            return done.value
+
+    def _retrieval_steps(self, user_question):
+        """
+        The retrieval pipeline of _retrieve / _aretrieve without its I/O: a
+        generator that yields ("search", scheme filter) for an MMR search and
+        ("fetch", chunk ids) for lexical-only hits, is sent each result, and
+        returns the retrieved docs. The two wrappers only run the yielded calls,
+        sync or async.
+        """
+        router = self._get_router()
+        schemes, scheme_filter = router.route(user_question)
+        docs = None
+        with stage("vector_search"):
+            if scheme_filter:
+                docs = yield "search", scheme_filter
+            if not docs:
+                scheme_filter = None
+                docs = yield "search", None
+
+        with stage("lexical_search"):
+            scheme_names = router.names_for(schemes) if scheme_filter else None
+            ordered, by_id = self._fusion_plan(user_question, docs, scheme_names)
+            if ordered is None:
+                return docs
+            missing = [cid for cid, _ in ordered if cid not in by_id]
+            if missing:
+                fetched = yield "fetch", missing
+                by_id.update({doc.id: doc for doc in fetched})
+            return self._fused_docs(ordered, by_id)
+
+    def _candidate_pool(self, question_vector, scheme_filter):
+        """
+        The fetch_k nearest chunks with their stored embeddings, as (docs, vectors).
+        """
+        index = self._search_store()
+        if index is not self.vector_store:
+            return index.candidates(question_vector, SEARCH_KWARGS["fetch_k"], scheme_filter)
+        result = self.vector_store._collection.query(
+            query_embeddings=[question_vector],
+            n_results=SEARCH_KWARGS["fetch_k"],
+            where=scheme_filter,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        docs = [
+            Document(id=cid, page_content=text, metadata=meta or {})
+            for cid, text, meta in zip(result["ids"][0], result["documents"][0], result["metadatas"][0])
+        ]
+        return docs, list(result["embeddings"][0])
+
+    def _scheme_candidates(self, user_question, question_vector, scheme_filter, previous=None):
+        """
+        The candidate pool of a scheme-filtered search, as (docs, vectors): the
+        previous turn's pool when it searched the same schemes, otherwise a
+        fresh fetch_k search. Kept for this question's own follow-ups.
+        """
+        cache = self.candidate_cache
+        pool = cache.get(previous, scheme_filter) if cache and previous else None
+        if pool is None:
+            pool = self._candidate_pool(question_vector, scheme_filter)
+        if cache and pool[0]:
+            cache.put(user_question, scheme_filter, *pool)
+        return pool
+
+    def _mmr_search(self, user_question, question_vector, scheme_filter, previous=None):
+        """
+        MMR (SEARCH_KWARGS) over the candidate pool (the scheme's, when
+        filtered); same selection and order as the store's own
+        max_marginal_relevance_search_by_vector. Each chunk's cosine similarity
+        to the question is kept in metadata['similarity'] for the audit log.
+        """
+        if scheme_filter:
+            docs, vectors = self._scheme_candidates(user_question, question_vector, scheme_filter, previous)
+        else:
+            docs, vectors = self._candidate_pool(question_vector, None)
+        rows = mmr_select(
+            question_vector, vectors, SEARCH_KWARGS["k"], SEARCH_KWARGS["lambda_mult"],
+            by_relevance=self._search_store() is self.vector_store
+        )
+        return _with_similarity([docs[i] for i in rows], cosine_scores(question_vector, [vectors[i] for i in rows]))
+
+    async def _ammr_search(self, user_question, question_vector, scheme_filter, previous=None):
+        if self._search_store() is self.vector_store:
+            # Chroma queries block; the NumPy search is sub-millisecond and stays inline
+            return await asyncio.to_thread(self._mmr_search, user_question, question_vector, scheme_filter, previous)
+        return self._mmr_search(user_question, question_vector, scheme_filter, previous)
+
+    def _rerank_retrieve(self, user_question, question_vector, previous=None):
+        """
+        Scores the fetch_k candidate pool (plus BM25 hits) with the rerank scorer and
+        keeps the best RERANK_TOP_N chunks scoring at least RERANK_MIN_SCORE.
+        """
+        router = self._get_router()
+        schemes, scheme_filter = router.route(user_question)
+        with stage("vector_search"):
+            if scheme_filter:
+                docs, vectors = self._scheme_candidates(user_question, question_vector, scheme_filter, previous)
+            else:
+                docs, vectors = self._candidate_pool(question_vector, None)
+            if not docs and scheme_filter:
+                scheme_filter = None
+                docs, vectors = self._candidate_pool(question_vector, None)
+
+        with stage("lexical_search"):
+            index = self._get_lexical_index()
+            if index is not None:
+                scheme_names = router.names_for(schemes) if scheme_filter else None
+                seen = {doc.id for doc in docs}
+                extra = [cid for cid, _ in index.search(user_question, n=BM25_CANDIDATES, schemes=scheme_names) if cid not in seen]
+                if extra and self.vector_index is not None:
+                    docs = docs + self.vector_index.get_by_ids(extra)
+                    vectors = list(vectors) + list(self.vector_index.vectors_by_ids(extra))
+                elif extra:
+                    got = self.vector_store._collection.get(ids=extra, include=["documents", "metadatas", "embeddings"])
+                    vectors = list(vectors)
+                    for cid, text, meta, vec in zip(got["ids"], got["documents"], got["metadatas"], got["embeddings"]):
+                        docs.append(Document(id=cid, page_content=text, metadata=meta or {}))
+                        vectors.append(vec)
+
+        if not docs:
+            return docs
+        with stage("rerank"):
+            scores = self.scorer.score(user_question, question_vector, [doc.page_content for doc in docs], vectors)
+            _with_similarity(docs, cosine_scores(question_vector, vectors))
+            kept = select(docs, scores, RERANK_TOP_N, RERANK_MIN_SCORE)
+        for doc, score in kept:
+            doc.metadata["rerank_score"] = score
+        return [doc for doc, _ in kept]
+
+    def retrieve_with_timings(self, user_question):
+        """
+        Runs embedding and retrieval only and returns (docs, {stage: seconds}).
+        Used by scripts/debug_query.py to report per-stage latency.
+        """
+        timings = start_timings()
+        with stage("embed"):
+            question_vector = self.embeddings.embed_query(user_question)
+        docs = self._retrieve(user_question, question_vector)
+        return docs, timings
+
+    def warm_up(self):
+        """
+        Loads what the first question would otherwise load lazily (BM25 index,
+        the NumPy snapshot or Chroma's HNSW segment) by running one search with a
+        stored embedding. Makes no provider calls.
+        """
+        self._get_lexical_index()
+        store = self._search_store()
+        if self.vector_index is not None:
+            if len(self.vector_index):
+                store.max_marginal_relevance_search_by_vector(self.vector_index.matrix[0], **SEARCH_KWARGS)
+            return
+        sample = self.vector_store._collection.get(limit=1, include=["embeddings"])
+        if len(sample["ids"]):
+            store.max_marginal_relevance_search_by_vector(list(sample["embeddings"][0]), **SEARCH_KWARGS)
+
+    async def aprime_clients(self):
+        """
+        Opens a pooled connection to the provider from the serving event loop
+        (one tiny embedding call that bypasses the cache), so the first real
+        question skips TCP/TLS setup. The LLM shares the same connection pool.
+        """
+        await self.embeddings.underlying.aembed_query("warm-up")
+
+    def _precheck(self, request, user_question):
+        """
+        Runs the local classifier; for a question to refuse, records the refusal
+        on request and returns it, otherwise returns None.
+        """
+        if self.classifier is None:
+            return None
+        with stage("classify"):
+            verdict = self.classifier.classify(user_question)
+        if verdict is None:
+            return None
+        return self._refuse(request, verdict[0])
+
+    def _faq_exact(self, request, user_question):
+        store = self._get_faq_store()
+        return self._serve_faq(request, store, store.get(user_question) if store else None, "faq_exact")
+
+    def _fact_lookup(self, request, user_question):
+        """
+        Answers a recognised structured question from the fact table, recording
+        the answer and its source on request; else returns None.
+        """
+        store = self._get_fact_store()
+        if store is None:
+            return None
+        with stage("fact_lookup"):
+            hit = store.answer(user_question)
+        if hit is None:
+            return None
+        request.outcome, request.answer = "fact_lookup", hit[0]
+        request.docs = hit[1]
+        return hit[0]
+
+    def _serve_faq(self, request, store, entry, outcome):
+        """
+        Records a precomputed answer (and its cited chunks) on request and returns it.
+        """
+        if entry is None:
+            return None
+        request.outcome, request.answer = outcome, entry["answer"]
+        request.docs = store.documents(entry)
+        return entry["answer"]
+
+    def _resolve_turn(self, request, user_question, history):
+        """
+        Rewrites a follow-up with the schemes of the earlier turns in history.
+        Returns (question to answer, question the previous turn was answered
+        as or None); a rewrite is recorded on request for the audit log.
+        """
+        if not history or CONVERSATION_WINDOW <= 0:
+            return user_question, None
+        question, previous = resolve_turn(user_question, history, CONVERSATION_WINDOW)
+        if question != user_question:
+            request.rewritten = question
+        return question, previous
+
+    def _answer_exact(self, request, user_question, question=None):
+        """
+        Answers that need no embedding: pre-check refusals (of what the user
+        typed), then fact-table lookups, precomputed FAQ answers and exact
+        answer-cache hits (of the resolved question). Records the hit on
+        request and returns the answer, else None.
+        """
+        question = question or user_question
+        answer = self._precheck(request, user_question)
+        if answer is None:
+            answer = self._fact_lookup(request, question)
+        if answer is None:
+            answer = self._faq_exact(request, question)
+        if answer is None and self.answer_cache:
+            answer = self.answer_cache.get(question)
+            if answer is not None:
+                request.outcome, request.answer = "cache_exact", answer
+        return answer
+
+    def _similar_hit(self, user_question, question_vector):
+        """
+        A semantic answer-cache hit or a precomputed answer to a similar FAQ
+        question, as (outcome, answer, docs); else None.
+        """
+        if self.answer_cache:
+            cached = self.answer_cache.get_similar(user_question, question_vector)
+            if cached is not None:
+                return "cache_semantic", cached, None
+        store = self._get_faq_store()
+        if store is None or store.meta.get("embedding_model") != self.embeddings.model_name:
+            return None
+        entry = store.nearest(user_question, question_vector, FAQ_SIMILARITY)
+        if entry is None:
+            return None
+        return "faq_semantic", entry["answer"], store.documents(entry)
+
+    def _answer(self, request, user_question, question_vector=None, flight=None, previous=None):
+        """
+        Everything after the exact-match lookups: embedding (unless given),
+        semantic cache, similar FAQ answer, retrieval (see _retrieve for
+        previous) and generation, streaming the tokens into flight when given.
+        Returns (outcome, answer, docs).
+        Runs once per group of coalesced questions; request is the one that
+        started it and gets the retrieved chunks as soon as they are known.
+        """
+        if question_vector is None:
+            with stage("embed"):
+                question_vector = self.embeddings.embed_query(user_question)
+        hit = self._similar_hit(user_question, question_vector)
+        if hit is not None:
+            return hit
+
+        docs = self._retrieve(user_question, question_vector, previous)
+        request.docs = docs
+        if flight is None:
+            answer = self._generate(user_question, docs)
+        else:
+            parts = []
+            for token in self._generate_stream(user_question, docs):
+                parts.append(token)
+                flight.push(token)
+            answer = "".join(parts)
+
+        if self.answer_cache:
+            self.answer_cache.put(user_question, question_vector, answer)
+        return "generated", answer, docs
+
+    async def _aanswer(self, request, user_question, question_vector=None, flight=None, previous=None):
+        """
+        Async variant of _answer(); holds one of MAX_CONCURRENT_QUERIES slots.
+        """
+        async with self.query_semaphores.get():
+            if question_vector is None:
+                with stage("embed"):
+                    question_vector = await self.embeddings.aembed_query(user_question)
+            hit = self._similar_hit(user_question, question_vector)
+            if hit is not None:
+                return hit
+
+            docs = await self._aretrieve(user_question, question_vector, previous)
+            request.docs = docs
+            if flight is None:
+                answer = await self._agenerate(user_question, docs)
+            else:
+                parts = []
+                async for token in self._agenerate_stream(user_question, docs):
+                    parts.append(token)
+                    flight.push(token)
+                answer = "".join(parts)
+
+        if self.answer_cache:
+            self.answer_cache.put(user_question, question_vector, answer)
+        return "generated", answer, docs
+
+    def _flight_key(self, user_question, previous=None):
+        """
+        Questions are coalesced when their normalized text, the previous turn
+        whose candidates they may reuse, the retrieval parameters and the index
+        version all match; with COALESCE_REQUESTS off every key is unique.
+        """
+        if not COALESCE_REQUESTS:
+            return object()
+        return (
+            normalize_question(user_question),
+            normalize_question(previous) if previous else None,
+            self._retrieval_params,
+            read_stamp(CHROMA_DB_DIR),
+        )
+
+    def _record(self, request, result, leader):
+        """
+        Records an (outcome, answer, docs) result on request and returns the
+        answer; requests that waited on another's computation count as "coalesced".
+        """
+        outcome, answer, docs = result
+        request.outcome = outcome if leader else "coalesced"
+        request.answer = answer
+        if docs is not None:
+            request.docs = docs
+        return answer
+
+    def _refuse(self, request, label):
+        request.outcome, request.answer = f"refused_{label}", REFUSALS[label]
+        return request.answer
+
+    def _finish_request(self, request):
+        if self.audit_log:
+            self.audit_log.log(audit_record(request))
+
+    def cache_gauges(self):
+        """
+        Cache sizes and hit ratio for the /metrics endpoint, as metrics gauge tuples.
+        """
+        gauges = []
+        if self.answer_cache:
+            stats = self.answer_cache.stats()
+            gauges.append(("rag_answer_cache_entries", "Answers held in the answer cache.", None, stats["size"]))
+            gauges.append(("rag_answer_cache_hit_ratio", "Questions answered from the answer cache / questions looked up since start.", None, stats["hit_rate"]))
+            for tier in ("exact", "semantic"):
+                gauges.append(("rag_answer_cache_tier_hit_ratio", "Answer cache hits / lookups per tier since start.", {"tier": tier}, stats[f"hit_rate_{tier}"]))
+        stats = self.embeddings.stats()
+        gauges.append(("rag_embedding_cache_entries", "Vectors held in the in-memory embedding cache.", None, stats["memory_size"]))
+        if self.candidate_cache:
+            gauges.append(("rag_candidate_reuses", "Follow-up searches served from the previous turn's candidates since start.", None, self.candidate_cache.reuses))
+        return gauges
+
+    def _build_context(self, docs):
+        if CONTEXT_TOKEN_BUDGET > 0:
+            return pack_context(docs, CONTEXT_TOKEN_BUDGET, self.citation_url)
+        return self._format_docs(docs)
+
+    def citation_url(self, metadata):
+        """
+        Public link cited for a chunk: the URL resolved at ingest time, else resolved now.
+        """
+        return metadata.get('public_url') or self.citations.resolve(metadata)
+
+    def retrieve_uncached(self, question, question_vector=None):
+        """
+        The chunks question retrieves, with no answer cache, FAQ, fact-table or
+        candidate-pool reuse involved (used by ingest.py to precompute answers).
+        """
+        if question_vector is None:
+            question_vector = self.embeddings.embed_query(question)
+        return self._retrieve(question, question_vector)
+
+    def answer_uncached(self, question, docs=None):
+        """
+        Generates an answer to question from docs (retrieved with
+        retrieve_uncached when not given), bypassing every cache and lookup.
+        """
+        if docs is None:
+            docs = self.retrieve_uncached(question)
+        return self._generate(question, docs)
+
+    def _chain_input(self, user_question, docs):
+        return {
+            "context": self._build_context(docs),
+            "question": user_question,
+            "system_prompt": self.system_prompt_text
+        }
+
+    def _build_prompt(self, user_question, docs):
+        with stage("format_docs"):
+            chain_input = self._chain_input(user_question, docs)
+        with stage("prompt_build"):
+            return self.prompt.invoke(chain_input)
+
+    def _generate(self, user_question, docs):
+        prompt = self._build_prompt(user_question, docs)
+        with stage("llm"):
+            message = self.llm.invoke(prompt)
+        with stage("parse"):
+            answer = self.output_parser.invoke(message)
+        observe_generation(len(docs), getattr(message, "usage_metadata", None))
+        return answer
+
+    async def _agenerate(self, user_question, docs):
+        prompt = self._build_prompt(user_question, docs)
+        with stage("llm"):
+            message = await self.llm.ainvoke(prompt)
+        with stage("parse"):
+            answer = self.output_parser.invoke(message)
+        observe_generation(len(docs), getattr(message, "usage_metadata", None))
+        return answer
+
+    def _generate_stream(self, user_question, docs):
+        prompt = self._build_prompt(user_question, docs)
+        message = None
+        with stage("llm"):
+            for chunk in self.llm.stream(prompt):
+                message = chunk if message is None else message + chunk
+                if chunk.content:
+                    yield chunk.content
+        observe_generation(len(docs), getattr(message, "usage_metadata", None))
+
+    async def _agenerate_stream(self, user_question, docs):
+        prompt = self._build_prompt(user_question, docs)
+        message = None
+        with stage("llm"):
+            async for chunk in self.llm.astream(prompt):
+                message = chunk if message is None else message + chunk
+                if chunk.content:
+                    yield chunk.content
+        observe_generation(len(docs), getattr(message, "usage_metadata", None))
+
+    def query(self, user_question: str, history=None) -> str:
         """
         Queries the RAG system with a user question.
         Returns the answer as a string.
+
+        history: the conversation so far, as {"role", "content"} messages; a
+        follow-up ("and its expense ratio?") is answered about the scheme of
+        the earlier turns (see conversation.py).
+        """
+        with track_request("query", user_question, self._finish_request) as request:
+            try:
+                question, previous = self._resolve_turn(request, user_question, history)
+                answer = self._answer_exact(request, user_question, question)
+                if answer is not None:
+                    return answer
+
+                result, leader = self.flights.run(
+                    self._flight_key(question, previous), lambda flight: self._answer(request, question, previous=previous)
+                )
+                return self._record(request, result, leader)
+            except Exception as e:
+                request.fail(e)
+                request.answer = f"Error generating response: {str(e)}"
+                return request.answer
+
+    async def aquery(self, user_question: str, history=None) -> str:
+        """
+        Async variant of query() for the API. Cache hits return immediately;
+        everything else waits for one of MAX_CONCURRENT_QUERIES slots and runs
+        embedding, retrieval and generation without blocking the event loop.
+        Identical questions already in flight await that computation instead.
+        """
+        with track_request("aquery", user_question, self._finish_request) as request:
+            try:
+                question, previous = self._resolve_turn(request, user_question, history)
+                answer = self._answer_exact(request, user_question, question)
+                if answer is not None:
+                    return answer
+
+                result, leader = await self.aflights.run(
+                    self._flight_key(question, previous), lambda flight: self._aanswer(request, question, previous=previous)
+                )
+                return self._record(request, result, leader)
+            except Exception as e:
+                request.fail(e)
+                request.answer = f"Error generating response: {str(e)}"
+                return request.answer
+
+    def stream(self, user_question: str, history=None):
+        """
+        Streaming variant of query(): yields the answer incrementally as the LLM
+        produces tokens. Cached answers are yielded as a single chunk.
+
+        Generation runs on a background thread shared with every identical
+        question in flight; each caller replays its tokens from the start.
+        """
+        with track_request("stream", user_question, self._finish_request) as request:
+            try:
+                question, previous = self._resolve_turn(request, user_question, history)
+                answer = self._answer_exact(request, user_question, question)
+                if answer is not None:
+                    yield answer
+                    return
+
+                flight, leader = self.flights.start(
+                    self._flight_key(question, previous),
+                    lambda flight: self._answer(request, question, flight=flight, previous=previous)
+                )
+                streamed = False
+                for token in flight.stream():
+                    streamed = True
+                    yield token
+                answer = self._record(request, flight.result, leader)
+                if not streamed:
+                    yield answer
+            except Exception as e:
+                request.fail(e)
+                request.answer = f"Error generating response: {str(e)}"
+                yield request.answer
+
+    async def astream(self, user_question: str, history=None):
+        """
+        Async streaming variant used by the /chat/stream endpoint.
+        """
+        with track_request("astream", user_question, self._finish_request) as request:
+            try:
+                question, previous = self._resolve_turn(request, user_question, history)
+                answer = self._answer_exact(request, user_question, question)
+                if answer is not None:
+                    yield answer
+                    return
+
+                flight, leader = self.aflights.start(
+                    self._flight_key(question, previous),
+                    lambda flight: self._aanswer(request, question, flight=flight, previous=previous)
+                )
+                streamed = False
+                async for token in flight.stream():
+                    streamed = True
+                    yield token
+                answer = self._record(request, flight.task.result(), leader)
+                if not streamed:
+                    yield answer
+            except Exception as e:
+                request.fail(e)
+                request.answer = f"Error generating response: {str(e)}"
+                yield request.answer
+
+    def _batch_item(self, user_question, question_vector):
+        """
+        Answers one already-embedded question of a batch.
+        Returns {"answer": ..., "error": None} or {"answer": None, "error": ...}.
+        """
+        with track_request("batch", user_question, self._finish_request) as request:
+            try:
+                result, leader = self.flights.run(
+                    self._flight_key(user_question),
+                    lambda flight: self._answer(request, user_question, question_vector)
+                )
+                return {"answer": self._record(request, result, leader), "error": None}
+            except Exception as e:
+                request.fail(e)
+                return {"answer": None, "error": f"{type(e).__name__}: {e}"}
+
+    async def _abatch_item(self, user_question, question_vector, semaphore):
+        async with semaphore:
+            with track_request("batch", user_question, self._finish_request) as request:
+                try:
+                    result, leader = await self.aflights.run(
+                        self._flight_key(user_question),
+                        lambda flight: self._aanswer(request, user_question, question_vector)
+                    )
+                    return {"answer": self._record(request, result, leader), "error": None}
+                except Exception as e:
+                    request.fail(e)
+                    return {"answer": None, "error": f"{type(e).__name__}: {e}"}
+
+    def _batch_pending(self, questions, results):
+        """
+        Fills the answers that need no embedding (see _answer_exact) into results
+        and returns the indices still to answer. Only answered questions are
+        tracked here; the rest are tracked by _batch_item / _abatch_item.
         """
+        pending = []
+        for i, question in enumerate(questions):
+            request = start_request("batch", question)
+            try:
+                answer = self._answer_exact(request, question)
+            except Exception as e:
+                with track_request("batch", question, self._finish_request, request=request):
+                    request.fail(e)
+                results[i] = {"answer": None, "error": f"{type(e).__name__}: {e}"}
+                continue
+            if answer is None:
+                pending.append(i)
+                continue
+            with track_request("batch", question, self._finish_request, request=request):
+                results[i] = {"answer": answer, "error": None}
+        return pending
+
+    def query_many(self, questions, concurrency=None):
+        """
+        Answers a list of questions for offline workloads (regression runs, pre-warming).
+        All uncached questions are embedded in a single embeddings call; retrieval and
+        generation then run on up to `concurrency` threads. Results are returned in
+        input order, each as {"answer": str or None, "error": str or None}.
+        """
+        results = [None] * len(questions)
+        pending = self._batch_pending(questions, results)
+        if not pending:
+            return results
+
         try:
-            response = self.chain.invoke(user_question)
-            return response
+            vectors = self.embeddings.embed_documents([questions[i] for i in pending])
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            for i in pending:
+                results[i] = {"answer": None, "error": f"{type(e).__name__}: {e}"}
+            return results
+
+        with ThreadPoolExecutor(max_workers=concurrency or BATCH_CONCURRENCY) as pool:
+            answered = pool.map(self._batch_item, [questions[i] for i in pending], vectors)
+            for i, result in zip(pending, answered):
+                results[i] = result
+        return results
+
+    async def aquery_many(self, questions, concurrency=None):
+        """
+        Async variant of query_many() used by the /chat/batch endpoint.
+        """
+        results = [None] * len(questions)
+        pending = self._batch_pending(questions, results)
+        if not pending:
+            return results
+
+        try:
+            vectors = await self.embeddings.aembed_documents([questions[i] for i in pending])
+        except Exception as e:
+            for i in pending:
+                results[i] = {"answer": None, "error": f"{type(e).__name__}: {e}"}
+            return results
+
+        semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+        answered = await asyncio.gather(*[
+            self._abatch_item(questions[i], vector, semaphore)
+            for i, vector in zip(pending, vectors)
+        ])
+        for i, result in zip(pending, answered):
+            results[i] = result
+        return results
+
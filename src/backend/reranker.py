@@ -0,0 +1,99 @@
+import inspect
+import math
+
+import numpy as np
+
+from .lexical_index import tokenize
+
+
+class LexicalSemanticScorer:
+    """
+    Cheap CPU scorer: a blend of dense cosine similarity (query embedding vs. the
+    chunk embeddings Chroma already stores) and idf-weighted query-term coverage,
+    so exact terms like AMFI codes or "exit load" lift a chunk. Scores the whole
+    pool in one matrix-vector product.
+    """
+
+    name = "lexical-semantic"
+
+    def __init__(self, semantic_weight=0.7, lexical_index=None):
+        self.semantic_weight = semantic_weight
+        self.lexical_index = lexical_index
+
+    def score(self, question, question_vector, texts, vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        query = np.asarray(question_vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        semantic = (matrix @ query) / np.where(norms == 0, 1.0, norms)
+
+        terms = set(tokenize(question))
+        weights = {t: self._idf(t) for t in terms}
+        total = sum(weights.values()) or 1.0
+        lexical = np.array([
+            sum(w for t, w in weights.items() if t in chunk_terms) / total
+            for chunk_terms in (set(tokenize(text)) for text in texts)
+        ], dtype=np.float32)
+
+        w = self.semantic_weight
+        return (w * semantic + (1 - w) * lexical).tolist()
+
+    def _idf(self, term):
+        index = self.lexical_index
+        if index is None or not index.ids:
+            return 1.0
+        df = len(index.postings.get(term, ())) // 2
+        total = len(index.ids)
+        return math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+
+class CrossEncoderScorer:
+    """
+    Local cross-encoder (sentence-transformers) run on CPU in batches.
+    Logits are squashed to 0..1 so RERANK_MIN_SCORE means the same for both scorers.
+    predict() otherwise applies the model's configured activation (a sigmoid for
+    most one-label models), so raw logits are requested explicitly and squashed once.
+    """
+
+    def __init__(self, model_name, batch_size=16):
+        from sentence_transformers import CrossEncoder
+        self.name = model_name
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+        # activation_fct before sentence-transformers 3.0
+        params = inspect.signature(self.model.predict).parameters
+        self._activation_arg = "activation_fn" if "activation_fn" in params else "activation_fct"
+
+    def score(self, question, question_vector, texts, vectors):
+        logits = self.model.predict(
+            [(question, text) for text in texts],
+            batch_size=self.batch_size,
+            **{self._activation_arg: _identity}
+        )
+        return [1.0 / (1.0 + math.exp(-float(x))) for x in logits]
+
+
+def _identity(logits):
+    return logits
+
+
+def make_scorer(model_name=None, batch_size=16, lexical_index=None):
+    """
+    Cross-encoder when a model is configured and sentence-transformers is installed,
+    otherwise the lexical-semantic scorer.
+    """
+    if model_name:
+        try:
+            return CrossEncoderScorer(model_name, batch_size=batch_size)
+        except Exception as e:
+            print(f"Warning: Could not load rerank model '{model_name}', using lexical-semantic scorer: {e}")
+    return LexicalSemanticScorer(lexical_index=lexical_index)
+
+
+def select(docs, scores, top_n, min_score):
+    """
+    Keeps the best top_n docs scoring at least min_score (always at least one).
+    Returns [(doc, score)] best first.
+    """
+    ranked = sorted(zip(docs, scores), key=lambda item: item[1], reverse=True)
+    kept = [(doc, score) for doc, score in ranked[:top_n] if score >= min_score]
+    return kept or ranked[:1]
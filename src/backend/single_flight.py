@@ -0,0 +1,204 @@
+import asyncio
+import contextvars
+import threading
+import weakref
+
+
+class Flight:
+    """
+    One in-flight computation shared by every thread asking the same question:
+    the tokens produced so far (for streaming callers), then a result or an error.
+    """
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.result = None
+        self.error = None
+        self._cond = threading.Condition()
+
+    def push(self, token):
+        with self._cond:
+            self.tokens.append(token)
+            self._cond.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self._cond:
+            self.result, self.error, self.done = result, error, True
+            self._cond.notify_all()
+
+    def wait(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def stream(self):
+        """
+        Yields every token pushed so far and then each new one as it arrives;
+        raises the computation's error once it has failed.
+        """
+        sent = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.done or sent < len(self.tokens))
+                new, done = self.tokens[sent:], self.done
+            yield from new
+            sent += len(new)
+            if done:
+                break
+        if self.error is not None:
+            raise self.error
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key (threads): the first caller
+    (the leader) runs the computation, later callers wait for its result
+    instead of repeating it. A key is forgotten as soon as its computation
+    finishes, so results are never reused afterwards (that is the caches' job).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = Flight()
+            return flight, True
+
+    def _execute(self, key, flight, fn):
+        try:
+            flight.finish(fn(flight))
+        except BaseException as e:
+            flight.finish(error=e)
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def run(self, key, fn):
+        """
+        Returns (fn(flight) result, leader). Only the leader's fn runs, on the
+        calling thread; its exception is raised to every caller.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            self._execute(key, flight, fn)
+        return flight.wait(), leader
+
+    def start(self, key, fn):
+        """
+        Returns (flight, leader) for streaming callers. The leader's fn runs on
+        a background thread (with the caller's context, so stage timings land
+        on its request) and keeps running if the caller stops reading.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._execute, key, flight, fn), name="single-flight", daemon=True
+            ).start()
+        return flight, leader
+
+
+class AsyncFlight:
+    """
+    Event-loop counterpart of Flight; the computation is an asyncio task.
+    """
+
+    def __init__(self):
+        self.tokens = []
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def push(self, token):
+        self.tokens.append(token)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        # Shielded: a caller being cancelled must not cancel the shared computation
+        return await asyncio.shield(self.task)
+
+    async def stream(self):
+        sent = 0
+        while True:
+            while sent < len(self.tokens):
+                yield self.tokens[sent]
+                sent += 1
+            if self.task.done():
+                break
+            changed = asyncio.ensure_future(self._changed.wait())
+            try:
+                await asyncio.wait([changed, self.task], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                changed.cancel()
+        self.task.result()
+
+
+class LoopLocal:
+    """
+    One factory() object per running event loop. asyncio primitives bind to the
+    loop that first uses them, so objects shared across loops (the service
+    Streamlit's cache_resource hands to every script thread, each running its
+    own loop) keep theirs here.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._objects = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            obj = self._objects.get(loop)
+            if obj is None:
+                obj = self._objects[loop] = self.factory()
+        return obj
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines: the leader's computation runs as a task that
+    every caller with the same key awaits (shielded), so it finishes for the
+    others even when the caller that started it is cancelled. Flights are
+    shared within one event loop; each loop has its own.
+    """
+
+    def __init__(self):
+        self._flights = LoopLocal(dict)
+
+    def start(self, key, factory):
+        """
+        Returns (flight, leader); for the leader, factory(flight) is scheduled as flight.task.
+        """
+        flights = self._flights.get()
+        flight = flights.get(key)
+        if flight is not None and not flight.task.done():
+            return flight, False
+        flight = AsyncFlight()
+        flight.task = asyncio.ensure_future(factory(flight))
+        flights[key] = flight
+
+        def forget(task):
+            if flights.get(key) is flight:
+                del flights[key]
+            if not task.cancelled():
+                task.exception()  # retrieved here so an unawaited failure is not logged as lost
+
+        flight.task.add_done_callback(forget)
+        return flight, True
+
+    async def run(self, key, factory):
+        """
+        Returns (result, leader).
+        """
+        flight, leader = self.start(key, factory)
+        return await flight.wait(), leader
@@ -0,0 +1,43 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+# Per-request stage timings. A dict is installed by start_timings() at the top of a
+# request; stage() blocks anywhere below it (including threads spawned with
+# asyncio.to_thread, which copy the context) add their elapsed seconds to it.
+_timings = contextvars.ContextVar("stage_timings", default=None)
+# Innermost stage that raised during the current request (for error metrics); a
+# one-item list, so stages run in a copied context (shared computations) still report it
+_failed_stage = contextvars.ContextVar("failed_stage", default=None)
+
+
+def start_timings():
+    timings = {}
+    _timings.set(timings)
+    _failed_stage.set([None])
+    return timings
+
+
+def current_timings():
+    return _timings.get()
+
+
+def failed_stage():
+    failed = _failed_stage.get()
+    return failed[0] if failed else None
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        failed = _failed_stage.get()
+        if failed is not None and failed[0] is None:
+            failed[0] = name
+        raise
+    finally:
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
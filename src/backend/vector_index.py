@@ -0,0 +1,352 @@
+import gzip
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Each snapshot is written to its own vector_snapshot-<generation>/ directory; this
+# pointer file names the live one and is replaced in one atomic rename
+VECTOR_SNAPSHOT_FILENAME = "vector_snapshot.current"
+VECTOR_SNAPSHOT_DIR_PREFIX = "vector_snapshot-"
+VECTOR_MATRIX_FILENAME = "vector_snapshot.npy"
+VECTOR_SNAPSHOT_META_FILENAME = "vector_snapshot.json.gz"
+# Chunk texts and metadata (JSON) as memory-mappable columns: <name>.bin + <name>.idx.npy
+SNAPSHOT_COLUMNS = {"documents": "vector_snapshot_texts", "metadatas": "vector_snapshot_metadatas"}
+SCORE_BLOCK_ROWS = 256
+
+
+class MappedStrings:
+    """
+    Read-only sequence of strings kept as one UTF-8 blob plus an (n + 1) offsets
+    array. Both are memory-mapped, so processes serving the same snapshot share
+    one copy in the page cache and a string is only decoded when it is read.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def open(cls, directory, name, mmap=True):
+        blob_path = os.path.join(directory, name + ".bin")
+        offsets = np.load(os.path.join(directory, name + ".idx.npy"), mmap_mode="r" if mmap else None)
+        if not mmap:
+            blob = np.fromfile(blob_path, dtype=np.uint8)
+        elif os.path.getsize(blob_path) == 0:
+            blob = np.empty(0, dtype=np.uint8)  # numpy cannot map an empty file
+        else:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        return cls(blob, offsets)
+
+    @staticmethod
+    def write(directory, name, strings):
+        """
+        Writes the column files.
+        """
+        blob_path = os.path.join(directory, name + ".bin")
+        offsets_path = os.path.join(directory, name + ".idx.npy")
+        offsets = [0]
+        with open(blob_path, "wb") as f:
+            for text in strings:
+                data = text.encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        with open(offsets_path, "wb") as f:
+            np.save(f, np.asarray(offsets, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i %= len(self)
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class JsonRows:
+    """
+    A MappedStrings column of JSON objects, decoded on access (so every read
+    returns a fresh dict).
+    """
+
+    def __init__(self, strings):
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, i):
+        return json.loads(self.strings[i])
+
+    def __iter__(self):
+        return (json.loads(text) for text in self.strings)
+
+
+class NumpyVectorIndex:
+    """
+    Exact in-memory vector search over every chunk in the collection.
+
+    All embeddings live in one contiguous (n, dim) matrix of unit-length rows
+    (float32 or float16, optionally memory-mapped from the snapshot ingest.py
+    writes; chunk texts and metadata are then memory-mapped too, so several
+    serving processes share one copy), so top-k is one matrix-vector product and MMR is a few vectorized
+    passes over the fetch_k candidates. Exposes the subset of the Chroma vector
+    store API RAGService uses (MMR by vector, get_by_ids and their async forms),
+    with the same {"scheme_name": ...} / {"$in": [...]} filters.
+
+    Ranks by cosine similarity, which orders results the same as Chroma's L2
+    distance for the unit-length OpenAI embeddings.
+    """
+
+    def __init__(self, ids, documents, metadatas, matrix):
+        # documents / metadatas: lists, or MappedStrings / JsonRows from a snapshot
+        self.ids = list(ids)
+        self.documents = documents
+        self.metadatas = metadatas
+        self.matrix = matrix
+        self.position = {cid: i for i, cid in enumerate(self.ids)}
+        self._columns = {}
+
+    @classmethod
+    def from_collection(cls, collection, dtype="float32"):
+        """
+        Reads every chunk (text, metadata, embedding) from a Chroma collection.
+        """
+        data = collection.get(include=["documents", "metadatas", "embeddings"])
+        metadatas = [m or {} for m in data["metadatas"]]
+        return cls(data["ids"], list(data["documents"]), metadatas, _normalize(data["embeddings"], dtype))
+
+    @classmethod
+    def load(cls, directory, dtype="float32", mmap=True):
+        """
+        Loads the live snapshot from directory. With mmap the matrix (when the stored
+        dtype matches) and the text/metadata columns are memory-mapped read-only;
+        otherwise they are read (and converted) into memory.
+        """
+        generation = current_generation(directory)
+        if generation is not None:
+            directory = os.path.join(directory, generation)
+        # else: a snapshot written before generations, flat in directory
+        matrix = np.load(os.path.join(directory, VECTOR_MATRIX_FILENAME), mmap_mode="r" if mmap else None)
+        if matrix.dtype != np.dtype(dtype):
+            matrix = matrix.astype(dtype)
+        with gzip.open(os.path.join(directory, VECTOR_SNAPSHOT_META_FILENAME), "rt", encoding="utf-8") as f:
+            meta = json.load(f)
+        if "documents" in meta:
+            # Snapshots written before the mapped columns existed
+            documents, metadatas = meta["documents"], [m or {} for m in meta["metadatas"]]
+        else:
+            documents = MappedStrings.open(directory, SNAPSHOT_COLUMNS["documents"], mmap)
+            metadatas = JsonRows(MappedStrings.open(directory, SNAPSHOT_COLUMNS["metadatas"], mmap))
+        if not len(meta["ids"]) == matrix.shape[0] == len(documents) == len(metadatas):
+            raise ValueError("vector snapshot files do not match each other")
+        return cls(meta["ids"], documents, metadatas, matrix)
+
+    def save(self, directory):
+        """
+        Writes the snapshot: the matrix as .npy, chunk texts and metadata as mapped
+        string columns, ids as gzipped JSON. All files go into a new generation
+        directory that is published by atomically replacing the pointer file, so a
+        reader sees either the old or the new snapshot, never a mix. The previous
+        generation is kept for readers that resolved the pointer just before the
+        switch; older ones are removed.
+        """
+        previous = current_generation(directory)
+        generation = f"{VECTOR_SNAPSHOT_DIR_PREFIX}{uuid.uuid4().hex}"
+        target = os.path.join(directory, generation)
+        os.makedirs(target)
+        with open(os.path.join(target, VECTOR_MATRIX_FILENAME), "wb") as f:
+            np.save(f, np.ascontiguousarray(self.matrix))
+        MappedStrings.write(target, SNAPSHOT_COLUMNS["documents"], self.documents)
+        MappedStrings.write(
+            target, SNAPSHOT_COLUMNS["metadatas"], (json.dumps(m, ensure_ascii=False) for m in self.metadatas)
+        )
+        with gzip.open(os.path.join(target, VECTOR_SNAPSHOT_META_FILENAME), "wt", encoding="utf-8") as f:
+            json.dump({"ids": self.ids}, f)
+
+        pointer_path = os.path.join(directory, VECTOR_SNAPSHOT_FILENAME)
+        with open(pointer_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(generation + "\n")
+        os.replace(pointer_path + ".tmp", pointer_path)
+
+        for name in os.listdir(directory):
+            if name.startswith(VECTOR_SNAPSHOT_DIR_PREFIX) and name not in (generation, previous):
+                # Best effort: mapped files cannot be removed on Windows
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    def scheme_names(self):
+        """
+        Distinct scheme_name values across the snapshot.
+        """
+        return sorted({name for name in self._column("scheme_name") if name})
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Search ---
+
+    def similarity(self, query_vector, n, filter=None):
+        """
+        Exact top-n by cosine similarity. Returns (row indices, scores), best first.
+        """
+        if not self.ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self._scores(_normalize([query_vector], np.float32)[0])
+        mask = self._mask(filter)
+        if mask is not None:
+            scores[~mask] = -np.inf
+        n = min(n, len(scores) if mask is None else int(mask.sum()))
+        if n <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def mmr(self, query_vector, k=4, fetch_k=20, lambda_mult=0.5, filter=None):
+        """
+        Maximal marginal relevance over the exact fetch_k nearest rows
+        (same selection rule as langchain's maximal_marginal_relevance).
+        Returns row indices in selection order.
+        """
+        candidates, relevance = self.similarity(query_vector, fetch_k, filter)
+        if len(candidates) == 0:
+            return []
+        vectors = np.asarray(self.matrix[candidates], dtype=np.float32)
+        return [int(candidates[i]) for i in _mmr_order(relevance, vectors, k, lambda_mult)]
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k=4, fetch_k=20, lambda_mult=0.5, filter=None, **kwargs):
+        return self.to_documents(self.mmr(embedding, k, fetch_k, lambda_mult, filter))
+
+    async def amax_marginal_relevance_search_by_vector(self, embedding, k=4, fetch_k=20, lambda_mult=0.5, filter=None, **kwargs):
+        # Sub-millisecond for this corpus; not worth a thread hop
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, filter)
+
+    def candidates(self, query_vector, n, filter=None):
+        """
+        The n nearest chunks with their embeddings, as (docs, vectors).
+        """
+        rows, _ = self.similarity(query_vector, n, filter)
+        return self.to_documents(rows), np.asarray(self.matrix[rows], dtype=np.float32)
+
+    def get_by_ids(self, ids):
+        return self.to_documents([self.position[cid] for cid in ids if cid in self.position])
+
+    async def aget_by_ids(self, ids):
+        return self.get_by_ids(ids)
+
+    def vectors_by_ids(self, ids):
+        rows = [self.position[cid] for cid in ids if cid in self.position]
+        return np.asarray(self.matrix[rows], dtype=np.float32)
+
+    def to_documents(self, rows):
+        # Fresh metadata dicts: callers annotate them (e.g. rerank_score)
+        return [
+            Document(id=self.ids[i], page_content=self.documents[i], metadata=dict(self.metadatas[i]))
+            for i in rows
+        ]
+
+    def _scores(self, query):
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query
+        # NumPy has no BLAS path for float16; upcast a block at a time instead
+        # of materializing a float32 copy of the whole matrix
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(scores), SCORE_BLOCK_ROWS):
+            block = self.matrix[start:start + SCORE_BLOCK_ROWS]
+            np.dot(block.astype(np.float32), query, out=scores[start:start + len(block)])
+        return scores
+
+    def _mask(self, filter):
+        """
+        Boolean row mask for a single-key metadata filter: {key: value} or {key: {"$in": [...]}}.
+        """
+        if not filter:
+            return None
+        if len(filter) != 1:
+            raise ValueError(f"Unsupported filter: {filter}")
+        (key, condition), = filter.items()
+        if isinstance(condition, dict):
+            if set(condition) != {"$in"}:
+                raise ValueError(f"Unsupported filter: {filter}")
+            allowed = set(condition["$in"])
+        else:
+            allowed = {condition}
+        return np.isin(self._column(key), list(allowed))
+
+    def _column(self, key):
+        # One metadata field for every row, decoded once per process
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = np.array([m.get(key) for m in self.metadatas], dtype=object)
+        return column
+
+
+def current_generation(directory):
+    """
+    Name of the live snapshot generation directory in directory, or None if no
+    snapshot has been published there.
+    """
+    try:
+        with open(os.path.join(directory, VECTOR_SNAPSHOT_FILENAME), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def cosine_scores(query_vector, vectors):
+    """
+    Cosine similarity of query_vector to each of vectors.
+    """
+    if len(vectors) == 0:
+        return np.empty(0, dtype=np.float32)
+    return _normalize(vectors, np.float32) @ _normalize([query_vector], np.float32)[0]
+
+
+def mmr_select(query_vector, vectors, k=4, lambda_mult=0.5, by_relevance=False):
+    """
+    Maximal marginal relevance over a candidate pool of (unnormalized) vectors,
+    e.g. one kept from an earlier search. Returns positions in selection order,
+    or most relevant first with by_relevance (the order Chroma's MMR search returns).
+    """
+    if len(vectors) == 0:
+        return []
+    vectors = _normalize(vectors, np.float32)
+    relevance = vectors @ _normalize([query_vector], np.float32)[0]
+    selected = _mmr_order(relevance, vectors, k, lambda_mult)
+    if by_relevance:
+        selected.sort(key=lambda i: -relevance[i])
+    return selected
+
+
+def _mmr_order(relevance, vectors, k, lambda_mult):
+    # vectors are unit rows; starts from the most relevant one
+    pairwise = vectors @ vectors.T
+    first = int(np.argmax(relevance))
+    selected = [first]
+    redundancy = pairwise[first].copy()
+    available = np.ones(len(vectors), dtype=bool)
+    available[first] = False
+    for _ in range(min(k, len(vectors)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return selected
+
+
+def _normalize(vectors, dtype):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(matrix), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1.0, norms)
+    return np.ascontiguousarray(matrix, dtype=dtype)
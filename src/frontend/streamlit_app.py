@@ -3,6 +3,7 @@ import httpx
 import time
 import os
 import sys
+import json
 
 # Ensure root directory is in sys.path for direct module access on Streamlit Cloud
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
@@ -11,20 +12,55 @@ if root_path not in sys.path:
 
 # Potential Direct Import for Cloud Deployment
 try:
-    from src.backend.rag_engine import RAGService
+    from src.backend.engine_loader import EngineLoader
 except ImportError:
-    RAGService = None
+    EngineLoader = None
 
 # Configuration
 API_URL = "http://localhost:8000/chat"
+STREAM_API_URL = f"{API_URL}/stream"
+ENGINE_WARMUP_TIMEOUT = float(os.getenv("ENGINE_WARMUP_TIMEOUT", "120"))
 
-# Initialize local RAG instance if possible (Standard for Streamlit Cloud)
-if "rag_instance" not in st.session_state and RAGService:
-    try:
-        st.session_state.rag_instance = RAGService()
-    except Exception as e:
-        st.warning(f"Could not initialize local RAG: {e}")
-        st.session_state.rag_instance = None
+
+@st.cache_resource(show_spinner=False)
+def shared_engine():
+    """
+    One RAG engine per Streamlit process, shared by every browser session and
+    built in a background thread so the page renders while it warms up.
+    """
+    return EngineLoader().start()
+
+
+def stream_from_api(question, history):
+    """
+    Yields answer chunks from the backend's server-sent-events endpoint.
+    """
+    payload = {"query": question, "history": history}
+    with httpx.stream("POST", STREAM_API_URL, json=payload, timeout=60.0) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Backend returned {response.status_code}. Make sure API server is running locally.")
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                if event == "done":
+                    return
+                yield json.loads(line[len("data:"):]).get("token", "")
+            elif not line:
+                event = None
+
+
+def render_stream(placeholder, chunks):
+    """
+    Renders chunks into the placeholder as they arrive (with a cursor) and returns the full answer.
+    """
+    answer = ""
+    for chunk in chunks:
+        answer += chunk
+        placeholder.markdown(answer + "▌")
+    placeholder.markdown(answer)
+    return answer
 
 # --- UI CONFIGURATION ---
 st.set_page_config(
@@ -33,6 +69,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Shared local RAG engine if possible (Standard for Streamlit Cloud); falls back to the API
+engine = shared_engine() if EngineLoader else None
+
 # ChatGPT-like Minimalist Layout - Exact Match
 st.markdown("""
 <style>
@@ -209,6 +248,19 @@ st.markdown("""
         width: 100% !important;
     }
 
+    /* Engine warm-up status pill */
+    .engine-status {
+        position: fixed;
+        top: 24px;
+        right: 24px;
+        z-index: 999999;
+        background-color: #2F2F2F;
+        color: #8B949E;
+        border-radius: 50px;
+        padding: 6px 14px;
+        font-size: 13px;
+    }
+
     /* Subtle Footer Disclaimer */
     .fixed-footer {
         position: fixed;
@@ -227,6 +279,11 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- APP LOGIC ---
+if engine and engine.state == "warming":
+    st.markdown('<div class="engine-status">Warming up the assistant…</div>', unsafe_allow_html=True)
+elif engine and engine.state == "failed":
+    st.markdown(f'<div class="engine-status">Local engine unavailable ({type(engine.error).__name__}); using API</div>', unsafe_allow_html=True)
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -322,24 +379,23 @@ else:
                 </div>
             """, unsafe_allow_html=True)
             
+            # Earlier turns (current_q is already the last message), for follow-up questions
+            history = st.session_state.messages[:-1]
             try:
-                # 1. Try Direct RAG Instance (Preferred for Cloud)
-                if st.session_state.get("rag_instance"):
-                    answer = st.session_state.rag_instance.query(current_q)
-                    message_placeholder.markdown(answer)
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
-                    st.rerun()
+                # 1. Try the shared RAG engine (Preferred for Cloud); waits if it is still warming up
+                rag = engine.get(timeout=ENGINE_WARMUP_TIMEOUT) if engine else None
+                if rag:
+                    chunks = rag.stream(current_q, history=history)
                 
                 # 2. Fallback to Local API
                 else:
-                    response = httpx.post(API_URL, json={"query": current_q}, timeout=60.0)
-                    if response.status_code == 200:
-                        answer = response.json().get("answer", "No response.")
-                        message_placeholder.markdown(answer)
-                        st.session_state.messages.append({"role": "assistant", "content": answer})
-                        st.rerun()
-                    else:
-                        message_placeholder.error(f"Error: Backend returned {response.status_code}. Make sure API server is running locally.")
+                    chunks = stream_from_api(current_q, history)
+
+                answer = render_stream(message_placeholder, chunks) or "No response."
+                st.session_state.messages.append({"role": "assistant", "content": answer})
+                st.rerun()
+            except RuntimeError as e:
+                message_placeholder.error(f"Error: {e}")
             except Exception as e:
                 message_placeholder.error(f"Deployment Connection Error: {e}")
 
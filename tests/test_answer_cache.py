@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.answer_cache import AnswerCache
+
+LARGE_CAP = "What is the exit load of HDFC Large Cap Fund?"
+FLEXI_CAP = "What is the exit load of HDFC Flexi Cap Fund?"
+
+
+def test_exact_tier_ignores_case_and_punctuation_and_evicts_lru():
+    cache = AnswerCache(max_size=2)
+    cache.put(LARGE_CAP, None, "1% within one year.")
+    assert cache.get("what is the EXIT LOAD of hdfc large cap fund") == "1% within one year."
+    assert cache.get(FLEXI_CAP) is None
+
+    cache.put(FLEXI_CAP, None, "1% within one year.")
+    cache.get(LARGE_CAP)
+    cache.put("What is the benchmark of HDFC Liquid Fund?", None, "NIFTY Liquid Index A-I.")
+    assert cache.get(FLEXI_CAP) is None and cache.get(LARGE_CAP) is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["hits_exact"] == 3 and stats["misses_exact"] == 2
+    assert stats["hit_rate"] == stats["hit_rate_exact"] == 0.6
+
+
+def test_similar_tier_requires_the_same_schemes():
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.put(LARGE_CAP, [1.0, 0.0, 0.0], "Large cap answer.")
+
+    # Questions that differ only in the scheme embed almost identically
+    assert cache.get_similar(FLEXI_CAP, [1.0, 0.01, 0.0]) is None
+    assert cache.get_similar("Exit load for the large cap fund?", [1.0, 0.01, 0.0]) == "Large cap answer."
+    assert cache.get_similar("Exit load for the large cap fund?", [0.0, 1.0, 0.0]) is None
+
+    cache.put(FLEXI_CAP, [0.99, 0.05, 0.0], "Flexi cap answer.")
+    assert cache.get_similar("Flexi cap exit load?", [1.0, 0.0, 0.0]) == "Flexi cap answer."
+    assert cache.stats()["hits_semantic"] == 2 and cache.stats()["misses_semantic"] == 2
+    assert cache.stats()["hit_rate_semantic"] == 0.5
+
+
+def test_entries_expire_after_ttl():
+    cache = AnswerCache(ttl=0.05)
+    cache.put(LARGE_CAP, [1.0, 0.0], "Large cap answer.")
+    assert cache.get(LARGE_CAP) == "Large cap answer."
+    time.sleep(0.1)
+    assert cache.get(LARGE_CAP) is None
+    assert cache.get_similar(LARGE_CAP, [1.0, 0.0]) is None
+
+
+def test_cache_is_dropped_when_the_index_version_changes():
+    version = [1]
+    cache = AnswerCache(version_fn=lambda: version[0])
+    cache.put(LARGE_CAP, [1.0, 0.0], "Large cap answer.")
+    version[0] = 2
+    assert cache.get(LARGE_CAP) is None
+    assert cache.get_similar(LARGE_CAP, [1.0, 0.0]) is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["size"] == 0
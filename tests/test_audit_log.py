@@ -0,0 +1,59 @@
+import glob
+import os
+import sys
+import tempfile
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from langchain_core.documents import Document
+
+from src.backend.audit_log import AUDIT_FILE_PATTERN, AuditLogger, audit_record, is_refusal, iter_records
+from src.backend.metrics import _Request
+
+
+def test_records_are_batched_rotated_and_read_back_in_order():
+    directory = tempfile.mkdtemp()
+    logger = AuditLogger(directory, batch_size=10, flush_interval=0.05, max_bytes=600, max_files=100)
+    for i in range(200):
+        logger.log({"query": f"question {i}", "decision": "answer", "output": "x" * 40})
+    logger.close()
+
+    records = list(iter_records(directory))
+    assert [r["query"] for r in records] == [f"question {i}" for i in range(200)]
+    assert logger.stats()["written"] == 200
+    assert len(glob.glob(os.path.join(directory, AUDIT_FILE_PATTERN))) > 1
+
+
+def test_truncated_batch_does_not_hide_earlier_records():
+    directory = tempfile.mkdtemp()
+    logger = AuditLogger(directory, batch_size=1, flush_interval=0.01)
+    for i in range(3):
+        logger.log({"query": f"question {i}"})
+    logger.close()
+
+    path = logger.stats()["file"]
+    with open(path, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00partial")  # writer killed mid-member
+    assert [r["query"] for r in iter_records(directory)] == ["question 0", "question 1", "question 2"]
+
+
+def test_refusal_detection_matches_system_prompt_templates():
+    assert is_refusal("I am a facts-only assistant and cannot provide investment advice or opinions.")
+    assert is_refusal("I cannot find this information in the official documents.\nLast updated from sources: <x>")
+    assert not is_refusal("The exit load is 1% if redeemed within one year.")
+
+
+def test_chunks_carry_the_score_they_were_ranked_by_and_their_similarity():
+    request = _Request("chat", "What is the exit load of HDFC Large Cap Fund?")
+    request.answer = "1% within one year."
+    request.docs = [
+        Document(id="a", page_content="", metadata={"similarity": 0.8123456789, "page": 3}),
+        Document(id="b", page_content="", metadata={"similarity": 0.7, "fusion_score": 0.0325}),
+        Document(id="c", page_content="", metadata={"fusion_score": 0.016}),
+    ]
+    chunks = audit_record(request)["chunks"]
+    assert [(c["id"], c["score"], c["similarity"]) for c in chunks] == [
+        ("a", 0.812346, 0.812346), ("b", 0.0325, 0.7), ("c", 0.016, None)
+    ]
@@ -0,0 +1,47 @@
+import os
+import sys
+
+from langchain_core.documents import Document
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.context_packer import pack_context
+
+KIM_HEADER = "File: kim.pdf\nScheme: HDFC Large Cap Fund\nDocument: KIM\nDate: Nov 2025\nContent: "
+SID_HEADER = "File: sid.pdf\nScheme: HDFC Large Cap Fund\nDocument: SID\nDate: Nov 2025\nContent: "
+FIRST = "Exit load: 1% of the applicable NAV if units are redeemed within 1 year from the date of allotment."
+SECOND = "within 1 year from the date of allotment. No exit load is payable after 1 year from allotment."
+
+
+def chunk(header, body, page, file_name):
+    return Document(page_content=header + body, metadata={"page": page, "public_url": f"https://example.com/{file_name}"})
+
+
+def url(metadata):
+    return metadata["public_url"]
+
+
+def test_overlapping_chunks_of_one_page_are_merged():
+    context = pack_context([chunk(KIM_HEADER, FIRST, 3, "kim.pdf"), chunk(KIM_HEADER, SECOND, 3, "kim.pdf"),
+                            chunk(KIM_HEADER, FIRST, 3, "kim.pdf")], 1000, url)
+    merged = FIRST + SECOND[len("within 1 year from the date of allotment."):]
+    assert context == f"--- Document Source ---\n{KIM_HEADER}{merged}\nSource Link: https://example.com/kim.pdf"
+
+
+def test_each_file_header_and_link_is_emitted_once_in_ranking_order():
+    context = pack_context([chunk(SID_HEADER, "Lock-in: nil.", 7, "sid.pdf"), chunk(KIM_HEADER, FIRST, 3, "kim.pdf"),
+                            chunk(SID_HEADER, "Benchmark: NIFTY 100 TRI.", 2, "sid.pdf")], 1000, url)
+    assert context.count("File: sid.pdf") == 1 and context.count("Source Link: https://example.com/sid.pdf") == 1
+    assert context.index("File: sid.pdf") < context.index("File: kim.pdf")
+    # Pages of one file are in page order
+    assert "Benchmark: NIFTY 100 TRI.\n...\nLock-in: nil." in context
+
+
+def test_chunks_beyond_the_budget_are_dropped_but_the_first_is_kept():
+    long_body = "Scheme objective " * 40
+    context = pack_context([chunk(KIM_HEADER, long_body, 1, "kim.pdf"), chunk(SID_HEADER, "Lock-in: nil.", 7, "sid.pdf")], 50, url)
+    assert long_body in context and "sid.pdf" not in context
+    context = pack_context([chunk(KIM_HEADER, long_body, 1, "kim.pdf"), chunk(KIM_HEADER, "Lock-in: nil.", 2, "kim.pdf")], 250, url)
+    assert "Lock-in: nil." in context
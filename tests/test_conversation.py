@@ -0,0 +1,63 @@
+import os
+import sys
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from langchain_core.documents import Document
+
+from src.backend.conversation import CandidateCache, resolve_turn
+
+HISTORY = [
+    {"role": "user", "content": "What is the exit load of HDFC Large Cap Fund?"},
+    {"role": "assistant", "content": "1% if redeemed within 1 year. Compare with HDFC Flexi Cap Fund..."},
+]
+
+
+def test_follow_ups_are_rewritten_with_the_previous_scheme():
+    assert resolve_turn("and what about its expense ratio?", HISTORY, 4) == (
+        "What about HDFC Large Cap Fund's expense ratio?",
+        "What is the exit load of HDFC Large Cap Fund?",
+    )
+    assert resolve_turn("who manages it?", HISTORY, 4)[0] == "Who manages HDFC Large Cap Fund?"
+    assert resolve_turn("expense ratio?", HISTORY, 4)[0] == "Expense ratio for HDFC Large Cap Fund?"
+
+
+def test_standalone_questions_are_left_alone():
+    for question in ["What is the benchmark of HDFC Liquid Fund?", "What is an exit load?",
+                     "How do I download my capital gains statement?"]:
+        assert resolve_turn(question, HISTORY, 4)[0] == question
+    assert resolve_turn("and its benchmark?", [], 4) == ("and its benchmark?", None)
+
+
+def test_demonstratives_only_refer_back_as_pronouns():
+    for question in ["Is there an exit load on that scheme's direct plan for HDFC Flexi Cap?",
+                     "What does this term mean: TER?",
+                     "Which of these documents lists the riskometer?"]:
+        assert resolve_turn(question, HISTORY, 4)[0] == question
+    assert resolve_turn("Does that apply to SIPs?", HISTORY, 4)[0] == "Does that apply to SIPs for HDFC Large Cap Fund?"
+    assert resolve_turn("does this scheme have a lock-in?", HISTORY, 4)[0] == "Does HDFC Large Cap Fund have a lock-in?"
+
+
+def test_follow_up_chains_stop_at_a_scheme_less_question_and_the_window():
+    history = [m["content"] for m in HISTORY if m["role"] == "user"] + ["and the lock-in?"]
+    assert resolve_turn("and its benchmark?", history, 4) == (
+        "HDFC Large Cap Fund's benchmark?", "The lock-in for HDFC Large Cap Fund?"
+    )
+    assert resolve_turn("and its benchmark?", history + ["What is a riskometer?"], 4)[0] == "and its benchmark?"
+    assert resolve_turn("and its benchmark?", history, 1)[0] == "and its benchmark?"
+
+
+def test_candidate_pools_are_reused_only_for_the_same_schemes():
+    version = [1]
+    cache = CandidateCache(max_size=2, version_fn=lambda: version[0])
+    large_cap = {"scheme_name": "HDFC Large Cap Fund"}
+    cache.put("What is the exit load of HDFC Large Cap Fund?", large_cap, [Document(page_content="a", id="a")], [[1.0, 0.0]])
+
+    docs, vectors = cache.get("what is the exit load of hdfc large cap fund", large_cap)
+    docs[0].metadata["fusion_score"] = 1.0
+    assert cache.get("What is the exit load of HDFC Large Cap Fund?", large_cap)[0][0].metadata == {}
+    assert cache.get("What is the exit load of HDFC Large Cap Fund?", {"scheme_name": "HDFC Liquid Fund"}) is None
+    version[0] = 2
+    assert cache.get("What is the exit load of HDFC Large Cap Fund?", large_cap) is None
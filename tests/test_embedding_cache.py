@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+def test_only_missing_texts_are_sent_in_one_batch():
+    underlying = CountingEmbeddings(size=8, calls=[])
+    cache = CachedEmbeddings(underlying, memory_size=2, model_name="test")
+    first = cache.embed_documents(["exit load", "lock-in"])
+    assert cache.embed_documents(["lock-in", "benchmark", "exit load"]) == [first[1], underlying.embed_query("benchmark"), first[0]]
+    assert underlying.calls == [["exit load", "lock-in"], ["benchmark"]]
+    # memory_size=2: "lock-in" was evicted; nothing is on disk without a cache_dir
+    cache.embed_query("lock-in")
+    assert underlying.calls[-1] == ["lock-in"]
+    assert cache.stats()["memory_size"] == 2
+
+
+def test_vectors_persist_on_disk_per_model():
+    directory = tempfile.mkdtemp()
+    underlying = CountingEmbeddings(size=8, calls=[])
+    vector = CachedEmbeddings(underlying, cache_dir=directory, model_name="small").embed_query("exit load")
+
+    reopened = CachedEmbeddings(underlying, cache_dir=directory, model_name="small")
+    # Stored as float32
+    assert asyncio.run(reopened.aembed_query("exit load")) == np.asarray(vector, dtype=np.float32).tolist()
+    assert reopened.stats() == {"memory_size": 1, "memory_hits": 0, "disk_hits": 1, "misses": 0}
+
+    CachedEmbeddings(underlying, cache_dir=directory, model_name="large").embed_query("exit load")
+    assert len(underlying.calls) == 2
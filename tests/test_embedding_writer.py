@@ -0,0 +1,157 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from langchain_openai import OpenAIEmbeddings
+from src.backend.embedding_writer import EmbeddingWriter
+
+
+class StandInEmbeddingServer:
+    """
+    Local OpenAI-compatible /v1/embeddings endpoint. Every `rate_limit_every`-th
+    request gets a 429; once `fail_after` requests have succeeded, all further
+    requests get a 429 (simulates an ingest that dies mid-run).
+    """
+
+    def __init__(self, rate_limit_every=3, fail_after=None):
+        self.rate_limit_every = rate_limit_every
+        self.fail_after = fail_after
+        self.requests = 0
+        self.successes = 0
+        self.embedded_texts = 0
+        self.lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server.lock:
+                    server.requests += 1
+                    limited = (
+                        (server.rate_limit_every and server.requests % server.rate_limit_every == 0)
+                        or (server.fail_after is not None and server.successes >= server.fail_after)
+                    )
+                    if not limited:
+                        server.successes += 1
+                        server.embedded_texts += len(body["input"])
+                if limited:
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}, {"Retry-After": "0"})
+                    return
+                data = [
+                    {"object": "embedding", "index": i, "embedding": [float(len(text) % 7), 1.0, float(i)]}
+                    for i, text in enumerate(body["input"])
+                ]
+                self._send(200, {"object": "list", "data": data, "model": body["model"], "usage": {"prompt_tokens": 1, "total_tokens": 1}})
+
+            def _send(self, status, payload, headers=None):
+                raw = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_embeddings(server):
+    return OpenAIEmbeddings(
+        model="text-embedding-3-small",
+        openai_api_key="sk-test",
+        openai_api_base=server.url,
+        max_retries=0,
+        check_embedding_ctx_length=False
+    )
+
+
+def make_items(n):
+    return [(f"chunk-{i}", f"Scheme: HDFC Liquid Fund\nContent: exit load row {i}", {"page": i}) for i in range(n)]
+
+
+def test_writer_survives_rate_limits():
+    server = StandInEmbeddingServer(rate_limit_every=3)
+    stored = {}
+
+    def store(ids, texts, vectors, payloads):
+        for cid, vec in zip(ids, vectors):
+            assert cid not in stored
+            stored[cid] = vec
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = EmbeddingWriter(
+                make_embeddings(server).embed_documents, store,
+                checkpoint_path=os.path.join(tmp, "checkpoint.jsonl"),
+                batch_size=5, max_in_flight=4, base_delay=0.01, max_delay=0.05
+            )
+            result = writer.write(make_items(60))
+
+            assert result["written"] == 60
+            assert not result["failed_ids"]
+            assert result["rate_limited"] > 0
+            assert len(stored) == 60
+            assert len(EmbeddingWriter(None, None, checkpoint_path=writer.checkpoint_path).done_ids) == 60
+    finally:
+        server.close()
+
+
+def test_writer_resumes_from_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, "checkpoint.jsonl")
+        stored = {}
+
+        def store(ids, texts, vectors, payloads):
+            stored.update(zip(ids, vectors))
+
+        # First run dies after 4 successful batches
+        server = StandInEmbeddingServer(rate_limit_every=0, fail_after=4)
+        try:
+            writer = EmbeddingWriter(
+                make_embeddings(server).embed_documents, store, checkpoint_path=checkpoint,
+                batch_size=5, max_in_flight=1, max_retries=1, base_delay=0.01, max_delay=0.05
+            )
+            first = writer.write(make_items(40))
+        finally:
+            server.close()
+        assert first["written"] == 20
+        assert len(first["failed_ids"]) == 20
+
+        # Second run only embeds what is missing
+        server = StandInEmbeddingServer(rate_limit_every=0)
+        try:
+            writer = EmbeddingWriter(
+                make_embeddings(server).embed_documents, store, checkpoint_path=checkpoint,
+                batch_size=5, max_in_flight=2, base_delay=0.01, max_delay=0.05
+            )
+            second = writer.write(make_items(40))
+        finally:
+            server.close()
+        assert second["skipped"] == 20
+        assert second["written"] == 20
+        assert server.embedded_texts == 20
+        assert len(stored) == 40
+
+
+if __name__ == "__main__":
+    test_writer_survives_rate_limits()
+    test_writer_resumes_from_checkpoint()
+    print("Embedding writer tests passed.")
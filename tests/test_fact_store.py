@@ -0,0 +1,145 @@
+import os
+import sys
+import tempfile
+
+import pymupdf
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.fact_store import FactStore, FactStoreBuilder, FACT_STORE_FILENAME, extract_facts, structured_question
+
+META = {"scheme_name": "HDFC LargeCap Fund", "file_name": "HDFC_LargeCap_Fund_Facts_Jan_2026.pdf",
+        "document_name": "LargeCap Fund Facts", "date_of_the_document": "Jan 2026", "public_url": "https://example.com/ff.pdf"}
+
+
+def draw_table(page, y, rows, widths):
+    for r, row in enumerate(rows):
+        x = 40
+        for cell, width in zip(row, widths):
+            rect = pymupdf.Rect(x, y + r * 18, x + width, y + (r + 1) * 18)
+            page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+            page.insert_textbox(rect + (2, 3, -2, 0), cell, fontsize=8)
+            x += width
+    return y + len(rows) * 18
+
+
+def make_fund_facts(path):
+    doc = pymupdf.open()
+    page = doc.new_page()
+    y = draw_table(page, 60, [
+        ["Fund Manager", "Rahul Baijal (since July 29, 2022)"],
+        ["Benchmark", "NIFTY 100 Index (TRI)"],
+        ["Fund Size (AUM)", "Rs. 38,251.34 Crore"],
+        ["Total Expense Ratio", "Regular: 1.60% Direct: 0.98%"],
+    ], [140, 300])
+    draw_table(page, y + 30, [["Company", "Industry", "% to NAV"]] + [
+        [f"Company {i}", "Banks", f"{2 + i:.2f}"] for i in range(12)
+    ], [200, 140, 80])
+    page.insert_text((40, 760), "Riskometer: Very High", fontsize=9)
+    doc.save(path)
+
+
+def make_kim(path):
+    # KIM layout: a performance table (whose "Benchmark" row holds returns) ahead
+    # of the scheme information table, with labels as the KIM prints them
+    doc = pymupdf.open()
+    page = doc.new_page()
+    y = draw_table(page, 60, [
+        ["Period", "Scheme Returns (%)", "Benchmark Returns (%)"],
+        ["1 Year", "14.10", "13.20"],
+        ["Since Inception", "18.45", "16.02"],
+    ], [140, 140, 140])
+    y = draw_table(page, y + 20, [["HDFC Large Cap Fund", "14.10%"], ["Benchmark", "13.20%"]], [140, 300])
+    draw_table(page, y + 20, [
+        ["Name of the Fund Manager(s)", "Mr. Rahul Baijal"],
+        ["Benchmark Index:", "NIFTY 100 TRI"],
+        ["Total Expense Ratio", "Please refer to the website"],
+        ["Load Structure", "Entry Load: Not Applicable. Exit Load: 1% if redeemed within 1 year"],
+        ["Date of Allotment", "October 11, 1996"],
+        ["Minimum Application Amount", "Rs. 100 and any amount thereafter"],
+        ["Benchmark vs Scheme returns", "NIFTY 100 TRI"],
+    ], [160, 300])
+    doc.save(path)
+
+
+def test_kim_rows_must_parse_as_the_fact_type():
+    directory = tempfile.mkdtemp()
+    pdf_path = os.path.join(directory, "kim.pdf")
+    make_kim(pdf_path)
+    facts = {record["fact"]: record for record in extract_facts(pdf_path)}
+    assert facts["benchmark"]["value_text"] == "NIFTY 100 TRI"
+    assert facts["fund_manager"]["value_text"] == "Mr. Rahul Baijal"
+    assert facts["exit_load"]["value_num"] == 1.0
+    assert facts["min_lumpsum"]["value_num"] == 100.0
+    assert facts["inception"]["value_text"] == "October 11, 1996"
+    assert "expense_ratio" not in facts
+
+
+def build_store():
+    directory = tempfile.mkdtemp()
+    pdf_path = os.path.join(directory, "ff.pdf")
+    make_fund_facts(pdf_path)
+    builder = FactStoreBuilder(os.path.join(directory, FACT_STORE_FILENAME))
+    builder.replace("large/ff.pdf", "sha", META, extract_facts(pdf_path))
+    builder.close()
+    return FactStore.load(directory)
+
+
+def test_tables_are_extracted_into_typed_facts():
+    store = build_store()
+    assert store.lookup("HDFC Large Cap Fund", "aum")[0]["value_num"] == 38251.34
+    assert store.lookup("HDFC Large Cap Fund", "expense_ratio")[0]["value_num"] == 0.98
+    assert store.lookup("HDFC Large Cap Fund", "riskometer")[0]["value_text"] == "Very High"
+    holdings = store.lookup("HDFC Large Cap Fund", "top_holdings")
+    assert [row["value_text"] for row in holdings][:2] == ["Company 11", "Company 10"]
+    assert len(holdings) == 10 and holdings[0]["document_date"] == "2026-01"
+
+
+def test_structured_questions_are_answered_with_a_citation():
+    store = build_store()
+    answer, docs = store.answer("Who is the fund manager of HDFC Large Cap Fund?")
+    assert answer == (
+        "As per the LargeCap Fund Facts dated Jan 2026, the fund manager of HDFC Large Cap Fund is: "
+        "Rahul Baijal (since July 29, 2022).\nLast updated from sources: <https://example.com/ff.pdf>"
+    )
+    assert docs[0].metadata["page"] == 1
+    assert "Company 11 (13.00%), Company 10 (12.00%), Company 9 (11.00%)." in store.answer("top 3 holdings of large cap")[0]
+    assert store.answer("What is the exit load of HDFC Large Cap Fund?") is None  # not in the table
+
+
+def test_only_single_fact_single_scheme_questions_are_structured():
+    assert structured_question("expense ratio of the liquid fund?") == ("HDFC Liquid Fund", "expense_ratio", 10)
+    for question in ["Why is the expense ratio of HDFC Large Cap Fund so high?",
+                     "Compare the AUM of large cap and flexi cap",
+                     "What is an exit load?",
+                     "What are the exit load and the benchmark of HDFC Liquid Fund?"]:
+        assert structured_question(question) is None
+
+
+def test_closed_store_finds_nothing():
+    store = build_store()
+    store.close()
+    store.close()
+    assert store.lookup("HDFC Large Cap Fund", "aum") == []
+    assert store.answer("What is the AUM of HDFC Large Cap Fund?") is None
+
+
+def test_lookup_prefers_the_newest_most_precise_date():
+    directory = tempfile.mkdtemp()
+    builder = FactStoreBuilder(os.path.join(directory, FACT_STORE_FILENAME))
+    record = {"fact": "aum", "rank": 0, "value_num": 1.0, "unit": "crore", "page": 1}
+    for key, date, value in [("undated", "Unknown", "Rs. 4 Crore"), ("month", "Nov 2025", "Rs. 2 Crore"),
+                             ("day", "3 Nov 2025", "Rs. 3 Crore"), ("older", "28 Oct 2025", "Rs. 1 Crore")]:
+        builder.replace(key, "sha", dict(META, document_name="Factsheet", date_of_the_document=date),
+                        [dict(record, value_text=value)])
+    builder.close()
+    store = FactStore.load(directory)
+    assert store.lookup("HDFC Large Cap Fund", "aum")[0]["value_text"] == "Rs. 3 Crore"
+
+    builder = FactStoreBuilder(os.path.join(directory, FACT_STORE_FILENAME))
+    for key in ["month", "day", "older"]:
+        builder.remove(key)
+    builder.close()
+    assert store.lookup("HDFC Large Cap Fund", "aum")[0]["value_text"] == "Rs. 4 Crore"
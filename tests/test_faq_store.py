@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.faq_store import FAQStore
+
+
+def make_store():
+    entries = [
+        {"question": "What is the exit load of HDFC Large Cap Fund?", "schemes": ["HDFC Large Cap Fund"],
+         "answer": "1% within one year.", "sources": [{"chunk_id": "a"}], "vector": [1.0, 0.0, 0.0]},
+        {"question": "What is the exit load of HDFC Liquid Fund?", "schemes": ["HDFC Liquid Fund"],
+         "answer": "Graded exit load for 7 days.", "sources": [{"chunk_id": "b"}], "vector": [0.98, 0.2, 0.0]},
+    ]
+    return FAQStore(entries, {"embedding_model": "test"})
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    store = make_store()
+    assert store.get("what is the EXIT LOAD of hdfc large cap fund")["answer"] == "1% within one year."
+    assert store.get("What is the exit load?") is None
+
+
+def test_nearest_only_matches_a_question_about_the_same_scheme():
+    store = make_store()
+    vector = [1.0, 0.05, 0.0]
+    assert store.nearest("exit load for large cap?", vector, 0.9)["answer"] == "1% within one year."
+    assert store.nearest("exit load for the liquid fund?", vector, 0.9)["answer"] == "Graded exit load for 7 days."
+    assert store.nearest("exit load for flexi cap?", vector, 0.9) is None
+    assert store.nearest("exit load for large cap?", [0.0, 0.0, 1.0], 0.9) is None
+
+
+def test_round_trips_through_disk():
+    directory = tempfile.mkdtemp()
+    make_store().save(directory)
+    loaded = FAQStore.load(directory)
+    assert loaded.meta == {"embedding_model": "test"}
+    assert [d.id for d in loaded.documents(loaded.get("What is the exit load of HDFC Liquid Fund?"))] == ["b"]
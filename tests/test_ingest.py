@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pymupdf
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from scripts import ingest
+
+
+def make_pdf(path, pages):
+    doc = pymupdf.open()
+    for text in pages:
+        doc.new_page().insert_text((40, 60), text, fontsize=11)
+    doc.save(path)
+
+
+def collection(db_dir):
+    import chromadb
+    return chromadb.PersistentClient(path=db_dir).get_collection("hdfc_mutual_fund").get(include=["metadatas"])
+
+
+def test_reingest_deletes_vanished_chunks_and_refreshes_kept_metadata(monkeypatch, tmp_path):
+    raw_dir, db_dir = str(tmp_path / "raw"), str(tmp_path / "chroma_db")
+    os.makedirs(os.path.join(raw_dir, "HDFC_Liquid_Fund"))
+    monkeypatch.setattr(ingest, "RAW_DATA_DIR", raw_dir)
+    monkeypatch.setattr(ingest, "CHROMA_DB_DIR", db_dir)
+    for name in ["MANIFEST_PATH", "CHECKPOINT_PATH", "BM25_INDEX_PATH", "VECTOR_SNAPSHOT_PATH",
+                 "FAQ_STORE_PATH", "FACT_STORE_PATH"]:
+        monkeypatch.setattr(ingest, name, os.path.join(db_dir, os.path.basename(getattr(ingest, name))))
+    monkeypatch.setattr(ingest, "INGEST_WORKERS", 1)
+    monkeypatch.setattr(ingest, "_citations", None)
+    monkeypatch.setattr(ingest, "build_faq_answers", lambda vector_store, rebuild=False: None)
+    embeddings = DeterministicFakeEmbedding(size=16)
+
+    pdf_path = os.path.join(raw_dir, "HDFC_Liquid_Fund", "HDFC_Liquid_Fund_KIM.pdf")
+    make_pdf(pdf_path, ["Exit load is nil.", "Benchmark is NIFTY Liquid Index."])
+    ingest.ingest_data(embeddings=embeddings)
+    first = collection(db_dir)
+    pages = {meta["chunk_id"]: meta["page"] for meta in first["metadatas"]}
+    assert sorted(pages.values()) == [0, 1]
+
+    # The benchmark page moves to the front, the exit load page is replaced
+    make_pdf(pdf_path, ["Benchmark is NIFTY Liquid Index.", "Exit load applies for 7 days."])
+    ingest.ingest_data(embeddings=embeddings)
+    second = collection(db_dir)
+    manifest = ingest.load_manifest()["files"]
+    assert set(second["ids"]) == set(manifest["HDFC_Liquid_Fund/HDFC_Liquid_Fund_KIM.pdf"]["chunk_ids"])
+    kept = [cid for cid in second["ids"] if cid in pages]
+    assert len(kept) == 1 and pages[kept[0]] == 1
+    assert {meta["chunk_id"]: meta["page"] for meta in second["metadatas"]}[kept[0]] == 0
+
+    os.remove(pdf_path)
+    make_pdf(os.path.join(raw_dir, "HDFC_Liquid_Fund", "HDFC_Liquid_Fund_SID.pdf"), ["Scheme information."])
+    ingest.ingest_data(embeddings=embeddings)
+    third = collection(db_dir)
+    assert len(third["ids"]) == 1 and third["metadatas"][0]["file_name"] == "HDFC_Liquid_Fund_SID.pdf"
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+TEXTS = [
+    "Exit load: 1% if redeemed within 1 year. AMFI code 119018.",
+    "The expense ratio of the direct plan is 0.98%.",
+    "Exit load: nil. Lock-in period of 3 years.",
+]
+METADATAS = [{"scheme_name": "HDFC Large Cap Fund"}, {"scheme_name": "HDFC Large Cap Fund"}, {"scheme_name": "HDFC ELSS Tax Saver"}]
+
+
+def test_tokens_keep_numbers_whole_and_drop_stopwords():
+    assert tokenize("What is the TER of 0.98% for code 119018?") == ["ter", "0.98", "code", "119018"]
+
+
+def test_bm25_ranks_exact_terms_and_filters_by_scheme():
+    index = BM25Index.build(["a", "b", "c"], TEXTS, METADATAS)
+    assert index.search("AMFI code 119018")[0][0] == "a"
+    assert [cid for cid, _ in index.search("exit load")] in (["a", "c"], ["c", "a"])
+    assert [cid for cid, _ in index.search("exit load", schemes=["HDFC ELSS Tax Saver"])] == ["c"]
+    assert index.search("riskometer") == []
+
+    path = os.path.join(tempfile.mkdtemp(), "bm25.json.gz")
+    index.save(path)
+    assert BM25Index.load(path).search("expense ratio") == index.search("expense ratio")
+
+
+def test_rrf_rewards_ids_ranked_by_both_lists():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+    assert [cid for cid, _ in fused] == ["c", "a", "b", "d"]
+    assert fused[0][1] == 1 / 63 + 1 / 61
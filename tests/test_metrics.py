@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.metrics import ERRORS, REQUESTS, STAGE_DURATION, MetricsRegistry, track_request
+from src.backend.timing import stage
+
+
+def test_registry_renders_prometheus_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests", "Requests.", ["path"])
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    registry.gauge_callback(lambda: [("cache_entries", "Entries.", {"cache": 'a"b'}, 3)])
+    requests.inc(path="chat")
+    requests.inc(2, path="chat")
+    latency.observe(0.05)
+    latency.observe(5.0)
+
+    assert registry.render().splitlines() == [
+        "# HELP requests Requests.", "# TYPE requests counter", 'requests_total{path="chat"} 3',
+        "# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1', 'latency_seconds_bucket{le="1.0"} 1', 'latency_seconds_bucket{le="+Inf"} 2',
+        "latency_seconds_sum 5.05", "latency_seconds_count 2",
+        "# HELP cache_entries Entries.", "# TYPE cache_entries gauge", 'cache_entries{cache="a\\"b"} 3',
+    ]
+    with pytest.raises(ValueError):
+        requests.inc(route="chat")
+
+
+def test_tracked_requests_record_outcome_stages_and_failing_stage():
+    finished = []
+    served = REQUESTS.value(path="test", outcome="cache_exact")
+    retrievals = STAGE_DURATION.count(stage="test_retrieve")
+    with track_request("test", "q", finished.append) as request:
+        with stage("test_retrieve"):
+            pass
+        request.outcome = "cache_exact"
+    assert REQUESTS.value(path="test", outcome="cache_exact") == served + 1
+    assert STAGE_DURATION.count(stage="test_retrieve") == retrievals + 1
+    assert finished == [request] and "test_retrieve" in request.timings
+
+    failures = ERRORS.value(stage="test_generate", error_class="TimeoutError")
+    with pytest.raises(TimeoutError):
+        with track_request("test", "q") as request:
+            with stage("test_generate"):
+                raise TimeoutError("llm")
+    assert request.outcome == "error" and request.error == "TimeoutError: llm"
+    assert ERRORS.value(stage="test_generate", error_class="TimeoutError") == failures + 1
@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import time
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.audit_log import is_refusal
+from src.backend.query_classifier import REFUSALS, QueryClassifier
+
+DATA = os.path.join(os.path.dirname(__file__), "data", "classifier_queries.jsonl")
+
+
+def load_rows():
+    with open(DATA, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_no_factual_question_is_refused_and_most_refusals_are_caught():
+    classifier = QueryClassifier()
+    rows = load_rows()
+    refused = [(row, classifier.classify(row["query"])) for row in rows]
+    false_refusals = [row["query"] for row, verdict in refused if verdict and row["label"] == "factual"]
+    caught = sum(1 for row, verdict in refused if verdict and row["label"] != "factual")
+    assert false_refusals == []
+    assert caught / sum(row["label"] != "factual" for row in rows) >= 0.85
+
+
+def test_factual_questions_with_advice_like_wording_are_answered():
+    classifier = QueryClassifier()
+    for question in [
+        "What documents should I submit to redeem my units?",
+        "By when should I submit the SIP form?",
+        "Is there an exit load if I redeem now?",
+        "What is the best time to place a redemption request to get same-day NAV?",
+        "Is HDFC Liquid Fund risky?",
+        "Which scheme has the highest AUM?",
+        "Which of the five schemes has the highest expense ratio?",
+        "What is the expected returns disclosure in the SID?",
+    ]:
+        assert classifier.classify(question) is None, question
+    assert classifier.classify("Should we redeem our ELSS units after the lock-in?")[0] == "advice"
+
+
+def test_classification_is_well_under_a_millisecond():
+    classifier = QueryClassifier()
+    queries = [row["query"] for row in load_rows()]
+    start = time.perf_counter()
+    for query in queries:
+        classifier.classify(query)
+    assert (time.perf_counter() - start) / len(queries) < 0.001
+
+
+def test_refusals_use_the_system_prompt_templates():
+    assert all(is_refusal(text) for text in REFUSALS.values())
+    assert all(text.endswith("Last updated from sources: <https://www.hdfcfund.com/>") for text in REFUSALS.values())
@@ -0,0 +1,42 @@
+import math
+import os
+import sys
+import types
+
+import numpy as np
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.reranker import CrossEncoderScorer, LexicalSemanticScorer
+
+LOGITS = [-6.0, -1.0, 0.0, 2.5, 8.0]
+
+
+class FakeCrossEncoder:
+    # Mirrors sentence-transformers: predict() applies a sigmoid unless told otherwise
+    def __init__(self, model_name, device=None):
+        pass
+
+    def predict(self, pairs, batch_size=32, activation_fn=None):
+        logits = np.array(LOGITS[:len(pairs)], dtype=np.float32)
+        if activation_fn is None:
+            return 1.0 / (1.0 + np.exp(-logits))
+        return activation_fn(logits)
+
+
+def test_cross_encoder_scores_are_logits_squashed_once(monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(CrossEncoder=FakeCrossEncoder))
+    scorer = CrossEncoderScorer("fake-model")
+    scores = scorer.score("exit load?", None, ["chunk"] * len(LOGITS), None)
+    assert scores == [1.0 / (1.0 + math.exp(-x)) for x in LOGITS]
+    assert scores[0] < 0.01 and scores[-1] > 0.99
+
+
+def test_lexical_semantic_scores_stay_within_unit_range():
+    scorer = LexicalSemanticScorer()
+    vectors = [[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]]
+    scores = scorer.score("exit load", [1.0, 0.0], ["exit load 1%", "lock-in", "exit"], vectors)
+    assert scores[0] == 1.0 and all(0.0 <= s <= 1.0 for s in scores)
+    assert scores[0] > scores[2] > scores[1]
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_threads_share_one_computation():
+    flights = SingleFlight()
+    calls = []
+
+    def compute(flight):
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.run("q", compute))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(leader for _, leader in results) == [False] * 7 + [True]
+    assert {answer for answer, _ in results} == {"answer"}
+    assert flights.run("q", compute) == ("answer", True)  # finished keys are not reused
+
+
+def test_streaming_callers_replay_tokens_and_share_errors():
+    flights = SingleFlight()
+
+    def compute(flight):
+        for token in ["a", "b", "c"]:
+            time.sleep(0.05)
+            flight.push(token)
+        raise RuntimeError("provider down")
+
+    first, leader = flights.start("q", compute)
+    time.sleep(0.08)
+    second, follower_leader = flights.start("q", compute)
+    assert first is second and leader and not follower_leader
+
+    tokens = []
+    try:
+        for token in second.stream():
+            tokens.append(token)
+    except RuntimeError as e:
+        assert str(e) == "provider down"
+    assert tokens == ["a", "b", "c"]
+
+
+def test_async_callers_share_one_task_that_outlives_a_cancelled_caller():
+    async def main():
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def compute(flight):
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            flight.push("x")
+            return "answer"
+
+        first = asyncio.ensure_future(flights.run("q", compute))
+        await asyncio.sleep(0.01)
+        rest = [asyncio.ensure_future(flights.run("q", compute)) for _ in range(5)]
+        first.cancel()
+        results = await asyncio.gather(*rest)
+        assert len(calls) == 1
+        assert results == [("answer", False)] * 5
+
+        flight, leader = flights.start("q", compute)
+        assert leader
+        assert [token async for token in flight.stream()] == ["x"]
+
+    asyncio.run(main())
+
+
+def test_async_flights_work_from_several_event_loops():
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def compute(flight):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def ask():
+        return await asyncio.gather(*[flights.run("q", compute) for _ in range(4)])
+
+    # Sequential loops (asyncio.run each time) and loops running in parallel threads
+    results = [asyncio.run(ask()), asyncio.run(ask())]
+    threads = [threading.Thread(target=lambda: results.append(asyncio.run(ask()))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 5 and all(r == [("answer", True)] + [("answer", False)] * 3 for r in results)
+    assert len(calls) == 5
@@ -0,0 +1,69 @@
+import gzip
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from src.backend.vector_index import (
+    VECTOR_MATRIX_FILENAME, VECTOR_SNAPSHOT_DIR_PREFIX, VECTOR_SNAPSHOT_META_FILENAME, MappedStrings,
+    NumpyVectorIndex, current_generation,
+)
+
+
+def make_index():
+    ids = ["a", "b", "c"]
+    texts = ["exit load 1%", "", "lock-in 3 years — ELSS"]
+    metadatas = [{"scheme_name": "HDFC Large Cap Fund", "page": 1}, {}, {"scheme_name": "HDFC ELSS Tax Saver"}]
+    matrix = np.eye(3, dtype=np.float32)
+    return NumpyVectorIndex(ids, texts, metadatas, matrix)
+
+
+def test_snapshot_maps_texts_and_metadata_read_only():
+    directory = tempfile.mkdtemp()
+    make_index().save(directory)
+    loaded = NumpyVectorIndex.load(directory)
+
+    assert isinstance(loaded.documents, MappedStrings)
+    assert list(loaded.documents) == ["exit load 1%", "", "lock-in 3 years — ELSS"]
+    assert loaded.scheme_names() == ["HDFC ELSS Tax Saver", "HDFC Large Cap Fund"]
+    docs = loaded.max_marginal_relevance_search_by_vector([0, 0, 1], k=1, filter={"scheme_name": "HDFC ELSS Tax Saver"})
+    assert [(d.id, d.page_content) for d in docs] == [("c", "lock-in 3 years — ELSS")]
+    docs[0].metadata["rerank_score"] = 1.0
+    assert "rerank_score" not in loaded.get_by_ids(["c"])[0].metadata
+
+
+def test_publishing_a_snapshot_is_atomic_and_keeps_the_previous_generation():
+    directory = tempfile.mkdtemp()
+    make_index().save(directory)
+    first = current_generation(directory)
+    serving = NumpyVectorIndex.load(directory)
+
+    index = make_index()
+    index.documents = ["exit load nil", "", "lock-in 3 years"]
+    index.save(directory)
+    second = current_generation(directory)
+    # A generation directory whose pointer was never switched is not visible
+    os.makedirs(os.path.join(directory, VECTOR_SNAPSHOT_DIR_PREFIX + "unpublished"))
+    assert NumpyVectorIndex.load(directory).documents[0] == "exit load nil"
+    assert serving.documents[0] == "exit load 1%"
+
+    make_index().save(directory)
+    generations = sorted(name for name in os.listdir(directory) if name.startswith(VECTOR_SNAPSHOT_DIR_PREFIX))
+    assert first not in generations and second in generations and len(generations) == 2
+
+
+def test_loads_flat_snapshots_written_before_mapped_columns():
+    directory = tempfile.mkdtemp()
+    index = make_index()
+    np.save(os.path.join(directory, VECTOR_MATRIX_FILENAME), index.matrix)
+    with gzip.open(os.path.join(directory, VECTOR_SNAPSHOT_META_FILENAME), "wt", encoding="utf-8") as f:
+        json.dump({"ids": index.ids, "documents": index.documents, "metadatas": index.metadatas}, f)
+
+    loaded = NumpyVectorIndex.load(directory, mmap=False)
+    assert loaded.get_by_ids(["a"])[0].metadata == {"scheme_name": "HDFC Large Cap Fund", "page": 1}